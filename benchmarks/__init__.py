@@ -0,0 +1,15 @@
+# -*- coding: utf-8 -*-
+
+"""
+benchmarks
+~~~~~~~~~~
+
+Performance benchmarks of britney. They run offline, against in-process
+adapters and local HTTP servers. Run them with : ::
+
+    $> python -m benchmarks --output results.json
+
+and compare two runs with : ::
+
+    $> python -m benchmarks --compare before.json after.json
+"""
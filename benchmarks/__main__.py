@@ -0,0 +1,111 @@
+# -*- coding: utf-8 -*-
+
+"""
+benchmarks.__main__
+~~~~~~~~~~~~~~~~~~~
+
+Runs the benchmarks and saves their results as JSON, or compares the results
+of two runs.
+"""
+
+from __future__ import print_function
+
+import argparse
+import importlib
+import json
+import platform
+import subprocess
+import sys
+import time
+
+from britney.utils import VERSION
+
+BENCHMARKS = ('loading', 'calls', 'middlewares', 'transports', 'throughput',
+              'memory')
+
+# settings of a measure rather than measures
+SETTINGS = frozenset(('number', 'repeat', 'calls', 'concurrency',
+                      'body_bytes'))
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(
+            ['git', 'rev-parse', '--short', 'HEAD'],
+            stderr=subprocess.STDOUT
+        ).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(names, quick=False):
+    report = {
+        'britney': VERSION,
+        'revision': git_revision(),
+        'python': platform.python_version(),
+        'implementation': platform.python_implementation(),
+        'timestamp': time.time(),
+        'results': {},
+    }
+    for name in names:
+        print('running %s...' % name, file=sys.stderr)
+        module = importlib.import_module('benchmarks.bench_%s' % name)
+        report['results'][name] = module.run(quick=quick)
+    return report
+
+
+def _flatten(results, prefix=''):
+    for key, value in sorted(results.items()):
+        if isinstance(value, dict):
+            for item in _flatten(value, prefix + key + '.'):
+                yield item
+        elif key in SETTINGS:
+            continue
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            yield prefix + key, value
+
+
+def compare(before, after):
+    """ Lines describing how each measure changed between two reports
+    """
+    old = dict(_flatten(before['results']))
+    lines = []
+    for key, value in _flatten(after['results']):
+        if key in old and old[key]:
+            lines.append('%-50s %14.2f %14.2f %+8.1f%%' % (
+                key, old[key], value, (value - old[key]) * 100.0 / old[key]
+            ))
+    return lines
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m benchmarks')
+    parser.add_argument('--only', action='append', choices=BENCHMARKS,
+                        help='benchmark to run (defaults to all)')
+    parser.add_argument('--quick', action='store_true',
+                        help='fewer iterations, for a quick check')
+    parser.add_argument('--output', '-o', help='file to save results to')
+    parser.add_argument('--compare', nargs=2, metavar=('BEFORE', 'AFTER'),
+                        help='compares two saved results')
+    args = parser.parse_args(argv)
+
+    if args.compare:
+        reports = []
+        for path in args.compare:
+            with open(path) as report_file:
+                reports.append(json.load(report_file))
+        print('\n'.join(compare(*reports)))
+        return 0
+
+    report = run(args.only or BENCHMARKS, quick=args.quick)
+    output = json.dumps(report, indent=2, sort_keys=True)
+    if args.output:
+        with open(args.output, 'w') as output_file:
+            output_file.write(output)
+    else:
+        print(output)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,62 @@
+# -*- coding: utf-8 -*-
+
+"""
+benchmarks.bench_calls
+~~~~~~~~~~~~~~~~~~~~~~
+
+Per-call overhead of :py:meth:`~britney.core.SporeMethod.__call__` compared to
+raw ``requests`` calls, every request being answered by the in-process
+test adapter so that no network is involved.
+"""
+
+try:
+    from unittest import mock
+except ImportError:
+    import mock
+
+import requests
+from requests_testadapter import TestAdapter
+
+from britney.core import Spore
+
+from .utils import measure
+
+URL = 'http://bench.britney.org/users/1.json'
+
+
+def client():
+    return Spore(name='bench', base_url='http://bench.britney.org/', methods={
+        'get_user': {
+            'method': 'GET',
+            'path': '/users/:id.:format',
+            'required_params': ['id', 'format'],
+            'optional_params': ['fields'],
+        }
+    })
+
+
+def run(quick=False):
+    number = 500 if quick else 5000
+    results = {}
+    adapter = TestAdapter(b'{"id": 1}')
+
+    with mock.patch.object(requests.Session, 'get_adapter',
+                           return_value=adapter):
+        session = requests.Session()
+        results['requests_session'] = measure(lambda: session.get(URL),
+                                              number=number)
+        results['requests_get'] = measure(lambda: requests.get(URL),
+                                          number=number)
+
+        spore = client()
+        results['spore_method'] = measure(
+            lambda: spore.get_user(id=1, format='json'), number=number
+        )
+        results['spore_method_query'] = measure(
+            lambda: spore.get_user(id=1, format='json', fields='name'),
+            number=number
+        )
+
+    results['overhead_us'] = results['spore_method']['per_call_us'] - \
+        results['requests_get']['per_call_us']
+    return results
@@ -0,0 +1,41 @@
+# -*- coding: utf-8 -*-
+
+"""
+benchmarks.bench_loading
+~~~~~~~~~~~~~~~~~~~~~~~~
+
+Time to build a client from a small description and from a synthetic
+description of 5,000 methods, with and without reading the file.
+"""
+
+import json
+import os
+
+import britney
+from britney.core import Spore
+
+from .utils import description_file, measure, synthetic_description
+
+SMALL_DESCRIPTION = os.path.join(os.path.dirname(os.path.dirname(
+    os.path.abspath(__file__))), 'tests', 'descriptions', 'api.json')
+
+
+def run(quick=False):
+    results = {}
+
+    results['new_small'] = measure(lambda: britney.new(SMALL_DESCRIPTION),
+                                   number=100 if quick else 1000)
+
+    sizes = (5000,)
+    for size in sizes:
+        description = synthetic_description(size)
+        with description_file(description) as path:
+            results['new_%d_methods' % size] = measure(
+                lambda: britney.new(path), number=1, repeat=3 if quick else 5
+            )
+        results['spore_%d_methods' % size] = measure(
+            lambda: Spore(**json.loads(json.dumps(description))),
+            number=1, repeat=3 if quick else 5
+        )
+
+    return results
@@ -0,0 +1,105 @@
+# -*- coding: utf-8 -*-
+
+"""
+benchmarks.bench_memory
+~~~~~~~~~~~~~~~~~~~~~~~
+
+Peak memory allocated by Python while fetching large responses from a local
+HTTP server, with and without decoding them, and memory held by each method
+of a client and by the environment of each call.
+"""
+
+import gc
+import json
+import tracemalloc
+
+from britney.core import Spore
+
+from .utils import local_server, synthetic_description
+
+SIZES = (1, 10)
+
+
+def _body(megabytes):
+    item = {'id': 1, 'name': 'britney', 'tags': ['a', 'b', 'c']}
+    count = megabytes * 1024 * 1024 // len(json.dumps(item))
+    return json.dumps([item] * count).encode('utf-8')
+
+
+def _peak(func):
+    tracemalloc.start()
+    try:
+        func()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def _held(func, count):
+    """ Memory still allocated after *func* returned what it built, divided
+    by *count*
+    """
+    gc.collect()
+    tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        kept = func()
+        gc.collect()
+        held = tracemalloc.get_traced_memory()[0] - before
+    finally:
+        tracemalloc.stop()
+    del kept
+    return held // count
+
+
+def footprint(quick=False):
+    """ Bytes held by each method of a client built from a parsed
+    description, and by the environment of each call
+    """
+    count = 1000 if quick else 5000
+    text = json.dumps(synthetic_description(count))
+    per_method = _held(lambda: Spore(**json.loads(text)), count)
+
+    method = Spore(**json.loads(text)).method_0
+    per_call = _held(lambda: [
+        method.build_environ({'id': index, 'format': 'json'})
+        for index in range(count)
+    ], count)
+    return {
+        'per_method_bytes': per_method,
+        'per_call_environ_bytes': per_call,
+    }
+
+
+def run(quick=False):
+    sizes = SIZES[:1] if quick else SIZES
+    bodies = {'/large_%d' % size: _body(size) for size in sizes}
+    methods = {
+        'large_%d' % size: {'method': 'GET', 'path': '/large_%d' % size}
+        for size in sizes
+    }
+    results = footprint(quick)
+
+    with local_server(bodies=bodies) as base_url:
+        for size in sizes:
+            name = 'large_%d' % size
+            body_size = len(bodies['/' + name])
+
+            raw = Spore(name='bench', base_url=base_url, methods=methods)
+            peak = _peak(lambda: getattr(raw, name)())
+            results['%dMB_raw' % size] = {
+                'body_bytes': body_size,
+                'peak_bytes': peak,
+                'peak_ratio': float(peak) / body_size,
+            }
+
+            decoded = Spore(name='bench', base_url=base_url, methods=methods)
+            decoded.enable('Json')
+            peak = _peak(lambda: getattr(decoded, name)())
+            results['%dMB_json' % size] = {
+                'body_bytes': body_size,
+                'peak_bytes': peak,
+                'peak_ratio': float(peak) / body_size,
+            }
+
+    return results
@@ -0,0 +1,70 @@
+# -*- coding: utf-8 -*-
+
+"""
+benchmarks.bench_middlewares
+~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+Cost of each bundled middleware, measured as the difference between a call
+with the middleware enabled and a call without any middleware.
+"""
+
+try:
+    from unittest import mock
+except ImportError:
+    import mock
+
+import requests
+from requests_testadapter import TestAdapter
+
+from britney.core import Spore
+from britney.middleware import auth, format
+from britney.middleware.utils import Mock, fake_response
+
+from .utils import measure
+
+
+def client():
+    return Spore(name='bench', base_url='http://bench.britney.org/',
+                 authentication=True, methods={
+                     'create_user': {
+                         'method': 'POST',
+                         'path': '/users',
+                     }
+                 })
+
+
+MIDDLEWARES = (
+    ('Json', format.Json, {}),
+    ('Basic', auth.Basic, {'username': 'login', 'password': 'secret'}),
+    ('ApiKey', auth.ApiKey, {'key_name': 'X-Api-Key', 'key_value': 'key'}),
+    ('SigV4', auth.SigV4, {'access_key': 'key', 'secret_key': 'secret',
+                           'region': 'eu-west-1', 'service': 'bench'}),
+    ('Mock', Mock, {
+        'fakes': {'/users': lambda request: fake_response(request, '{}')}
+    }),
+)
+
+
+def run(quick=False):
+    number = 300 if quick else 3000
+    payload = {'name': 'britney', 'roles': ['admin', 'user']}
+    adapter = TestAdapter(b'{"id": 1, "name": "britney"}')
+    results = {}
+
+    with mock.patch.object(requests.Session, 'get_adapter',
+                           return_value=adapter):
+        spore = client()
+        baseline = measure(lambda: spore.create_user(payload=payload),
+                           number=number)
+        results['none'] = baseline
+
+        for name, middleware, kwargs in MIDDLEWARES:
+            spore = client()
+            spore.enable(middleware, **kwargs)
+            result = measure(lambda: spore.create_user(payload=payload),
+                             number=number)
+            result['cost_us'] = result['per_call_us'] - \
+                baseline['per_call_us']
+            results[name] = result
+
+    return results
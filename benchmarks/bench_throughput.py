@@ -0,0 +1,67 @@
+# -*- coding: utf-8 -*-
+
+"""
+benchmarks.bench_throughput
+~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+Calls per second against a local HTTP server with several threads sharing
+one client.
+"""
+
+import threading
+
+from britney.core import Spore
+
+from .utils import clock, local_server
+
+CONCURRENCIES = (1, 4, 16)
+
+
+def client(base_url):
+    return Spore(name='bench', base_url=base_url, methods={
+        'get_user': {
+            'method': 'GET',
+            'path': '/users/:id',
+            'required_params': ['id'],
+        }
+    })
+
+
+def _throughput(spore, concurrency, calls):
+    errors = []
+
+    def worker():
+        for index in range(calls):
+            try:
+                spore.get_user(id=index)
+            except Exception as error:
+                errors.append(error)
+
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    start = clock()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = clock() - start
+
+    total = concurrency * calls
+    return {
+        'concurrency': concurrency,
+        'calls': total,
+        'errors': len(errors),
+        'seconds': elapsed,
+        'calls_per_sec': total / elapsed,
+    }
+
+
+def run(quick=False):
+    calls = 50 if quick else 300
+    results = {}
+    with local_server() as base_url:
+        spore = client(base_url)
+        for concurrency in CONCURRENCIES:
+            results['concurrency_%d' % concurrency] = _throughput(
+                spore, concurrency, calls
+            )
+    return results
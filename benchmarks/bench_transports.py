@@ -0,0 +1,61 @@
+# -*- coding: utf-8 -*-
+
+"""
+benchmarks.bench_transports
+~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+Per-call overhead of each transport against a local HTTP server, compared to
+raw ``requests`` and ``urllib3`` calls on the same server.
+"""
+
+import requests
+import urllib3
+
+from britney.core import Spore
+from britney.transport import RequestsTransport, Urllib3Transport
+
+from .utils import local_server, measure
+
+TRANSPORTS = (
+    ('requests', RequestsTransport),
+    ('urllib3', Urllib3Transport),
+)
+
+
+def client(base_url, transport):
+    spore = Spore(name='bench', base_url=base_url, methods={
+        'get_user': {
+            'method': 'GET',
+            'path': '/users/:id',
+            'required_params': ['id'],
+        }
+    })
+    spore.set_transport(transport)
+    return spore
+
+
+def run(quick=False):
+    number = 300 if quick else 3000
+    results = {}
+
+    with local_server() as base_url:
+        url = base_url + 'users/1'
+
+        session = requests.Session()
+        results['raw_requests'] = measure(lambda: session.get(url),
+                                          number=number)
+        pool = urllib3.PoolManager()
+        results['raw_urllib3'] = measure(lambda: pool.request('GET', url),
+                                         number=number)
+
+        for name, transport_class in TRANSPORTS:
+            with transport_class() as transport:
+                spore = client(base_url, transport)
+                results[name] = measure(lambda: spore.get_user(id=1),
+                                        number=number)
+
+    for name, raw in (('requests', 'raw_requests'),
+                      ('urllib3', 'raw_urllib3')):
+        results[name]['overhead_us'] = results[name]['per_call_us'] - \
+            results[raw]['per_call_us']
+    return results
@@ -0,0 +1,131 @@
+# -*- coding: utf-8 -*-
+
+"""
+benchmarks.utils
+~~~~~~~~~~~~~~~~
+
+Helpers shared by the benchmarks : timers, synthetic SPORE descriptions and a
+local HTTP server.
+"""
+
+import contextlib
+import gc
+import json
+import os
+import tempfile
+import threading
+import time
+
+from six.moves import BaseHTTPServer, socketserver
+
+clock = getattr(time, 'perf_counter', time.time)
+
+
+def measure(func, number, repeat=5):
+    """ Times *number* calls of *func*, *repeat* times, and keeps the best
+    run as the other ones are only slowed down by noise.
+
+    :return: a dict with the best time per call in microseconds, and the
+    number of calls per second it gives
+    """
+    timings = []
+    for _ in range(repeat):
+        gc_enabled = gc.isenabled()
+        gc.disable()
+        try:
+            start = clock()
+            for _ in range(number):
+                func()
+            timings.append((clock() - start) / number)
+        finally:
+            if gc_enabled:
+                gc.enable()
+    best = min(timings)
+    return {
+        'per_call_us': best * 1e6,
+        'calls_per_sec': 1.0 / best if best else None,
+        'number': number,
+        'repeat': repeat,
+    }
+
+
+def synthetic_description(methods, base_url='http://127.0.0.1:8000/'):
+    """ Builds a SPORE description with *methods* methods mixing required and
+    optional parameters, payloads and statuses
+    """
+    description = {
+        'name': 'Synthetic API',
+        'base_url': base_url,
+        'formats': ['json'],
+        'methods': {},
+    }
+    verbs = ('GET', 'POST', 'PUT', 'DELETE')
+    for index in range(methods):
+        description['methods']['method_%d' % index] = {
+            'method': verbs[index % len(verbs)],
+            'path': '/resource_%d/:id.:format' % index,
+            'required_params': ['id', 'format'],
+            'optional_params': ['page', 'per_page', 'sort'],
+            'expected_status': [200, 201, 404],
+            'description': 'Synthetic method number %d' % index,
+        }
+    return description
+
+
+@contextlib.contextmanager
+def description_file(description):
+    """ Writes a description to a temporary file and yields its path
+    """
+    handle, path = tempfile.mkstemp(suffix='.json')
+    try:
+        with os.fdopen(handle, 'w') as spec_file:
+            json.dump(description, spec_file)
+        yield path
+    finally:
+        os.remove(path)
+
+
+class _Handler(BaseHTTPServer.BaseHTTPRequestHandler):
+
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+
+    def _respond(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        if length:
+            self.rfile.read(length)
+        body = self.server.bodies.get(self.path.split('?')[0],
+                                      self.server.default_body)
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    do_GET = do_POST = do_PUT = do_PATCH = do_DELETE = _respond
+
+    def log_message(self, *args):
+        pass
+
+
+class _ThreadingServer(socketserver.ThreadingMixIn, BaseHTTPServer.HTTPServer):
+
+    daemon_threads = True
+
+
+@contextlib.contextmanager
+def local_server(bodies=None, default_body=b'{"result": "ok"}'):
+    """ Runs a threaded HTTP/1.1 server on a free local port and yields its
+    base url. *bodies* maps paths to the bytes they respond.
+    """
+    server = _ThreadingServer(('127.0.0.1', 0), _Handler)
+    server.bodies = bodies or {}
+    server.default_body = default_body
+    thread = threading.Thread(target=server.serve_forever)
+    thread.daemon = True
+    thread.start()
+    try:
+        yield 'http://127.0.0.1:%d/' % server.server_address[1]
+    finally:
+        server.shutdown()
+        server.server_close()
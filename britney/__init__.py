@@ -15,7 +15,7 @@ import json
 from .errors import SporeMethodStatusError as HTTPError
 
 
-def new(spec_uri, base_url=None):
+def new(spec_uri, base_url=None, transport=None):
     """
     """
     from .core import Spore
@@ -29,7 +29,29 @@ def new(spec_uri, base_url=None):
     if base_url is not None:
         api_description.update({'base_url': base_url})
 
-    return Spore(**api_description)
+    client = Spore(**api_description)
+    if transport is not None:
+        client.set_transport(transport)
+    return client
+
+
+def get_client(spec_uri, base_url=None, middlewares=(), transport=None):
+    """ Returns the client of a description shared by the whole process,
+    built again when the description file changes. Clients share one
+    transport, and so the connections to their hosts.
+    See :py:class:`~britney.registry.Registry`
+
+    :param spec_uri: the path or url of the description
+    :param base_url: the base url replacing the one of the description
+    (defaults to None)
+    :param middlewares: the middlewares enabled on the client, as names or
+    classes, or (middleware, dict of named arguments) tuples
+    :param transport: the transport of the client (defaults to the shared
+    one)
+    """
+    from .registry import registry
+    return registry.get(spec_uri, base_url=base_url, middlewares=middlewares,
+                        transport=transport)
 
 
 def _new_from_file(spec_uri):
@@ -0,0 +1,265 @@
+# -*- coding: utf-8 -*-
+
+"""
+britney.batch
+~~~~~~~~~~~~~
+
+Sending many calls in one multipart/mixed HTTP request, for services exposing
+a batch endpoint. The endpoint is set in the description with the *batch*
+key, described like a method : ::
+
+    {
+        "name": "My API",
+        "base_url": "http://my-server/api/",
+        "batch": {
+            "method": "POST",
+            "path": "/batch",
+            "max_size": 100
+        },
+        "methods": {...}
+    }
+
+Each call of a batch goes through the middlewares like a single call. It is
+rendered as an application/http part of the batch request, and the part of the
+batch response with the same Content-ID is checked and decoded as its
+response.
+"""
+
+from functools import partial
+import re
+import uuid
+
+import requests
+from requests.structures import CaseInsensitiveDict
+from requests.utils import get_encoding_from_headers
+
+from . import errors
+from .middleware import base
+from .request import RequestBuilder
+
+_BOUNDARY_P = re.compile(r'boundary="?([^";]+)"?')
+_CONTENT_ID_P = re.compile(r'<(?:response-)?([^>]+)>')
+
+
+class BatchCall(object):
+    """ A call recorded in a batch. Its response is available once the batch
+    is sent.
+    """
+
+    def __init__(self, method, environ, hooks, response=None):
+        self.method = method
+        self.environ = environ
+        self.hooks = hooks
+        self.request = None
+        self.content_id = uuid.uuid4().hex
+        self._response = response
+        self._error = None
+
+    def __repr__(self):
+        return '<BatchCall [{}]>'.format(self.method.name)
+
+    @property
+    def done(self):
+        return self._response is not None or self._error is not None
+
+    @property
+    def response(self):
+        """ The response of the call
+
+        :raises: ~britney.errors.SporeMethodStatusError
+        :raises: ~britney.errors.SporeMethodCallError when the batch has not
+        been sent
+        """
+        if self._error is not None:
+            raise self._error
+        if self._response is None:
+            raise errors.SporeMethodCallError('Batch has not been sent')
+        return self._response
+
+    def resolve(self, response):
+        try:
+            self._response = self.method.process_response(response,
+                                                          self.hooks)
+        except errors.SporeMethodStatusError as error:
+            self._error = error
+
+    def fail(self, error):
+        self._error = error
+
+    def render(self):
+        """ Renders the call as an application/http message
+        """
+        lines = ['%s %s HTTP/1.1' % (self.request.method,
+                                     self.request.path_url)]
+        lines.extend('%s: %s' % header
+                     for header in self.request.headers.items())
+        body = self.request.body or b''
+        if not isinstance(body, bytes):
+            body = body.encode('utf-8')
+        return ('\r\n'.join(lines) + '\r\n\r\n').encode('utf-8') + body
+
+
+class Batch(object):
+    """ Collects calls of a client and sends them in multipart/mixed requests
+    to the batch endpoint of the service. Use it as a context manager, the
+    calls being sent when leaving it : ::
+
+        with client.batch() as batch:
+            first = batch.get_user(id=1)
+            second = batch.get_user(id=2)
+
+        first.response.data
+
+    :param client: the :py:class:`~britney.core.Spore` client
+    :param method: the :py:class:`~britney.core.SporeMethod` of the batch
+    endpoint
+    :param max_size: the maximum number of calls in a batch request (defaults
+    to None for no limit)
+    """
+
+    def __init__(self, client, method, max_size=None):
+        self.client = client
+        self.method = method
+        self.max_size = max_size
+        self.calls = []
+
+    def __repr__(self):
+        return '<Batch [{} calls]>'.format(len(self.calls))
+
+    def __getattr__(self, name):
+        method = self.client.get_method(name)
+        if method is None:
+            raise AttributeError(name)
+        return partial(self.add, method)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.send()
+
+    def add(self, method, **kwargs):
+        """ Records a call of a method. Its request goes through the
+        middlewares right away.
+
+        :rtype: ~britney.batch.BatchCall
+        """
+        environ = method.build_environ(kwargs)
+        hooks, response = method.process_request(environ)
+        call = BatchCall(method, environ, hooks, response)
+        if response is None:
+            call.request = RequestBuilder(environ)()
+        self.calls.append(call)
+        return call
+
+    def send(self):
+        """ Sends the pending calls
+        """
+        pending = [call for call in self.calls if not call.done]
+        size = self.max_size or len(pending)
+        for start in range(0, len(pending), size or 1):
+            self._send(pending[start:start + size])
+
+    def _send(self, calls):
+        boundary = uuid.uuid4().hex
+        body = b''.join(
+            ('--%s\r\nContent-Type: application/http\r\n'
+             'Content-ID: <%s>\r\n\r\n' % (boundary, call.content_id)
+             ).encode('utf-8') + call.render() + b'\r\n'
+            for call in calls
+        ) + ('--%s--\r\n' % boundary).encode('utf-8')
+
+        content_type = 'multipart/mixed; boundary=%s' % boundary
+        environ = self.method.build_environ({})
+        environ['spore.payload'] = body
+        environ['spore.payload_format'] = content_type
+        base.add_header(environ, 'Content-Type', content_type)
+        base.add_header(environ, 'Content-Length', str(len(body)))
+
+        _, response = self.method.process_request(environ)
+        if response is None:
+            response = self.method.send(environ)
+        self.method.check_status(response)
+
+        parts = parse_multipart(response)
+        by_id = dict((content_id, part) for content_id, part in parts
+                     if content_id)
+        for index, call in enumerate(calls):
+            part = by_id.get(call.content_id)
+            if part is None and not by_id and index < len(parts):
+                part = parts[index][1]
+            if part is None:
+                call.fail(errors.SporeMethodCallError(
+                    'No response for this call in the batch response'
+                ))
+                continue
+            try:
+                part_response = build_response(part, call)
+            except errors.SporeMethodCallError as part_error:
+                call.fail(part_error)
+                continue
+            call.resolve(part_response)
+
+
+def parse_multipart(response):
+    """ Splits a multipart/mixed response into its parts
+
+    :return: a list of (content id, part content) tuples
+    """
+    match = _BOUNDARY_P.search(response.headers.get('Content-Type', ''))
+    if match is None:
+        raise errors.SporeMethodCallError('Batch response is not multipart')
+    delimiter = ('--' + match.group(1)).encode('utf-8')
+
+    parts = []
+    for chunk in response.content.split(delimiter)[1:]:
+        if chunk.startswith(b'--'):
+            break
+        _, headers, content = _split_message(chunk.lstrip(b'\r\n'))
+        content_id = _CONTENT_ID_P.search(headers.get('Content-ID', ''))
+        parts.append((content_id.group(1) if content_id else None,
+                      content[:-2] if content.endswith(b'\r\n') else content))
+    return parts
+
+
+def _split_message(message, start_line=False):
+    for separator in (b'\r\n\r\n', b'\n\n'):
+        head, found, body = message.partition(separator)
+        if found:
+            break
+    lines = head.decode('iso-8859-1').splitlines()
+    first_line = lines.pop(0) if start_line and lines else ''
+    headers = CaseInsensitiveDict()
+    for line in lines:
+        name, _, value = line.partition(':')
+        headers[name.strip()] = value.strip()
+    return first_line, headers, body
+
+
+def build_response(part, call):
+    """ Builds the response of a call from its application/http part
+
+    :raises: ~britney.errors.SporeMethodCallError when the status line of the
+    part is malformed
+    """
+    status_line, headers, content = _split_message(part, start_line=True)
+    _, status, reason = (status_line.split(' ', 2) + ['', ''])[:3]
+    try:
+        status_code = int(status)
+    except ValueError:
+        raise errors.SporeMethodCallError(
+            'Malformed status line %r in the part <%s> of the batch response '
+            'to %s' % (status_line, call.content_id, call.method.name)
+        )
+
+    response = requests.Response()
+    response.status_code = status_code
+    response.reason = reason
+    response.headers = headers
+    response.encoding = get_encoding_from_headers(headers)
+    response._content = content
+    response.url = call.request.url
+    response.request = call.request
+    response.environ = call.environ
+    return response
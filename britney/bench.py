@@ -0,0 +1,210 @@
+# -*- coding: utf-8 -*-
+
+"""
+britney.bench
+~~~~~~~~~~~~~
+
+Generates load on a method of a client, at a given concurrency or rate, and
+reports its throughput, its latency percentiles and its errors : ::
+
+    import britney
+    from britney.bench import LoadGenerator
+
+    client = britney.new('/path/to/api.json')
+    report = LoadGenerator(client.get_user, [{'id': 1}, {'id': 2}],
+                           concurrency=8, duration=10).run()
+    print(report.format())
+
+At a given rate, calls are started on schedule whatever the latency of the
+previous ones, and their latency is measured from the time they should have
+started, so that a slow upstream doesn't hide its own slowness.
+"""
+
+import collections
+import itertools
+import threading
+import time
+
+from concurrent.futures import ThreadPoolExecutor
+
+from . import errors
+from .tracing import percentile
+
+clock = getattr(time, 'perf_counter', time.time)
+
+#: the percentiles of the latencies reported
+PERCENTILES = (50, 90, 99, 99.9)
+
+
+def outcome(call, kwargs):
+    """ Calls a method and returns the status of the response, or the status
+    of the error response, or the name of the exception raised
+    """
+    try:
+        return call(**kwargs).status_code
+    except errors.SporeMethodStatusError as error:
+        return error.response.status_code
+    except Exception as error:
+        return type(error).__name__
+
+
+class Report(object):
+    """ Results of a load test
+
+    :param method: the name of the method called
+    :param duration: the duration of the test, in seconds
+    :param calls: a list of (latency in seconds, outcome) tuples, outcomes
+    being statuses or names of exceptions
+    """
+
+    def __init__(self, method, duration, calls):
+        self.method = method
+        self.duration = duration
+        self.latencies = sorted(latency for latency, _ in calls)
+        self.outcomes = collections.Counter(result for _, result in calls)
+
+    def __repr__(self):
+        return '<Report [{} calls]>'.format(len(self.latencies))
+
+    @property
+    def calls(self):
+        return len(self.latencies)
+
+    @property
+    def throughput(self):
+        """ The number of calls per second
+        """
+        return self.calls / self.duration if self.duration else 0.0
+
+    @property
+    def percentiles(self):
+        """ The latencies in seconds, by percentile
+        """
+        return dict((rank, percentile(self.latencies, rank))
+                    for rank in PERCENTILES)
+
+    @property
+    def errors(self):
+        """ The number of failed calls, by status or exception name
+        """
+        return dict((result, count) for result, count in self.outcomes.items()
+                    if not isinstance(result, int) or result >= 400)
+
+    def to_dict(self):
+        return {
+            'method': self.method,
+            'duration': self.duration,
+            'calls': self.calls,
+            'throughput': self.throughput,
+            'latency': dict(
+                [('p%s' % rank, value)
+                 for rank, value in self.percentiles.items()] +
+                [('max', self.latencies[-1] if self.latencies else None)]
+            ),
+            'statuses': dict((str(result), count)
+                             for result, count in self.outcomes.items()),
+            'errors': dict((str(result), count)
+                           for result, count in self.errors.items()),
+        }
+
+    def format(self):
+        """ Describes the report in a few lines of text
+        """
+        lines = ['%s: %d calls in %.2fs, %.1f calls/s' % (
+            self.method, self.calls, self.duration, self.throughput
+        )]
+        if self.latencies:
+            lines.append('latency (ms): ' + '  '.join(
+                'p%s %.2f' % (rank, self.percentiles[rank] * 1000)
+                for rank in PERCENTILES
+            ) + '  max %.2f' % (self.latencies[-1] * 1000))
+        failures = sorted(self.errors.items(), key=lambda item: -item[1])
+        lines.append('errors: ' + (', '.join(
+            '%s: %d' % (result, count) for result, count in failures
+        ) if failures else 'none'))
+        return '\n'.join(lines)
+
+
+class LoadGenerator(object):
+    """ Calls a method with a stream of parameters for a fixed duration
+
+    :param method: the method of a client to call
+    :param params: an iterable of dicts of parameters. The test stops early
+    when it is exhausted (defaults to calls without parameters)
+    :param concurrency: the number of calls in flight at most (defaults to 1)
+    :param rate: the number of calls started per second. Without a rate,
+    each of the *concurrency* threads starts a call as soon as its previous
+    one ends (defaults to None)
+    :param duration: the duration of the test, in seconds (defaults to 10)
+    """
+
+    def __init__(self, method, params=None, concurrency=1, rate=None,
+                 duration=10):
+        self.method = method
+        self.params = iter(params if params is not None
+                           else itertools.repeat({}))
+        self.concurrency = concurrency
+        self.rate = rate
+        self.duration = duration
+        self.calls = []
+        self._lock = threading.Lock()
+
+    def __repr__(self):
+        return '<LoadGenerator [{}]>'.format(
+            getattr(self.method, 'name', self.method)
+        )
+
+    def next_params(self):
+        """ Returns the parameters of the next call, or None when there are
+        no more
+        """
+        with self._lock:
+            return next(self.params, None)
+
+    def call(self, kwargs, scheduled):
+        result = outcome(self.method, dict(kwargs))
+        self.calls.append((clock() - scheduled, result))
+
+    def closed_loop(self, deadline):
+        while clock() < deadline:
+            kwargs = self.next_params()
+            if kwargs is None:
+                return
+            self.call(kwargs, clock())
+
+    def open_loop(self, start, deadline):
+        interval = 1.0 / self.rate
+        with ThreadPoolExecutor(self.concurrency) as executor:
+            for index in itertools.count():
+                scheduled = start + index * interval
+                if scheduled >= deadline:
+                    break
+                kwargs = self.next_params()
+                if kwargs is None:
+                    break
+                delay = scheduled - clock()
+                if delay > 0:
+                    time.sleep(delay)
+                executor.submit(self.call, kwargs, scheduled)
+
+    def run(self):
+        """ Runs the test
+
+        :rtype: Report
+        """
+        self.calls = []
+        start = clock()
+        deadline = start + self.duration
+        if self.rate:
+            self.open_loop(start, deadline)
+        else:
+            threads = [threading.Thread(target=self.closed_loop,
+                                        args=(deadline,))
+                       for _ in range(self.concurrency)]
+            for thread in threads:
+                thread.daemon = True
+                thread.start()
+            for thread in threads:
+                thread.join()
+        return Report(getattr(self.method, 'name', repr(self.method)),
+                      clock() - start, self.calls)
@@ -0,0 +1,185 @@
+# -*- coding: utf-8 -*-
+
+"""
+britney.cli
+~~~~~~~~~~~
+
+The ``britney`` command.
+
+``britney compile`` compiles a description into a Python module and its
+stubs (see :py:mod:`britney.compiler`) : ::
+
+    $> britney compile api.json -o api_client.py
+
+``britney bench`` calls a method of a description at a given concurrency or
+rate for a fixed duration, and reports its throughput, latency percentiles
+and errors by status : ::
+
+    $> britney bench api.json get_user --base-url http://localhost:8000/ \\
+           --params-file users.jsonl --concurrency 16 --duration 30
+    $> britney bench api.json get_user --stub --param id=1 --rate 500
+"""
+
+from __future__ import print_function
+
+import argparse
+import importlib
+import itertools
+import json
+import os
+import sys
+
+from . import errors, new
+from .bench import LoadGenerator
+
+
+def _transport(name):
+    from . import transport
+    return {
+        'requests': transport.RequestsTransport,
+        'urllib3': transport.Urllib3Transport,
+        'http2': transport.Http2Transport,
+    }[name]()
+
+
+def _params_file(path):
+    """ Reads dicts of parameters from a JSON list or from JSON lines
+    """
+    with open(path) as params_file:
+        content = params_file.read().strip()
+    if content.startswith('['):
+        return json.loads(content)
+    return [json.loads(line) for line in content.splitlines() if line.strip()]
+
+
+def _generator(path):
+    """ Imports a callable from a ``module:function`` path and calls it
+    """
+    module_name, _, func_name = path.partition(':')
+    return getattr(importlib.import_module(module_name), func_name)()
+
+
+def params(args):
+    """ The stream of parameters of the calls, from the command line
+    """
+    if args.params_generator:
+        return _generator(args.params_generator)
+    fixed = dict(param.split('=', 1) for param in args.param or [])
+    if args.params_file:
+        return itertools.cycle([dict(fixed, **kwargs)
+                                for kwargs in _params_file(args.params_file)])
+    return itertools.repeat(fixed)
+
+
+def bench(args):
+    server = None
+    base_url = args.base_url
+    if args.stub:
+        from . import stub
+        server = stub.serve(args.spec)
+        base_url = server.base_url
+    try:
+        client = new(args.spec, base_url=base_url,
+                     transport=_transport(args.transport))
+        for middleware in args.enable or []:
+            client.enable(middleware)
+        method = getattr(client, args.method, None)
+        if method is None:
+            print('Unknown method %s' % args.method, file=sys.stderr)
+            return 2
+        report = LoadGenerator(method, params(args),
+                               concurrency=args.concurrency, rate=args.rate,
+                               duration=args.duration).run()
+    finally:
+        if server is not None:
+            server.stop()
+    if args.json:
+        print(json.dumps(report.to_dict(), indent=2, sort_keys=True))
+    else:
+        print(report.format())
+    return 0
+
+
+def compile_(args):
+    from .compiler import compile_file
+    output = args.output or os.path.splitext(
+        os.path.basename(args.spec))[0] + '.py'
+    try:
+        written = compile_file(args.spec, output, stubs=not args.no_stubs)
+    except errors.SporeClientBuildError as build_error:
+        described = dict(build_error.errors)
+        for name, error in described.pop('methods', {}).items():
+            described.setdefault('methods', {})[name] = getattr(
+                error, 'errors', str(error)
+            )
+        print('Invalid description %s' % args.spec, file=sys.stderr)
+        print(json.dumps(described, indent=2, sort_keys=True),
+              file=sys.stderr)
+        return 1
+    except ValueError as decode_error:
+        print('Invalid description %s: %s' % (args.spec, decode_error),
+              file=sys.stderr)
+        return 1
+    for path in written:
+        print(path)
+    return 0
+
+
+def parser():
+    main_parser = argparse.ArgumentParser(prog='britney')
+    commands = main_parser.add_subparsers(dest='command')
+    commands.required = True
+
+    bench_parser = commands.add_parser(
+        'bench', help='generates load on a method of a description'
+    )
+    bench_parser.add_argument('spec', help='path or url of the description')
+    bench_parser.add_argument('method', help='name of the method to call')
+    bench_parser.add_argument('--base-url', help='replaces the base url of '
+                              'the description')
+    bench_parser.add_argument('--param', action='append', metavar='NAME=VALUE',
+                              help='parameter of every call')
+    bench_parser.add_argument('--params-file', help='JSON list or JSON lines '
+                              'of the parameters of the calls, used in turn')
+    bench_parser.add_argument('--params-generator', metavar='MODULE:FUNCTION',
+                              help='function returning an iterable of the '
+                              'parameters of the calls')
+    bench_parser.add_argument('--concurrency', '-c', type=int, default=1,
+                              help='calls in flight at most (defaults to 1)')
+    bench_parser.add_argument('--rate', '-r', type=float,
+                              help='calls started per second, whatever the '
+                              'latency (defaults to as fast as possible)')
+    bench_parser.add_argument('--duration', '-d', type=float, default=10,
+                              help='duration in seconds (defaults to 10)')
+    bench_parser.add_argument('--transport', default='requests',
+                              choices=('requests', 'urllib3', 'http2'),
+                              help='transport of the client')
+    bench_parser.add_argument('--enable', action='append',
+                              metavar='MIDDLEWARE',
+                              help='middleware enabled by name, like Json')
+    bench_parser.add_argument('--stub', action='store_true',
+                              help='calls a local stub server of the '
+                              'description, to measure the client')
+    bench_parser.add_argument('--json', action='store_true',
+                              help='prints the report as JSON')
+    bench_parser.set_defaults(func=bench)
+
+    compile_parser = commands.add_parser(
+        'compile', help='compiles a description into a Python module'
+    )
+    compile_parser.add_argument('spec', help='path or url of the description')
+    compile_parser.add_argument('--output', '-o', help='path of the module '
+                                '(defaults to the name of the description)')
+    compile_parser.add_argument('--no-stubs', action='store_true',
+                                help="doesn't write the .pyi stubs")
+    compile_parser.set_defaults(func=compile_)
+    return main_parser
+
+
+def main(argv=None):
+    args = parser().parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
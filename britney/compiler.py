@@ -0,0 +1,355 @@
+# -*- coding: utf-8 -*-
+
+"""
+britney.compiler
+~~~~~~~~~~~~~~~~
+
+Compiles a SPORE description ahead of time into a Python module, with a
+class per method and a client class, and its ``.pyi`` stubs : ::
+
+    $> britney compile api.json -o api_client.py
+
+The description is validated once, when compiled. Importing the module and
+building its client skip the validation and the parsing of the
+description : ::
+
+    import api_client
+
+    client = api_client.new(base_url='http://my-server/ws/api/')
+    client.enable('Json')
+    client.get_user(id=1)
+
+Compiled clients are :py:class:`~britney.core.Spore` clients : middlewares,
+tracing, pagination, bulk lookups and batches work the same way.
+"""
+
+import importlib
+import keyword
+import os
+import pprint
+import re
+import textwrap
+import threading
+
+from . import errors
+from .core import Spore, SporeMethod, _clients
+from .request import RequestBuilder
+from .transport import RequestsTransport
+
+_IDENTIFIER_P = re.compile(r'^[A-Za-z_]\w*$')
+
+# names defined or imported by the compiled modules and their stubs
+_MODULE_NAMES = ('Any', 'Client', 'CompiledClient', 'CompiledMethod',
+                 'Optional', 'new')
+
+# keys of a description describing the client, not its methods
+_CLIENT_KEYS = ('name', 'base_url', 'authority', 'formats', 'version',
+                'authentication', 'meta')
+
+
+class CompiledMethod(SporeMethod):
+    """ A method compiled from its description. The description is checked
+    when compiled, and the sets of parameters are computed then.
+
+    .. py:attribute:: spec
+
+        the description of the method
+
+    .. py:attribute:: required_set
+
+        the required parameters, as a frozenset
+
+    .. py:attribute:: params_set
+
+        all the parameters, as a frozenset
+    """
+
+    __slots__ = ()
+
+    spec = {}
+    required_set = frozenset()
+    params_set = frozenset()
+
+    def __new__(cls, *args, **kwargs):
+        # checked when compiled
+        return object.__new__(cls)
+
+    def __init__(self, base_url, middlewares, defaults, transport,
+                 global_authentication=None, global_formats=None):
+        super(CompiledMethod, self).__init__(
+            api_base_url=base_url, middlewares=middlewares, defaults=defaults,
+            transport=transport, global_authentication=global_authentication,
+            global_formats=global_formats, **self.spec
+        )
+
+    def is_a_param(self, param):
+        return param in self.params_set
+
+    def build_params(self, **kwargs):
+        """ Checks the parameters of a call, like
+        :py:meth:`~britney.core.SporeMethod.build_params` does, with the sets
+        of parameters computed when compiled
+        """
+        defaults = self.get_defaults()
+        if not kwargs and not defaults:
+            if self.required_set:
+                raise errors.SporeMethodCallError(
+                    'Required parameters are missing',
+                    expected=set(self.required_set)
+                )
+            return []
+
+        all_args = set(kwargs).union(defaults)
+        if not self.required_set.issubset(all_args):
+            raise errors.SporeMethodCallError(
+                'Required parameters are missing',
+                expected=self.required_set - set(kwargs)
+            )
+        if all_args - self.params_set:
+            raise errors.SporeMethodCallError(
+                'Too much parameter', expected=set(kwargs) - self.params_set
+            )
+
+        kwargs.update(**defaults)
+        return list(kwargs.items())
+
+
+class CompiledClient(Spore):
+    """ A client compiled from its description
+
+    .. py:attribute:: spec
+
+        the description of the client, without its methods
+
+    .. py:attribute:: batch_spec
+
+        the description of the batch endpoint, or None
+
+    .. py:attribute:: method_classes
+
+        the :py:class:`CompiledMethod` classes of the methods
+
+    :param base_url: the base url replacing the one of the description
+    (defaults to None)
+    :param transport: the transport of the client (defaults to a new
+    :py:class:`~britney.transport.RequestsTransport`)
+    """
+
+    spec = {}
+    batch_spec = None
+    method_classes = ()
+
+    def __new__(cls, *args, **kwargs):
+        # checked when compiled
+        return object.__new__(cls)
+
+    def __init__(self, base_url=None, transport=None):
+        spec = dict(self.spec)
+        if base_url is not None:
+            spec['base_url'] = base_url
+        if not spec.get('base_url'):
+            raise errors.SporeClientBuildError({
+                'base_url': 'A base URL to the REST Web Service is required'
+            }, {})
+        super(CompiledClient, self).__init__(**spec)
+        self._lock = threading.Lock()
+        self._middlewares = []
+        self._defaults = {}
+        self._methods = {}
+        self.transport = transport if transport is not None \
+            else RequestsTransport()
+        _clients.add(self)
+
+        for method_class in self.method_classes:
+            method = method_class(self.base_url, self._middlewares,
+                                  self._defaults, self.transport,
+                                  spec.get('authentication'),
+                                  spec.get('formats'))
+            setattr(self, method.name, method)
+            self._methods[method.name] = method
+        self._build_loaders()
+        self._build_batch(self.batch_spec, self.base_url,
+                          spec.get('authentication'), spec.get('formats'))
+
+    @property
+    def _middlewares_module(self):
+        # imported when a middleware is enabled by name only
+        return importlib.import_module('britney.middleware')
+
+
+def _class_name(name, taken):
+    class_name = ''.join(
+        part[:1].upper() + part[1:] for part in re.split(r'\W|_', name)
+    ) + 'Method'
+    if not _IDENTIFIER_P.match(class_name):
+        class_name = '_' + class_name
+    candidate, index = class_name, 2
+    while candidate in taken:
+        candidate, index = '%s%d' % (class_name, index), index + 1
+    taken.add(candidate)
+    return candidate
+
+
+def _literal(value, indent):
+    lines = pprint.pformat(value, width=79 - indent).splitlines()
+    return ('\n' + ' ' * indent).join(lines)
+
+
+def _docstring(text, indent):
+    text = ' '.join(text.split())
+    if not text or '"""' in text or '\\' in text or text.endswith('"'):
+        return '%s__doc__ = %r\n' % (' ' * indent, text) if text else ''
+    prefix = ' ' * indent
+    return '%s\n%s"""\n' % (
+        textwrap.fill(text, 79, initial_indent=prefix + '""" ',
+                      subsequent_indent=prefix), prefix
+    )
+
+
+def _identifier(name):
+    return bool(_IDENTIFIER_P.match(name)) and not keyword.iskeyword(name)
+
+
+def _method_spec(description):
+    spec = dict(description)
+    # placeholders in the form parsed by RequestBuilder
+    spec['path'] = RequestBuilder._OLD_PLACEHOLDER_P.sub(r'{\1}',
+                                                         spec['path'])
+    return spec
+
+
+def check(description):
+    """ Builds a client from a description, to check it. The base url may be
+    left to the clients of the compiled module.
+
+    :raises: ~britney.errors.SporeClientBuildError
+    """
+    return Spore(**dict(description, base_url=description.get('base_url') or
+                        'http://localhost/'))
+
+
+def compile_description(description, source=''):
+    """ Compiles a description into the source of a module and of its stubs
+
+    :param description: the description, as a dict
+    :param source: where the description comes from, for the docstring of
+    the module
+    :return: the source of the module and the source of its stubs
+    :raises: ~britney.errors.SporeClientBuildError
+    """
+    check(description)
+
+    taken = set(_MODULE_NAMES)
+    methods = []
+    for name in sorted(description['methods']):
+        spec = _method_spec(dict(description['methods'][name], name=name))
+        methods.append((_class_name(name, taken), name, spec))
+
+    client_spec = dict((key, description[key]) for key in _CLIENT_KEYS
+                       if key in description)
+    header = (
+        '# -*- coding: utf-8 -*-\n\n'
+        '"""\n'
+        'Client of %s, compiled by britney%s.\n\n'
+        'Do not edit : compile the description again instead.\n'
+        '"""\n\n' % (description['name'],
+                     ' from %s' % source if source else '')
+    )
+
+    module = [header, 'from britney.compiler import CompiledClient, '
+              'CompiledMethod\n']
+    for class_name, name, spec in methods:
+        required = spec.get('required_params') or []
+        params = required + (spec.get('optional_params') or [])
+        module.append(
+            '\n\nclass %s(CompiledMethod):\n%s\n'
+            '    __slots__ = ()\n'
+            '    spec = %s\n'
+            '    required_set = frozenset(%s)\n'
+            '    params_set = frozenset(%s)\n' % (
+                class_name,
+                _docstring(spec.get('documentation') or
+                           spec.get('description') or name, 4),
+                _literal(spec, 11), _literal(sorted(set(required)), 29),
+                _literal(sorted(set(params)), 27)
+            )
+        )
+    module.append(
+        '\n\nclass Client(CompiledClient):\n%s\n'
+        '    spec = %s\n'
+        '    batch_spec = %s\n'
+        '    method_classes = (\n%s    )\n' % (
+            _docstring(description['name'], 4),
+            _literal(client_spec, 11),
+            _literal(description.get('batch'), 17),
+            ''.join('        %s,\n' % class_name
+                    for class_name, _, _ in methods)
+        )
+    )
+    module.append(
+        '\n\ndef new(base_url=None, transport=None):\n'
+        '    """ Builds a client of %s\n    """\n'
+        '    return Client(base_url=base_url, transport=transport)\n'
+        % description['name']
+    )
+
+    stubs = ['from typing import Any, Optional\n\n'
+             'from britney.compiler import CompiledClient, CompiledMethod\n']
+    for class_name, name, spec in methods:
+        arguments = ['self', '*']
+        for param in spec.get('required_params') or []:
+            if _identifier(param):
+                arguments.append('%s: Any' % param)
+        for param in spec.get('optional_params') or []:
+            if _identifier(param) and \
+                    param not in (spec.get('required_params') or []):
+                arguments.append('%s: Any = ...' % param)
+        arguments.append('payload: Any' if spec.get('required_payload')
+                         else 'payload: Any = ...')
+        arguments.append('files: Any = ...')
+        arguments.append('payload_format: Any = ...')
+        arguments.append('download_to: Any = ...')
+        if not all(_identifier(param) for param in
+                   (spec.get('required_params') or []) +
+                   (spec.get('optional_params') or [])):
+            arguments.append('**kwargs: Any')
+        stubs.append('\n\nclass %s(CompiledMethod):\n'
+                     '    def __call__(%s) -> Any: ...\n'
+                     % (class_name, ', '.join(arguments)))
+    stubs.append('\n\nclass Client(CompiledClient):\n')
+    for class_name, name, _ in methods:
+        if _identifier(name):
+            stubs.append('    %s: %s\n' % (name, class_name))
+    stubs.append('    def __init__(self, base_url: Optional[str] = ..., '
+                 'transport: Any = ...) -> None: ...\n')
+    stubs.append('\n\ndef new(base_url: Optional[str] = ..., '
+                 'transport: Any = ...) -> Client: ...\n')
+
+    return ''.join(module), ''.join(stubs)
+
+
+def compile_file(spec_uri, output, stubs=True):
+    """ Compiles a description file into a module, and its stubs beside it
+
+    :param spec_uri: the path or url of the description
+    :param output: the path of the module
+    :param stubs: writes the ``.pyi`` stubs too (defaults to True)
+    :return: the paths written
+    :raises: ~britney.errors.SporeClientBuildError
+    """
+    from . import _new_from_file, _new_from_url
+    if spec_uri.startswith('http'):
+        description = _new_from_url(spec_uri)
+    else:
+        description = _new_from_file(spec_uri)
+
+    module, stub = compile_description(description,
+                                       source=os.path.basename(spec_uri))
+    written = [output]
+    with open(output, 'w') as module_file:
+        module_file.write(module)
+    if stubs:
+        written.append(os.path.splitext(output)[0] + '.pyi')
+        with open(written[-1], 'w') as stub_file:
+            stub_file.write(stub)
+    return written
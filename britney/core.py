@@ -10,17 +10,66 @@ See https://github.com/SPORE/specifications/blob/master/spore_description.pod
 for more information about SPORE descriptions
 """
 
-from functools import reduce
-import requests
-from requests.compat import urlparse
-import requests.models
+from functools import partial, reduce
+import importlib
+import os
+import threading
+import weakref
+
+from requests.compat import unquote, urlparse
+from requests.utils import super_len
 import six
+from six.moves import intern
 
 from . import errors
-from .request import RequestBuilder
+from .batch import Batch
+from .download import build_download
+from .environ import Environ
+from .hedging import Attempt, Hedger, build_hedge, check_hedge
+from .loader import DEFAULTS as BULK_DEFAULTS
+from .loader import Loader, build_bulk
+from .pagination import STYLES as PAGINATION_STYLES
+from .pagination import Paginator, build_pagination
+from .request import UNIX_SCHEME
+from .response import RESPONSE_TYPES
+from .tracing import Tracer
+from .transport import WARMUP_ERRORS, RequestsTransport
 from .utils import get_user_agent
 
 
+# clients of the process, reset in the children it forks
+_clients = weakref.WeakSet()
+
+
+def _call_after_fork(objects):
+    """ Calls the *after_fork* method of each object once
+    """
+    seen = set()
+    for obj in objects:
+        after_fork = getattr(obj, 'after_fork', None)
+        if after_fork is not None and id(obj) not in seen:
+            seen.add(id(obj))
+            after_fork()
+
+
+def _with_limits(transports):
+    return list(transports) + [getattr(transport, 'limits', None)
+                               for transport in transports]
+
+
+def _after_fork():
+    # transports may be shared by several clients
+    transports = []
+    for client in list(_clients):
+        client.after_fork(reset_transports=False)
+        transports.extend(client._transports())
+    _call_after_fork(_with_limits(transports))
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_after_fork)
+
+
 class Spore(object):
     """ Base class generating at run-time the Spore HTTP Client to a REST
     Environment.
@@ -36,6 +85,17 @@ class Spore(object):
     :param methods: a dict containing the methods information that will
     instantiate a :py:class:`~britney.core.SporeMethod` (required)
     :param meta: meta information about the description and the service
+    :param batch: a dict describing the batch endpoint of the REST Web Service
+    like a method, with an optional *max_size* key. See :py:mod:`britney.batch`
+    (defaults to None)
+
+    A client can be shared by many threads. Enabling middlewares or changing
+    defaults never modifies the list of middlewares or the dict of defaults in
+    place : a new one replaces it in the client and its methods, so that each
+    call reads a consistent snapshot without locking.
+
+    A client built before the process forks can be used in the child : its
+    connections and locks are replaced there (see :py:meth:`after_fork`).
     """
 
     def __new__(cls, *args, **kwargs):
@@ -59,24 +119,38 @@ class Spore(object):
             setattr(cls, '_middlewares_module', middlewares_module)
 
             instance = super(Spore, cls).__new__(cls)
-            setattr(instance, 'middlewares', [])
-            setattr(instance, 'defaults', {})
+            setattr(instance, '_lock', threading.Lock())
+            setattr(instance, '_middlewares', [])
+            setattr(instance, '_defaults', {})
+            setattr(instance, '_methods', {})
+            setattr(instance, 'transport', RequestsTransport())
+
+            _clients.add(instance)
 
             for method_name, method_description in kwargs['methods'].items():
                 try:
                     method = SporeMethod(
                         name=method_name,
-                        base_url=kwargs['base_url'],
-                        middlewares=instance.middlewares,
+                        api_base_url=kwargs['base_url'],
+                        middlewares=instance._middlewares,
                         global_authentication=authentication,
                         global_formats=formats,
-                        defaults=instance.defaults,
+                        defaults=instance._defaults,
+                        transport=instance.transport,
                         **method_description
                     )
                 except errors.SporeMethodBuildError as method_error:
                     method_errors[method_name] = method_error
                 else:
                     setattr(instance, method_name, method)
+                    instance._methods[method_name] = method
+
+            method_errors.update(instance._build_loaders())
+            try:
+                instance._build_batch(kwargs.get('batch'), kwargs['base_url'],
+                                      authentication, formats)
+            except errors.SporeMethodBuildError as batch_error:
+                spec_errors['batch'] = batch_error.errors
 
         if spec_errors or method_errors:
             raise errors.SporeClientBuildError(spec_errors,
@@ -85,7 +159,8 @@ class Spore(object):
         return instance
 
     def __init__(self, name='', base_url='', authority='', formats=None,
-                 version='', authentication=None, methods=None, meta=None):
+                 version='', authentication=None, methods=None, meta=None,
+                 batch=None):
         self.name = name
         self.authority = authority
         self.base_url = base_url
@@ -98,6 +173,81 @@ class Spore(object):
     def __repr__(self):
         return '<Spore [{}]>'.format(self.name)
 
+    def _build_loaders(self):
+        """ Links the methods to the bulk methods fetching their items
+
+        :return: the errors of the methods, by name
+        """
+        method_errors = {}
+        for method_name, method in self._methods.items():
+            if not method.bulk:
+                continue
+            options = dict(method.bulk)
+            bulk_method = self._methods.get(options.pop('method', ''))
+            unknown = set(options) - set(BULK_DEFAULTS)
+            if bulk_method is None or unknown:
+                method_errors[method_name] = errors.SporeMethodBuildError(
+                    {'bulk': 'Unknown bulk method or options'}
+                )
+            else:
+                method.loader = Loader(method, bulk_method, **options)
+        return method_errors
+
+    def _build_batch(self, batch, base_url, authentication, formats):
+        """ Builds the method of the batch endpoint, if described
+
+        :raises: ~britney.errors.SporeMethodBuildError
+        """
+        batch = dict(batch or {})
+        self._batch_max_size = batch.pop('max_size', None)
+        self._batch_method = None
+        if batch:
+            self._batch_method = SporeMethod(
+                name='batch',
+                api_base_url=base_url,
+                middlewares=self._middlewares,
+                global_authentication=authentication,
+                global_formats=formats,
+                transport=self.transport,
+                **batch
+            )
+
+    @property
+    def middlewares(self):
+        """ The enabled middlewares, as (predicate, middleware) tuples. The
+        list must not be modified in place.
+        """
+        return self._middlewares
+
+    @middlewares.setter
+    def middlewares(self, middlewares):
+        with self._lock:
+            self._share_middlewares(list(middlewares))
+
+    @property
+    def defaults(self):
+        """ The default values of the parameters of the methods. The dict
+        must not be modified in place.
+        """
+        return self._defaults
+
+    @defaults.setter
+    def defaults(self, defaults):
+        with self._lock:
+            self._share_defaults(dict(defaults))
+
+    def _share_middlewares(self, middlewares):
+        self._middlewares = middlewares
+        for method in self._methods.values():
+            method.middlewares = middlewares
+        if self._batch_method is not None:
+            self._batch_method.middlewares = middlewares
+
+    def _share_defaults(self, defaults):
+        self._defaults = defaults
+        for method in self._methods.values():
+            method.defaults = defaults
+
     def enable(self, middleware, **kwargs):
         """ Enables a middleware on the client object
 
@@ -125,22 +275,206 @@ class Spore(object):
         elif not callable(middleware):
             raise ValueError(middleware)
 
-        self.middlewares.append((predicate, middleware(**kwargs)))
+        middleware = middleware(**kwargs)
+        with self._lock:
+            self._share_middlewares(
+                self._middlewares + [(predicate, middleware)]
+            )
+
+    def get_method(self, name):
+        """ Returns a method of the client by name, or None
+        """
+        return self._methods.get(name)
+
+    def derive(self, base_url=None, defaults=None, middlewares=None):
+        """ Returns a client sharing the descriptions of the methods and the
+        transport of this client, with its own base url, defaults and
+        middlewares. Its methods are built when first used and only hold
+        what differs, so that a client per tenant costs little.
+
+        :param base_url: the base url of the derived client (defaults to the
+        base url of this client). Methods with a base url of their own keep
+        it.
+        :param defaults: default values of parameters, added to the ones of
+        this client
+        :param middlewares: middlewares enabled after the ones of this
+        client, as instances or (predicate, instance) tuples
+        :rtype: DerivedSpore
+        """
+        return DerivedSpore(self, base_url=base_url, defaults=defaults,
+                            middlewares=middlewares)
+
+    def batch(self, max_size=None):
+        """ Collects calls to send them at once to the batch endpoint of the
+        REST Web Service
+
+        :param max_size: the maximum number of calls in a batch request
+        (defaults to the *max_size* of the batch description)
+        :rtype: ~britney.batch.Batch
+        :raises: ~britney.errors.SporeMethodCallError when the description
+        doesn't define a batch endpoint
+        """
+        if self._batch_method is None:
+            raise errors.SporeMethodCallError(
+                'No batch endpoint defined for this client'
+            )
+        return Batch(self, self._batch_method,
+                     max_size=max_size or self._batch_max_size)
+
+    def set_transport(self, transport):
+        """ Sets the transport used by every method of the client to send
+        requests
+
+        :param transport: a :py:class:`~britney.transport.Transport` instance
+        """
+        self.transport = transport
+        for method in self._methods.values():
+            method.transport = transport
+        if self._batch_method is not None:
+            self._batch_method.transport = transport
+
+    def warmup(self, connections_per_host=1):
+        """ Resolves every host the client calls, its base url and the base
+        urls of its methods, and opens connections to them ahead of the
+        first calls. A host that can't be reached gets no connection : its
+        calls report the error.
+
+        :param connections_per_host: the number of connections opened to
+        each host, up to the size of the pools of the transport (defaults
+        to 1)
+        :return: the number of connections opened, by origin url
+        :rtype: dict
+        """
+        opened, warmed = {}, set()
+        for transport, base_url in self._warmup_targets():
+            parsed_url = urlparse(base_url)
+            origin = '{}://{}/'.format(parsed_url.scheme,
+                                       parsed_url.netloc.rpartition('@')[2])
+            if (id(transport), origin) in warmed:
+                continue
+            warmed.add((id(transport), origin))
+            try:
+                count = transport.warmup(origin, connections_per_host)
+            except WARMUP_ERRORS:
+                count = 0
+            opened[origin] = opened.get(origin, 0) + count
+        return opened
+
+    def _warmup_targets(self):
+        # the transports and base urls of the client and its methods
+        targets = [(self.transport, self.base_url)]
+        targets.extend((method.transport, method.base_url)
+                       for method in self._methods.values())
+        if self._batch_method is not None:
+            targets.append((self._batch_method.transport,
+                            self._batch_method.base_url))
+        return targets
+
+    def enable_tracing(self, tracer=None, **kwargs):
+        """ Traces the calls made by every method of the client
+
+        :param tracer: a :py:class:`~britney.tracing.Tracer` instance. If
+        None, a tracer is built with the named arguments
+        :return: the tracer
+        """
+        if tracer is None:
+            tracer = Tracer(**kwargs)
+        for method in self._methods.values():
+            method.tracer = tracer
+        return tracer
+
+    def disable_tracing(self):
+        """ Stops tracing the calls made by the methods of the client
+        """
+        for method in self._methods.values():
+            method.tracer = None
+
+    def _transports(self):
+        transports = [self.transport]
+        transports.extend(method.transport
+                          for method in self._methods.values())
+        if self._batch_method is not None:
+            transports.append(self._batch_method.transport)
+        return transports
+
+    def close(self):
+        """ Shuts down the threads sending the hedged requests of the
+        methods. The transport, which may be shared by other clients, is left
+        open.
+        """
+        for method in self._methods.values():
+            if method.hedger is not None:
+                method.hedger.close()
+
+    def after_fork(self, reset_transports=True):
+        """ Replaces the connections and locks inherited from the parent
+        process by new ones, in a child process. It's called automatically
+        where :py:func:`os.register_at_fork` is available.
+
+        :param reset_transports: resets the transports of the methods too
+        (defaults to True)
+        """
+        self._lock = threading.Lock()
+        objects = [middleware for _, middleware in self._middlewares]
+        for method in self._methods.values():
+            objects.extend((method.tracer, method.loader, method.hedger))
+        if reset_transports:
+            objects.extend(_with_limits(self._transports()))
+        _call_after_fork(objects)
 
     def add_default(self, param, value):
         """
         """
-        self.defaults[param] = value
+        with self._lock:
+            defaults = dict(self._defaults)
+            defaults[param] = value
+            self._share_defaults(defaults)
 
     def remove_default(self, param):
         """
         """
-        try:
-            del self.defaults[param]
-        except KeyError:
-            pass
+        with self._lock:
+            if param in self._defaults:
+                defaults = dict(self._defaults)
+                del defaults[param]
+                self._share_defaults(defaults)
+
+
+def _seekable(stream):
+    seekable = getattr(stream, 'seekable', None)
+    try:
+        return bool(seekable()) if seekable is not None else False
+    except (IOError, OSError, ValueError):
+        return False
 
 
+def _intern(value):
+    # names repeat across methods and clients
+    return intern(value) if isinstance(value, str) else value
+
+
+class _Documentation(object):
+    """ The ``__doc__`` of the methods : the docstring of the class, or the
+    documentation of the method for an instance, without a ``__dict__``
+    """
+
+    def __init__(self, doc):
+        self.doc = doc
+
+    def __get__(self, instance, owner):
+        if instance is None:
+            return self.doc
+        return instance.documentation or instance.description
+
+
+class _MethodType(type):
+
+    def __init__(cls, name, bases, attrs):
+        super(_MethodType, cls).__init__(name, bases, attrs)
+        cls.__doc__ = _Documentation(attrs.get('__doc__'))
+
+
+@six.add_metaclass(_MethodType)
 class SporeMethod(object):
     """ A method that handles request and response on the REST Web Service.
 
@@ -170,12 +504,29 @@ class SporeMethod(object):
     :param global_authentication: a boolean that enables authentication for the
     whole client
     :param global_formats: a list of formats accepted for the whole client.
+    :param pagination: a dict describing how the method paginates its results.
+    See :py:mod:`britney.pagination` (defaults to None)
+    :param bulk: a dict describing the method of the client that fetches many
+    items at once. See :py:mod:`britney.loader` (defaults to None)
+    :param hedge: a dict describing when to send a request again if its
+    response is late. See :py:mod:`britney.hedging` (defaults to None)
+    :param transport: the :py:class:`~britney.transport.Transport` sending
+    the requests (defaults to a new
+    :py:class:`~britney.transport.RequestsTransport`)
     """
 
     PAYLOAD_HTTP_METHODS = ('POST', 'PUT', 'PATCH')
     HTTP_METHODS = PAYLOAD_HTTP_METHODS + ('GET', 'TRACE', 'OPTIONS', 'DELETE',
                                            'HEAD')
 
+    # clients may hold thousands of methods : no __dict__ for each one
+    __slots__ = ('name', 'method', 'path', 'description', 'documentation',
+                 'required_payload', 'base_url', 'formats', 'middlewares',
+                 'defaults', 'expected_status', 'headers', 'tracer',
+                 'transport', 'pagination', 'bulk', 'loader',
+                 'authentication', 'hedge', 'hedger', '_required_params',
+                 '_optional_params', '_template', '__weakref__')
+
     def __new__(cls, *args, **kwargs):
         method_errors = {}
 
@@ -195,16 +546,19 @@ class SporeMethod(object):
             method_errors['base_url'] = 'A method description should define a \
             base url if not defined for the whole client'
 
-        if method_errors:
-            raise errors.SporeMethodBuildError(method_errors)
+        pagination = kwargs.get('pagination') or {}
+        if pagination.get('style', 'page') not in PAGINATION_STYLES:
+            method_errors['pagination'] = 'Unknown pagination style %s' % \
+                pagination['style']
 
-        documentation = kwargs.get('documentation', '')
-        description = kwargs.get('description', '')
+        hedge_error = check_hedge(kwargs.get('hedge'), kwargs.get('method'))
+        if hedge_error:
+            method_errors['hedge'] = hedge_error
 
-        instance = super(SporeMethod, cls).__new__(cls)
-        instance.__doc__ = documentation or description
+        if method_errors:
+            raise errors.SporeMethodBuildError(method_errors)
 
-        return instance
+        return super(SporeMethod, cls).__new__(cls)
 
     def __init__(self, name='', api_base_url='', method='', path='',
                  required_params=None, optional_params=None,
@@ -212,24 +566,36 @@ class SporeMethod(object):
                  authentication=None, formats=None, base_url='',
                  documentation='', middlewares=None,
                  global_authentication=None, global_formats=None,
-                 defaults=None):
+                 defaults=None, pagination=None, bulk=None, transport=None,
+                 hedge=None):
 
-        self.name = name
-        self.method = method
+        self.name = _intern(name)
+        self.method = _intern(method)
         self.path = path
         self.description = description
+        self.documentation = documentation
         self.required_payload = required_payload
 
         self.base_url = base_url if base_url else api_base_url
         self.formats = formats if formats else global_formats
 
-        self.required_params = required_params if required_params else []
-        self.optional_params = optional_params if optional_params else []
+        self.required_params = required_params
+        self.optional_params = optional_params
         self.middlewares = middlewares
         self.defaults = defaults
-        self.expected_status = expected_status if expected_status else []
-
-        self.headers = []
+        self.expected_status = tuple(expected_status or ())
+
+        self.headers = ()
+        # (description of the environment, environment), replaced as a whole
+        self._template = (None, None)
+        self.tracer = None
+        self.transport = transport if transport is not None \
+            else RequestsTransport()
+        self.pagination = build_pagination(pagination)
+        self.bulk = build_bulk(bulk)
+        self.hedge = build_hedge(hedge)
+        self.hedger = Hedger(**self.hedge) if self.hedge else None
+        self.loader = None
 
         if authentication is None:
             self.authentication = global_authentication \
@@ -240,11 +606,49 @@ class SporeMethod(object):
     def __repr__(self):
         return '<SporeMethod [{}]>'.format(self.name)
 
-    def base_environ(self):
-        """ Builds the base environment dictionnary describing the request to
-        be sent to the REST Web Service.
+    @property
+    def required_params(self):
+        """ The required parameters, as a tuple
+        """
+        return self._required_params
+
+    @required_params.setter
+    def required_params(self, params):
+        self._required_params = tuple(_intern(param) for param in params or ())
+
+    @property
+    def optional_params(self):
+        """ The optional parameters, as a tuple
         """
+        return self._optional_params
 
+    @optional_params.setter
+    def optional_params(self, params):
+        self._optional_params = tuple(_intern(param) for param in params or ())
+
+    def base_environ(self):
+        """ Builds the base environment describing the request to be sent to
+        the REST Web Service. The parts read from the url and the path are
+        built once and copied for each call.
+
+        :rtype: ~britney.environ.Environ
+        """
+        key = (self.base_url, self.method, self.path, self.name)
+        template_key, template = self._template
+        if key != template_key:
+            template = self._build_template()
+            self._template = (key, template)
+
+        environ = template.copy()
+        environ['spore.headers'] = {}
+        environ['spore.expected_status'] = self.expected_status
+        environ['spore.authentication'] = self.authentication
+        environ['spore.format'] = self.formats
+        environ['spore.transport'] = self.transport
+        environ['spore.sender'] = self
+        return environ
+
+    def _build_template(self):
         parsed_base_url = urlparse(self.base_url)
 
         def script_name(parsed_url):
@@ -255,7 +659,20 @@ class SporeMethod(object):
                 return ''
             return '{0.username}:{0.password}'.format(parsed_url)
 
+        def unix_socket(parsed_url):
+            if parsed_url.scheme != UNIX_SCHEME:
+                return ''
+            return unquote(parsed_url.netloc.rpartition('@')[2])
+
+        def server_name(parsed_url):
+            # the socket path is case sensitive and not a host name
+            if parsed_url.scheme == UNIX_SCHEME:
+                return 'localhost'
+            return parsed_url.hostname
+
         def server_port(parsed_url):
+            if parsed_url.scheme == UNIX_SCHEME:
+                return 80
             if not parsed_url.port:
                 if parsed_url.scheme == 'http':
                     return 80
@@ -269,9 +686,9 @@ class SporeMethod(object):
         else:
             path_info, query_string = path[0], ''
 
-        return {
+        return Environ({
             'REQUEST_METHOD': self.method,
-            'SERVER_NAME': parsed_base_url.hostname,
+            'SERVER_NAME': server_name(parsed_base_url),
             'SERVER_PORT': server_port(parsed_base_url),
             'SCRIPT_NAME': script_name(parsed_base_url),
             'PATH_INFO': path_info,
@@ -287,16 +704,21 @@ class SporeMethod(object):
             'spore.format': self.formats,
             'spore.userinfo': userinfo(parsed_base_url),
             'spore.method': self.name,
+            'spore.unix_socket': unix_socket(parsed_base_url),
+            'spore.transport': self.transport,
+            'spore.sender': self,
             'wsgi.url_scheme': parsed_base_url.scheme,
-        }
+        })
 
     def is_a_param(self, param):
-        return param in self.required_params or param in self.optional_params
+        return param in self._required_params or \
+            param in self._optional_params
 
     def get_defaults(self):
-        if self.defaults:
+        defaults = self.defaults
+        if defaults:
             return {
-                param: value for param, value in six.iteritems(self.defaults)
+                param: value for param, value in six.iteritems(defaults)
                 if self.is_a_param(param)
             }
         return {}
@@ -311,19 +733,66 @@ class SporeMethod(object):
 
         return data
 
+    def build_raw_payload(self, environ, payload_format):
+        """ Sends the payload of a call as it is, with its content type and
+        the length of its buffer, instead of letting the formats of the
+        middlewares encode it
+
+        :param environ: the environment of the call
+        :param payload_format: the content type of the payload
+        :raises: ~britney.errors.SporeMethodCallError when the payload is not
+        bytes, a buffer or a file object
+        """
+        payload = environ['spore.payload']
+        if environ['spore.files']:
+            raise errors.SporeMethodCallError('Raw payloads are sent '
+                                              'without files')
+        if isinstance(payload, memoryview) and six.PY2:
+            # the buffers of Python 2 can't be checked nor cast, their bytes
+            # are sent instead
+            payload = environ['spore.payload'] = payload.tobytes()
+            length = len(payload)
+        elif isinstance(payload, memoryview):
+            if not payload.c_contiguous:
+                raise errors.SporeMethodCallError('Raw payloads are '
+                                                  'contiguous buffers')
+            if payload.ndim != 1 or payload.itemsize != 1:
+                # the length of a buffer of items is not its size
+                payload = environ['spore.payload'] = payload.cast('B')
+            length = payload.nbytes
+        elif isinstance(payload, (six.binary_type, bytearray)):
+            length = len(payload)
+        elif hasattr(payload, 'read'):
+            length = super_len(payload)
+            if not length and _seekable(payload):
+                # sent by chunks by the transports otherwise
+                payload = environ['spore.payload'] = b''
+            elif not length:
+                # streams of unknown length are sent by chunks
+                length = None
+        else:
+            raise errors.SporeMethodCallError(
+                'Raw payloads are bytes, buffers or file objects, not %s'
+                % type(payload).__name__
+            )
+
+        environ['spore.payload_format'] = payload_format
+        headers = environ['spore.headers']
+        headers['Content-Type'] = payload_format
+        if length is not None:
+            headers['Content-Length'] = str(length)
+
     def build_params(self, **kwargs):
         """ Check arguments passed to call method and build the spore
         parameters value
         """
 
-        req_params = frozenset(self.required_params)
-        all_params = req_params | frozenset(self.optional_params)
+        req_params = frozenset(self._required_params)
+        all_params = req_params.union(self._optional_params)
         passed_args = set(six.iterkeys(kwargs))
-        if self.defaults:
-            default_args = set(six.iterkeys(self.get_defaults()))
-            all_args = set(passed_args).union(default_args)
-        else:
-            all_args = set(passed_args)
+        # read once, as the client may replace them meanwhile
+        defaults = self.get_defaults()
+        all_args = passed_args.union(defaults)
 
         # nothing to do here
         if not all_params and not all_args:
@@ -342,12 +811,13 @@ class SporeMethod(object):
             raise errors.SporeMethodCallError('Too much parameter',
                                               expected=expected)
 
-        kwargs.update(**self.get_defaults())
+        kwargs.update(**defaults)
         return list(six.iteritems(kwargs))
 
     def check_status(self, response):
         """ Checks response status in fact of the *expected_status*
-        attribute
+        attribute, or of the expected status of the call when middlewares
+        changed it
 
         :param response: the response from the REST service
         :type response: requests.Response
@@ -356,44 +826,392 @@ class SporeMethod(object):
         status = response.status_code
         if 200 <= status <= 299:
             return
-        if status not in self.expected_status:
+        environ = getattr(response, 'environ', None) or {}
+        expected_status = environ.get('spore.expected_status',
+                                      self.expected_status)
+        if status not in expected_status:
             raise errors.SporeMethodStatusError(response)
 
+    def paginate(self, prefetch=True, window=4, **kwargs):
+        """ Iterates lazily over the items of all the pages of the method
+
+        :param prefetch: fetches the next page while the current one is
+        consumed (defaults to True)
+        :param window: the maximum number of pages fetched concurrently when
+        the total number of items is known (defaults to 4)
+        :param kwargs: parameters passed to each call of the method
+        :rtype: ~britney.pagination.Paginator
+        :raises: ~britney.errors.SporeMethodCallError
+        """
+        return Paginator(self, kwargs, prefetch=prefetch, window=window)
+
+    def enable_hedging(self, **options):
+        """ Sends the requests of the method again when their response is
+        late. See :py:class:`~britney.hedging.Hedger` for the options.
+
+        :return: the :py:class:`~britney.hedging.Hedger` of the method
+        :raises: ~britney.errors.SporeMethodCallError when the method is not
+        safe or the options are wrong
+        """
+        error = check_hedge(options, self.method)
+        if error:
+            raise errors.SporeMethodCallError(error)
+        self.disable_hedging()
+        self.hedge = build_hedge(options)
+        self.hedger = Hedger(**self.hedge)
+        return self.hedger
+
+    def disable_hedging(self):
+        """ Stops sending the requests of the method again, and shuts the
+        threads of its hedger down
+        """
+        hedger = self.hedger
+        self.hedge = None
+        self.hedger = None
+        if hedger is not None:
+            hedger.close()
+
+    def defer(self, key):
+        """ Looks up an item later, with other deferred lookups, through the
+        bulk method of this method
+
+        :param key: the value of the key parameter
+        :rtype: ~britney.loader.LoaderFuture
+        :raises: ~britney.errors.SporeMethodCallError
+        """
+        if self.loader is None:
+            raise errors.SporeMethodCallError(
+                'Method %s has no bulk method' % self.name
+            )
+        return self.loader.defer(key)
+
     def __call__(self, **kwargs):
-        """ Calls the method with required parameters
+        """ Calls the method with required parameters. A *payload* already
+        encoded, as bytes, a buffer or a file object, is sent as it is with
+        the content type given as *payload_format*. The body of a successful
+        response is written to *download_to* when given, a path, a file
+        object or a :py:class:`~britney.download.Download`, instead of being
+        loaded in memory.
+
+        :raises: ~britney.errors.SporeDownloadError
         :raises: ~britney.errors.SporeMethodStatusError
         :raises: ~britney.errors.SporeMethodCallError
         """
 
-        hooks = []
+        if self.loader is not None and self.loader.accepts(kwargs):
+            return self.loader.load(kwargs[self.loader.key_param])
+
+        tracer = self.tracer
+        trace = tracer.begin(self.name) if tracer is not None else None
+        if trace is None:
+            return self._call(kwargs)
+
+        try:
+            response = self._call(kwargs, trace)
+        except Exception as error:
+            tracer.end(trace, error=error)
+            raise
+        tracer.end(trace, response=response)
+        return response
+
+    def _call(self, kwargs, trace=None):
+        environ = self.build_environ(kwargs)
+        if trace is not None:
+            trace.environ = environ
+            trace.mark('environ.built')
+
+        hooks, response = self.process_request(environ, trace)
+        if response is not None:
+            return response
+
+        response = self.send(environ, trace)
+        return self.process_response(response, hooks, trace)
+
+    def build_environ(self, kwargs):
+        """ Builds the environment of a call from its parameters
+
+        :param kwargs: the parameters passed to the call
+        :raises: ~britney.errors.SporeMethodCallError
+        """
         data = kwargs.pop('payload', None)
         files = kwargs.pop('files', None)
+        payload_format = kwargs.pop('payload_format', None)
+        download_to = kwargs.pop('download_to', None)
 
         environ = self.base_environ()
-        environ.update({
-            'spore.payload': self.build_payload(data, files),
-            'spore.params': self.build_params(**kwargs),
-            'spore.files': files
-        })
-
+        environ['spore.payload'] = self.build_payload(data, files)
+        environ['spore.params'] = self.build_params(**kwargs)
+        environ['spore.files'] = files
+        if payload_format is not None:
+            self.build_raw_payload(environ, payload_format)
+        if download_to is not None:
+            environ['spore.download'] = build_download(download_to)
+        return environ
+
+    def process_request(self, environ, trace=None):
+        """ Passes the environment through the enabled middlewares
+
+        :return: the callbacks to apply to the response, and a response if a
+        middleware returned one
+        """
+        hooks = []
         for predicate, middleware in self.middlewares:
             if predicate(environ):
+                if trace is not None:
+                    trace.mark('middleware.enter', type(middleware).__name__)
                 callback = middleware(environ)
+                if trace is not None:
+                    trace.mark('middleware.exit', type(middleware).__name__)
                 if callback is not None:
-                    if isinstance(callback, requests.models.Response):
-                        return callback
+                    if isinstance(callback, RESPONSE_TYPES):
+                        return hooks, callback
                     hooks.append(callback)
+        return hooks, None
 
-        prepared_request = RequestBuilder(environ)
+    def send(self, environ, trace=None):
+        """ Sends the request described by the environment with the transport
+        of the method, once the limits of the transport let it go
 
-        with requests.session() as session:
-            response = session.send(prepared_request(), verify=True)
-            response.environ = environ
+        :rtype: requests.Response or ~britney.response.Response
+        :raises: ~britney.errors.SporeHostBusyError
+        """
+        transport = self.transport
+        request = transport.prepare(environ)
+        if trace is not None:
+            trace.mark('request.prepared')
+
+        hedger = self.hedger
+        # two requests would write the same download
+        if hedger is None or 'spore.download' in environ:
+            return self._limited_send(transport, request, environ, trace)
+
+        # the requests sent at once are not traced, only the body of the
+        # winner is read
+        attempt = hedger.send(partial(self._attempt, transport, request,
+                                      environ), trace)
+        response = attempt.read()
+        if trace is not None:
+            trace.mark('response.body')
+        return response
 
+    def _attempt(self, transport, request, environ):
+        limits = getattr(transport, 'limits', None)
+        semaphore = limits.acquire(environ) if limits is not None else None
+        try:
+            response = transport.send(request, environ)
+        except Exception:
+            if semaphore is not None:
+                semaphore.release()
+            raise
+        return Attempt(response, semaphore.release
+                       if semaphore is not None else None)
+
+    def _limited_send(self, transport, request, environ, trace=None):
+        limits = getattr(transport, 'limits', None)
+        if limits is None:
+            return self._send(transport, request, environ, trace)
+
+        if trace is not None:
+            trace.mark('host.queued')
+        semaphore = limits.acquire(environ)
+        try:
+            return self._send(transport, request, environ, trace)
+        finally:
+            semaphore.release()
+
+    def _send(self, transport, request, environ, trace):
+        if trace is not None:
+            trace.mark('request.send')
+
+        response = transport.send(request, environ)
+        if trace is not None:
+            trace.mark('response.headers')
+        download = environ.get('spore.download')
+        if download is not None and 200 <= response.status_code <= 299:
+            response.download = download.write(response)
+        else:
+            response.content
+        if trace is not None:
+            trace.mark('response.body')
+
+        return response
+
+    def process_response(self, response, hooks, trace=None):
+        """ Checks the status of the response and passes it through the
+        callbacks of the middlewares
+
+        :raises: ~britney.errors.SporeMethodStatusError
+        """
         self.check_status(response)
 
         res = reduce(lambda r, hook: hook(r), reversed(hooks), response)
-        if res and isinstance(res, requests.models.Response):
+        # responses with an error status are falsy
+        if isinstance(res, RESPONSE_TYPES):
             response = res
 
+        if trace is not None:
+            trace.mark('response.decoded')
+
         return response
+
+
+class DerivedMethod(SporeMethod):
+    """ A method of a :py:class:`DerivedSpore` client. It holds the state of
+    its client only, and reads everything else from the method it derives
+    from.
+
+    :param definition: the method of the client it derives from
+    :param base_url: the base url of its client
+    :param middlewares: the middlewares of its client
+    :param defaults: the defaults of its client
+    :param transport: the transport of its client
+    :param tracer: the tracer of its client (defaults to None)
+    """
+
+    __slots__ = ('_definition',)
+
+    def __new__(cls, *args, **kwargs):
+        return object.__new__(cls)
+
+    def __init__(self, definition, base_url, middlewares, defaults,
+                 transport, tracer=None):
+        self._definition = definition
+        self._template = (None, None)
+        self.base_url = base_url
+        self.middlewares = middlewares
+        self.defaults = defaults
+        self.transport = transport
+        self.tracer = tracer
+        self.loader = None
+
+    def __getattr__(self, name):
+        # only called for what is not set on the derived method
+        if name == '_definition':
+            raise AttributeError(name)
+        return getattr(self._definition, name)
+
+
+class DerivedSpore(Spore):
+    """ A client derived from another one by :py:meth:`Spore.derive`
+
+    :param parent: the client it derives from
+    :param base_url: its base url (defaults to the one of *parent*), used by
+    the methods without a base url of their own
+    :param defaults: default values of parameters, added to the ones of
+    *parent*
+    :param middlewares: middlewares enabled after the ones of *parent*, as
+    instances or (predicate, instance) tuples
+    """
+
+    def __new__(cls, *args, **kwargs):
+        return object.__new__(cls)
+
+    def __init__(self, parent, base_url=None, defaults=None,
+                 middlewares=None):
+        super(DerivedSpore, self).__init__(
+            name=parent.name, base_url=base_url or parent.base_url,
+            authority=parent.authority, formats=parent.formats,
+            version=parent.version, authentication=parent.authentication,
+            meta=parent.meta
+        )
+        self._definitions = getattr(parent, '_definitions', parent._methods)
+        self._definitions_base_url = getattr(
+            parent, '_definitions_base_url', parent.base_url
+        )
+        self._lock = threading.Lock()
+        self._middlewares = list(parent.middlewares) + [
+            middleware if isinstance(middleware, tuple)
+            else (lambda request: True, middleware)
+            for middleware in middlewares or []
+        ]
+        self._defaults = dict(parent.defaults, **(defaults or {}))
+        self._methods = {}
+        self._tracer = None
+        self.transport = parent.transport
+        self._batch_max_size = parent._batch_max_size
+        self._batch_method = None
+        if parent._batch_method is not None:
+            definition = getattr(parent._batch_method, '_definition',
+                                 parent._batch_method)
+            self._batch_method = DerivedMethod(
+                definition, self._base_url_of(definition),
+                self._middlewares, self._defaults, self.transport
+            )
+        _clients.add(self)
+
+    def __repr__(self):
+        return '<DerivedSpore [{}]>'.format(self.name)
+
+    @property
+    def _middlewares_module(self):
+        return importlib.import_module('britney.middleware')
+
+    def _base_url_of(self, definition):
+        # a method with its own base url keeps it
+        if definition.base_url != self._definitions_base_url:
+            return definition.base_url
+        return self.base_url
+
+    def __getattr__(self, name):
+        # methods are built when first used
+        method = self.get_method(name)
+        if method is None:
+            raise AttributeError(name)
+        return method
+
+    def get_method(self, name):
+        # read from __dict__, as __getattr__ calls it
+        methods = self.__dict__.get('_methods')
+        definitions = self.__dict__.get('_definitions')
+        if methods is None or definitions is None:
+            return None
+        method = methods.get(name)
+        if method is not None:
+            return method
+        if name not in definitions:
+            return None
+
+        definition = definitions[name]
+        with self._lock:
+            method = self._methods.get(name)
+            if method is None:
+                method = DerivedMethod(definition,
+                                       self._base_url_of(definition),
+                                       self._middlewares, self._defaults,
+                                       self.transport, self._tracer)
+                self._methods[name] = method
+                created = True
+            else:
+                created = False
+        if created and definition.loader is not None:
+            method.loader = definition.loader.derive(
+                method, self.get_method(definition.loader.bulk_method.name)
+            )
+        return method
+
+    def _warmup_targets(self):
+        targets = super(DerivedSpore, self)._warmup_targets()
+        # the methods not built yet will call the hosts of their definitions
+        targets.extend(
+            (self.transport, self._base_url_of(definition))
+            for name, definition in self._definitions.items()
+            if name not in self._methods
+        )
+        return targets
+
+    def close(self):
+        # the hedgers of the definitions belong to the parent client
+        for method in self._methods.values():
+            if method.hedger is not None and \
+                    method.hedger is not method._definition.hedger:
+                method.hedger.close()
+
+    def enable_tracing(self, tracer=None, **kwargs):
+        # the methods built afterwards get the tracer too
+        tracer = super(DerivedSpore, self).enable_tracing(tracer, **kwargs)
+        self._tracer = tracer
+        return tracer
+
+    def disable_tracing(self):
+        super(DerivedSpore, self).disable_tracing()
+        self._tracer = None
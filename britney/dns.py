@@ -0,0 +1,86 @@
+# -*- coding: utf-8 -*-
+
+"""
+britney.dns
+~~~~~~~~~~~
+
+An in-process cache of host name resolutions, so that the connections a
+transport opens again and again don't resolve their host each time : ::
+
+    from britney.dns import DnsCache
+    from britney.transport import RequestsTransport
+
+    client.set_transport(RequestsTransport(dns_cache=DnsCache(ttl=30)))
+
+A resolution is kept *ttl* seconds. A host is resolved again sooner when no
+connection could be opened to any of its addresses.
+"""
+
+import socket
+import threading
+import time
+
+clock = getattr(time, 'monotonic', time.time)
+
+
+class DnsCache(object):
+    """ Resolutions of host names, kept for a while
+
+    :param ttl: the number of seconds a resolution is kept (defaults to 60)
+    :param resolver: the function resolving a host and a port into a list of
+    addresses, like :py:func:`socket.getaddrinfo` (defaults to
+    :py:func:`socket.getaddrinfo`)
+    """
+
+    def __init__(self, ttl=60, resolver=None):
+        self.ttl = ttl
+        self.resolver = resolver or socket.getaddrinfo
+        self._lock = threading.Lock()
+        self._entries = {}
+
+    def __repr__(self):
+        return '<DnsCache [{} hosts]>'.format(len(self._entries))
+
+    def __len__(self):
+        return len(self._entries)
+
+    def resolve(self, host, port):
+        """ The addresses of a host, from the cache when resolved less than
+        *ttl* seconds ago
+
+        :param host: the host name
+        :param port: the port
+        :return: a list of (family, type, proto, canonname, sockaddr) tuples
+        like :py:func:`socket.getaddrinfo` returns
+        :raises: socket.gaierror
+        """
+        key = (host, port)
+        now = clock()
+        entry = self._entries.get(key)
+        if entry is not None and entry[0] > now:
+            return entry[1]
+
+        addresses = self.resolver(host, port, 0, socket.SOCK_STREAM)
+        with self._lock:
+            self._entries[key] = (now + self.ttl, addresses)
+        return addresses
+
+    def forget(self, host, port=None):
+        """ Resolves a host again the next time, on a port or on all ports
+
+        :param host: the host name
+        :param port: the port (defaults to all of them)
+        """
+        with self._lock:
+            for key in list(self._entries):
+                if key[0] == host and (port is None or key[1] == port):
+                    del self._entries[key]
+
+    def clear(self):
+        """ Forgets all the resolutions
+        """
+        with self._lock:
+            self._entries.clear()
+
+    def after_fork(self):
+        self._lock = threading.Lock()
@@ -0,0 +1,230 @@
+# -*- coding: utf-8 -*-
+
+"""
+britney.download
+~~~~~~~~~~~~~~~~
+
+Bodies of responses written to a file as they are received, instead of
+being loaded in memory : ::
+
+    response = client.get_artifact(id=42, download_to='/tmp/artifact.tar')
+    response.download.size
+
+    from britney.download import Download
+
+    response = client.get_artifact(id=42, download_to=Download(
+        '/tmp/artifact.tar', checksum='sha256:9f86d081884c7d65...', mmap=True
+    ))
+    header = response.download.buffer[:512]
+
+The body is read in chunks into a single buffer, written from it. A path is
+written through a temporary file of its directory, renamed once the body is
+received and checked, so that a failed download never replaces it. The size
+of the body is checked against its Content-Length, and its digest against
+*checksum*. A mismatch raises a
+:py:class:`~britney.errors.SporeDownloadError`.
+
+Only the bodies of successful responses (2xx) are downloaded, the others are
+read as usual.
+"""
+
+from collections import namedtuple
+import hashlib
+import mmap as _mmap
+import os
+import uuid
+
+import six
+
+from .errors import SporeDownloadError
+
+#: the number of bytes read at once
+CHUNK_SIZE = 1 << 20
+
+_replace = getattr(os, 'replace', os.rename)
+
+#: The result of a download, set as the *download* attribute of the response
+#:
+#: - *path*: the path of the file written, or None
+#: - *size*: the number of bytes written
+#: - *digest*: the hexadecimal digest of the body, or None without checksum
+#: - *buffer*: a read-only memory map of the file, or None
+Downloaded = namedtuple('Downloaded', 'path size digest buffer')
+
+
+def parse_checksum(checksum):
+    """ The algorithm and the hexadecimal digest of a checksum
+
+    :param checksum: ``'algorithm:hexdigest'`` or an (algorithm, hexdigest)
+    tuple
+    :raises: ValueError when the checksum or its algorithm is unknown
+    """
+    if isinstance(checksum, six.string_types):
+        algorithm, separator, digest = checksum.partition(':')
+        if not separator:
+            raise ValueError('Checksum %r is not algorithm:hexdigest'
+                             % checksum)
+    else:
+        algorithm, digest = checksum
+    algorithm = algorithm.lower()
+    hashlib.new(algorithm)
+    return algorithm, digest.lower()
+
+
+def build_download(download_to):
+    """ A :py:class:`Download` from the *download_to* parameter of a call
+
+    :param download_to: a path, a file object or a :py:class:`Download`
+    """
+    if isinstance(download_to, Download):
+        return download_to
+    return Download(download_to)
+
+
+def _encoded(response):
+    return response.headers.get('Content-Encoding', 'identity') != 'identity'
+
+
+def _content_length(response):
+    # the length of an encoded body is not the length written
+    if _encoded(response):
+        return None
+    length = response.headers.get('Content-Length')
+    return int(length) if length and length.isdigit() else None
+
+
+def _chunks(response, chunk_size):
+    raw = getattr(response, 'raw', None)
+    readinto = getattr(raw, 'readinto', None)
+    # decoded bodies are read as requests reads them
+    if readinto is None or _encoded(response):
+        for chunk in response.iter_content(chunk_size):
+            yield chunk
+        return
+
+    buffer = bytearray(chunk_size)
+    view = memoryview(buffer)
+    while True:
+        count = readinto(buffer)
+        if not count:
+            break
+        yield view[:count]
+
+
+def _map(fileno):
+    # empty files can't be mapped
+    if os.fstat(fileno).st_size == 0:
+        return b''
+    return _mmap.mmap(fileno, 0, access=_mmap.ACCESS_READ)
+
+
+def _map_path(path):
+    with open(path, 'rb') as fileobj:
+        return _map(fileobj.fileno())
+
+
+def _consumed(response):
+    # the body was written, not kept
+    response._content = b''
+    if hasattr(response, '_content_consumed'):
+        response._content_consumed = True
+    release = getattr(response, 'release', None)
+    if release is not None:
+        release()
+
+
+class Download(object):
+    """ Where and how the body of a response is written
+
+    :param target: the path of the file, or a file object opened for writing
+    in binary mode
+    :param checksum: the expected digest of the body, as
+    ``'algorithm:hexdigest'`` or an (algorithm, hexdigest) tuple, with an
+    algorithm of :py:mod:`hashlib` (defaults to None)
+    :param mmap: maps the whole file written in memory, read only. A file
+    object needs a file descriptor (defaults to False)
+    :param chunk_size: the number of bytes read at once (defaults to 1 MiB)
+    :raises: ValueError when the checksum is wrong
+    """
+
+    def __init__(self, target, checksum=None, mmap=False,
+                 chunk_size=CHUNK_SIZE):
+        self.target = target
+        self.checksum = checksum
+        self.mmap = mmap
+        self.chunk_size = chunk_size
+        self.algorithm, self.digest = parse_checksum(checksum) \
+            if checksum is not None else (None, None)
+
+    def __repr__(self):
+        return '<Download [{!r}]>'.format(self.target)
+
+    def write(self, response):
+        """ Writes the body of a response to the target
+
+        :rtype: Downloaded
+        :raises: ~britney.errors.SporeDownloadError
+        """
+        try:
+            if hasattr(self.target, 'write'):
+                downloaded = self._write_file(response, self.target)
+            else:
+                downloaded = self._write_path(response)
+        except Exception:
+            response.close()
+            raise
+        _consumed(response)
+        return downloaded
+
+    def _write_file(self, response, fileobj):
+        size, digest = self._copy(response, fileobj)
+        fileobj.flush()
+        name = getattr(fileobj, 'name', None)
+        path = name if isinstance(name, six.string_types) else None
+        buffer = None
+        if self.mmap:
+            try:
+                buffer = _map(fileobj.fileno())
+            except EnvironmentError:
+                # files opened for writing only can't be mapped
+                if path is None:
+                    raise
+                buffer = _map_path(path)
+        return Downloaded(path, size, digest, buffer)
+
+    def _write_path(self, response):
+        path = os.path.abspath(self.target)
+        partial = '{}.{}.part'.format(path, uuid.uuid4().hex[:8])
+        try:
+            with open(partial, 'wb') as fileobj:
+                size, digest = self._copy(response, fileobj)
+            _replace(partial, path)
+        except BaseException:
+            if os.path.exists(partial):
+                os.remove(partial)
+            raise
+        buffer = _map_path(path) if self.mmap else None
+        return Downloaded(path, size, digest, buffer)
+
+    def _copy(self, response, fileobj):
+        hasher = hashlib.new(self.algorithm) if self.algorithm else None
+        size = 0
+        for chunk in _chunks(response, self.chunk_size):
+            fileobj.write(chunk)
+            if hasher is not None:
+                hasher.update(chunk)
+            size += len(chunk)
+
+        length = _content_length(response)
+        if length is not None and size != length:
+            raise SporeDownloadError(
+                'Received %d bytes instead of %d' % (size, length),
+                expected=length, received=size
+            )
+        digest = hasher.hexdigest() if hasher is not None else None
+        if self.digest is not None and digest != self.digest:
+            raise SporeDownloadError(
+                'Wrong %s digest of the body' % self.algorithm,
+                expected=self.digest, received=digest
+            )
+        return size, digest
@@ -0,0 +1,135 @@
+# -*- coding: utf-8 -*-
+
+"""
+britney.environ
+~~~~~~~~~~~~~~~
+
+The environment of a call, passed through the middlewares and the transport.
+It's a mapping like a WSGI environment, storing the keys every call sets in
+a list instead of a dict, so that the environments kept by responses take
+less memory : ::
+
+    environ['spore.headers']['X-Request-Id'] = request_id
+    environ.get('spore.oauth2.expected_status')
+
+Any other key, like the ones set by middlewares, is stored as in a dict.
+"""
+
+try:
+    from collections.abc import MutableMapping
+except ImportError:  # pragma: no cover
+    from collections import MutableMapping
+
+#: the keys stored in the list of values, set for every call
+KEYS = (
+    'REQUEST_METHOD', 'SERVER_NAME', 'SERVER_PORT', 'SCRIPT_NAME',
+    'PATH_INFO', 'QUERY_STRING', 'HTTP_USER_AGENT', 'spore.expected_status',
+    'spore.authentication', 'spore.params', 'spore.payload',
+    'spore.payload_format', 'spore.errors', 'spore.headers', 'spore.format',
+    'spore.userinfo', 'spore.method', 'spore.unix_socket', 'spore.transport',
+    'spore.sender', 'spore.files', 'wsgi.url_scheme',
+)
+
+_INDEXES = dict((key, index) for index, key in enumerate(KEYS))
+
+# marks the keys not set yet
+_MISSING = object()
+
+
+class Environ(MutableMapping):
+    """ The environment of a call
+
+    :param mapping: the initial keys and values (defaults to None)
+    """
+
+    __slots__ = ('_values', '_extra')
+
+    def __init__(self, mapping=None, **kwargs):
+        self._values = [_MISSING] * len(KEYS)
+        self._extra = None
+        if mapping is not None or kwargs:
+            self.update(mapping or (), **kwargs)
+
+    def __repr__(self):
+        return 'Environ(%r)' % dict(self.items())
+
+    def __reduce__(self):
+        return Environ, (dict(self.items()),)
+
+    def __getitem__(self, key):
+        index = _INDEXES.get(key)
+        if index is not None:
+            value = self._values[index]
+            if value is not _MISSING:
+                return value
+        elif self._extra is not None and key in self._extra:
+            return self._extra[key]
+        raise KeyError(key)
+
+    def __setitem__(self, key, value):
+        index = _INDEXES.get(key)
+        if index is not None:
+            self._values[index] = value
+        elif self._extra is None:
+            self._extra = {key: value}
+        else:
+            self._extra[key] = value
+
+    def __delitem__(self, key):
+        index = _INDEXES.get(key)
+        if index is not None:
+            if self._values[index] is _MISSING:
+                raise KeyError(key)
+            self._values[index] = _MISSING
+        elif self._extra is not None and key in self._extra:
+            del self._extra[key]
+        else:
+            raise KeyError(key)
+
+    def __contains__(self, key):
+        index = _INDEXES.get(key)
+        if index is not None:
+            return self._values[index] is not _MISSING
+        return self._extra is not None and key in self._extra
+
+    def __iter__(self):
+        for key, value in zip(KEYS, self._values):
+            if value is not _MISSING:
+                yield key
+        if self._extra is not None:
+            for key in list(self._extra):
+                yield key
+
+    def __len__(self):
+        return len(KEYS) - self._values.count(_MISSING) + \
+            len(self._extra or ())
+
+    def get(self, key, default=None):
+        index = _INDEXES.get(key)
+        if index is not None:
+            value = self._values[index]
+            return default if value is _MISSING else value
+        if self._extra is None:
+            return default
+        return self._extra.get(key, default)
+
+    def setdefault(self, key, default=None):
+        index = _INDEXES.get(key)
+        if index is not None:
+            value = self._values[index]
+            if value is _MISSING:
+                value = self._values[index] = default
+            return value
+        if self._extra is None:
+            self._extra = {}
+        return self._extra.setdefault(key, default)
+
+    def copy(self):
+        """ A shallow copy of the environment
+
+        :rtype: Environ
+        """
+        environ = Environ.__new__(Environ)
+        environ._values = list(self._values)
+        environ._extra = dict(self._extra) if self._extra else None
+        return environ
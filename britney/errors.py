@@ -15,7 +15,10 @@ class SporeClientBuildError(Exception):
         self.errors = client_errors
         if method_errors:
             self.errors['methods'] = method_errors
-        
+
+    def __reduce__(self):
+        return type(self), (self.errors, None) + self.args, self.__dict__
+
         
 class SporeMethodBuildError(Exception):
 
@@ -23,6 +26,9 @@ class SporeMethodBuildError(Exception):
         super(SporeMethodBuildError, self).__init__(*args, **kwargs)
         self.errors = errors
 
+    def __reduce__(self):
+        return type(self), (self.errors,) + self.args, self.__dict__
+
 
 class SporeMethodCallError(Exception):
 
@@ -31,6 +37,30 @@ class SporeMethodCallError(Exception):
         super(SporeMethodCallError, self).__init__(*args, **kwargs)
         self.cause  = cause
 
+    def __reduce__(self):
+        return type(self), (self.cause,) + self.args, self.__dict__
+
+
+class SporeHostBusyError(SporeMethodCallError):
+    """ Raised when a call waited too long for its turn to be sent to its
+    host. See :py:mod:`britney.limits`
+    """
+
+    def __init__(self, cause, *args, **kwargs):
+        self.host = kwargs.pop('host', None)
+        self.waited = kwargs.pop('waited', None)
+        super(SporeHostBusyError, self).__init__(cause, *args, **kwargs)
+
+
+class SporeDownloadError(SporeMethodCallError):
+    """ Raised when the body written by a download is not the one expected,
+    by its size or its digest. See :py:mod:`britney.download`
+    """
+
+    def __init__(self, cause, *args, **kwargs):
+        self.received = kwargs.pop('received', None)
+        super(SporeDownloadError, self).__init__(cause, *args, **kwargs)
+
 
 class SporeMethodStatusError(Exception):
     """
@@ -40,5 +70,8 @@ class SporeMethodStatusError(Exception):
         self.response = response
         super(SporeMethodStatusError, self).__init__(*args, **kwargs)
 
+    def __reduce__(self):
+        return type(self), (self.response,) + self.args, self.__dict__
+
     def __str__(self):
         return "Error %s" % self.response.status_code
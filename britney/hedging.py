@@ -0,0 +1,311 @@
+# -*- coding: utf-8 -*-
+
+"""
+britney.hedging
+~~~~~~~~~~~~~~~
+
+Hedged requests : when the response of a call is late, the same request is
+sent again and the first response wins, so that a slow replica of the
+upstream doesn't make the call slow. A safe method opts in with the *hedge*
+key of its description : ::
+
+    "get_user": {
+        "method": "GET",
+        "path": "/users/:id",
+        "required_params": ["id"],
+        "hedge": {
+            "percentile": 95,
+            "max_rate": 0.05
+        }
+    }
+
+or at run time : ::
+
+    client.get_user.enable_hedging(delay=0.05)
+
+A request is sent again after *delay* seconds, or after the *percentile* of
+the recent durations of the calls of the method once *min_samples* calls
+were made. At most *max_rate* of the calls are hedged, with bursts of
+*burst* hedges : the requests which can't be hedged are sent from the calling
+thread. The threads sending the other ones are shut down by
+:py:meth:`Hedger.close`, or by closing the client.
+
+A request is done once the headers of its response are received, and only
+the body of the winner is read. The loser is cancelled if it's not sent yet,
+else it's closed as soon as its headers are received, giving its connection
+and the turn of its host back without reading its body.
+
+Only safe methods (GET, HEAD and OPTIONS) can be hedged, as the upstream
+may receive the request twice.
+"""
+
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+import threading
+import time
+
+from .tracing import percentile
+
+clock = getattr(time, 'perf_counter', time.time)
+
+#: methods which requests can be sent twice
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+DEFAULTS = {
+    'delay': None,
+    'percentile': None,
+    'min_samples': 20,
+    'window': 1000,
+    'max_rate': 0.05,
+    'burst': 10,
+    'max_workers': 32,
+}
+
+# calls between two computations of the percentile
+_REFRESH = 16
+
+
+def build_hedge(description):
+    """ Completes a hedge description with default values
+    """
+    if not description:
+        return None
+    return dict(DEFAULTS, **description)
+
+
+def check_hedge(description, method):
+    """ The error of a hedge description, or None
+
+    :param description: the hedge description
+    :param method: the HTTP method of the described method
+    """
+    if description is None:
+        return None
+    if method not in SAFE_METHODS:
+        return 'Only safe methods (%s) can be hedged' % ', '.join(
+            SAFE_METHODS)
+    if set(description) - set(DEFAULTS):
+        return 'Unknown hedge options %s' % ', '.join(
+            sorted(set(description) - set(DEFAULTS)))
+    if description.get('delay') is None and \
+            description.get('percentile') is None:
+        return 'A hedge needs a delay or a percentile'
+    return None
+
+
+def _discard(future):
+    # the response of the loser is not read
+    if not future.cancelled() and future.exception() is None:
+        close = getattr(future.result(), 'close', None)
+        if close is not None:
+            close()
+
+
+class Attempt(object):
+    """ A request sent by a hedger, whose response headers are received.
+    The turn of its host is given back once its body is read or once it's
+    closed.
+
+    :param response: the response, which body is not read yet
+    :param release: a function giving the turn of the host back (defaults
+    to None)
+    """
+
+    def __init__(self, response, release=None):
+        self.response = response
+        self._release = release
+
+    def __repr__(self):
+        return '<Attempt [{}]>'.format(self.response.status_code)
+
+    def _done(self):
+        release, self._release = self._release, None
+        if release is not None:
+            release()
+
+    def read(self):
+        """ Reads the body of the response
+
+        :return: the response
+        """
+        try:
+            self.response.content
+        finally:
+            self._done()
+        return self.response
+
+    def close(self):
+        """ Closes the response without reading its body
+        """
+        try:
+            close = getattr(self.response, 'close', None)
+            if close is not None:
+                close()
+        finally:
+            self._done()
+
+
+class Hedger(object):
+    """ Sends the requests of a method again when their response is late
+
+    :param delay: the number of seconds before a request is sent again
+    (defaults to None)
+    :param percentile: the percentile of the recent durations of the calls
+    after which a request is sent again, eg: 95. It replaces *delay* once
+    *min_samples* calls were made (defaults to None)
+    :param min_samples: the number of calls needed to compute the
+    percentile (defaults to 20)
+    :param window: the number of recent durations used to compute the
+    percentile (defaults to 1000)
+    :param max_rate: the maximum fraction of the calls hedged (defaults to
+    0.05)
+    :param burst: the maximum number of hedges in a burst (defaults to 10)
+    :param max_workers: the number of threads sending the requests
+    (defaults to 32)
+
+    .. py:attribute:: calls
+
+        the number of calls
+
+    .. py:attribute:: hedged
+
+        the number of calls which request was sent again
+
+    .. py:attribute:: hedge_wins
+
+        the number of calls which second request answered first
+    """
+
+    def __init__(self, delay=None, percentile=None, min_samples=20,
+                 window=1000, max_rate=0.05, burst=10, max_workers=32):
+        self.delay = delay
+        self.percentile = percentile
+        self.min_samples = min_samples
+        self.max_rate = max_rate
+        self.burst = burst
+        self.max_workers = max_workers
+        self.calls = 0
+        self.hedged = 0
+        self.hedge_wins = 0
+        self._durations = deque(maxlen=window)
+        self._recorded = 0
+        self._threshold = delay
+        self._tokens = float(burst)
+        self._lock = threading.Lock()
+        self._executor = None
+
+    def __repr__(self):
+        return '<Hedger [{}]>'.format(self.threshold)
+
+    @property
+    def threshold(self):
+        """ The number of seconds before a request is sent again, or None
+        when the calls are not hedged yet
+        """
+        return self._threshold
+
+    def stats(self):
+        """ The calls, the hedged ones and the current threshold
+
+        :rtype: dict
+        """
+        return {
+            'calls': self.calls,
+            'hedged': self.hedged,
+            'hedge_wins': self.hedge_wins,
+            'threshold': self._threshold,
+        }
+
+    def _record(self, duration):
+        with self._lock:
+            self._durations.append(duration)
+            self._recorded += 1
+            if self.percentile is not None and \
+                    self._recorded % _REFRESH == 0 and \
+                    len(self._durations) >= self.min_samples:
+                self._threshold = percentile(self._durations,
+                                             self.percentile)
+
+    def _start(self):
+        with self._lock:
+            self.calls += 1
+            self._tokens = min(self.burst, self._tokens + self.max_rate)
+            if self._threshold is None or self._tokens < 1:
+                # can't be hedged, sent from the calling thread
+                return None, None
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(self.max_workers)
+            return self._threshold, self._executor
+
+    def _may_hedge(self):
+        with self._lock:
+            if self._tokens < 1:
+                return False
+            self._tokens -= 1
+            self.hedged += 1
+            return True
+
+    def send(self, attempt, trace=None):
+        """ Sends a request, and again when its response is late
+
+        :param attempt: a function sending the request and returning an
+        :py:class:`Attempt` once the headers of the response are received
+        :param trace: the trace of the call (defaults to None)
+        :return: the first attempt done, the other one being closed, or the
+        error of the first request when both failed
+        """
+        threshold, executor = self._start()
+        start = clock()
+        try:
+            primary = executor.submit(attempt) if executor else None
+        except RuntimeError:
+            # closed meanwhile
+            primary = None
+        if primary is None:
+            response = attempt()
+            self._record(clock() - start)
+            return response
+
+        done, _ = wait([primary], timeout=threshold)
+        if done or not self._may_hedge():
+            response = primary.result()
+            self._record(clock() - start)
+            return response
+
+        if trace is not None:
+            trace.mark('request.hedged')
+        try:
+            hedge = executor.submit(attempt)
+        except RuntimeError:
+            response = primary.result()
+            self._record(clock() - start)
+            return response
+        pending = set([primary, hedge])
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in sorted(done, key=lambda item: item is hedge):
+                if future.exception() is not None:
+                    continue
+                loser = hedge if future is primary else primary
+                loser.cancel()
+                loser.add_done_callback(_discard)
+                if future is hedge:
+                    with self._lock:
+                        self.hedge_wins += 1
+                self._record(clock() - start)
+                return future.result()
+        return primary.result()
+
+    def close(self):
+        """ Shuts down the threads sending the requests once the requests in
+        flight are done. The next hedged call starts new ones.
+        """
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False)
+
+    def after_fork(self):
+        # the threads of the executor don't exist in the child process
+        self._lock = threading.Lock()
+        self._executor = None
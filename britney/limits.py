@@ -0,0 +1,210 @@
+# -*- coding: utf-8 -*-
+
+"""
+britney.limits
+~~~~~~~~~~~~~~
+
+Limits of the calls in flight to each host, shared by every method sending
+its requests through a transport, whatever its client : ::
+
+    from britney.limits import HostLimits
+
+    transport.limits = HostLimits(8, timeout=2, hosts={'slow.test.org:443': 2})
+    client.set_transport(transport)
+    other_client.set_transport(transport)
+
+Calls beyond the limit wait in line, and go in the order they came. A call
+that waited *timeout* seconds raises a
+:py:class:`~britney.errors.SporeHostBusyError`. The time each call waited is
+set in its environment as *spore.host_wait*, and :py:meth:`HostLimits.stats`
+reports it by host.
+"""
+
+from collections import deque
+import threading
+import time
+
+from .errors import SporeHostBusyError
+from .tracing import percentile
+
+clock = getattr(time, 'monotonic', time.time)
+
+
+class FifoSemaphore(object):
+    """ A semaphore handing its permits over to the waiting threads in the
+    order they came, so that a thread coming later never goes first
+
+    :param value: the number of permits
+    """
+
+    def __init__(self, value):
+        self.value = value
+        self._available = value
+        self._lock = threading.Lock()
+        self._waiters = deque()
+
+    def __repr__(self):
+        return '<FifoSemaphore [{}/{}]>'.format(self.in_use, self.value)
+
+    @property
+    def in_use(self):
+        """ The number of permits acquired
+        """
+        return self.value - self._available
+
+    @property
+    def waiting(self):
+        """ The number of threads waiting for a permit
+        """
+        return len(self._waiters)
+
+    def acquire(self, timeout=None):
+        """ Waits for a permit
+
+        :param timeout: the maximum number of seconds to wait (defaults to
+        None, waiting as long as needed)
+        :return: True when a permit was acquired, False on timeout
+        """
+        with self._lock:
+            if self._available > 0 and not self._waiters:
+                self._available -= 1
+                return True
+            waiter = threading.Event()
+            self._waiters.append(waiter)
+
+        if waiter.wait(timeout):
+            return True
+        with self._lock:
+            # the permit may be handed over meanwhile
+            if waiter.is_set():
+                return True
+            self._waiters.remove(waiter)
+            return False
+
+    def release(self):
+        """ Hands a permit over to the first waiting thread, or makes it
+        available
+        """
+        with self._lock:
+            if self._waiters:
+                self._waiters.popleft().set()
+            else:
+                self._available += 1
+
+
+class _Host(object):
+
+    def __init__(self, limit, window):
+        self.semaphore = FifoSemaphore(limit)
+        self.lock = threading.Lock()
+        self.calls = 0
+        self.timeouts = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        self.waits = deque(maxlen=window)
+
+    def record(self, waited, acquired):
+        with self.lock:
+            self.calls += 1
+            if not acquired:
+                self.timeouts += 1
+            self.wait_total += waited
+            self.wait_max = max(self.wait_max, waited)
+            self.waits.append(waited)
+
+    def stats(self):
+        with self.lock:
+            waits = list(self.waits)
+            return {
+                'limit': self.semaphore.value,
+                'in_flight': self.semaphore.in_use,
+                'queued': self.semaphore.waiting,
+                'calls': self.calls,
+                'timeouts': self.timeouts,
+                'wait_total': self.wait_total,
+                'wait_max': self.wait_max,
+                'wait_p50': percentile(waits, 50),
+                'wait_p99': percentile(waits, 99),
+            }
+
+
+def host_of(environ):
+    """ The host a request goes to, as ``host:port``, or the path of its Unix
+    domain socket
+
+    :param environ: the environment of the request
+    """
+    return environ.get('spore.unix_socket') or '{}:{}'.format(
+        environ['SERVER_NAME'], environ['SERVER_PORT']
+    )
+
+
+class HostLimits(object):
+    """ Limits of the calls in flight to each host
+
+    :param limit: the maximum number of calls in flight to a host
+    :param timeout: the maximum number of seconds a call waits for its turn
+    (defaults to None, waiting as long as needed)
+    :param hosts: limits of some hosts replacing *limit*, by ``host:port``
+    (defaults to None)
+    :param window: the number of recent waits of a host used to compute
+    their percentiles (defaults to 1000)
+    """
+
+    def __init__(self, limit, timeout=None, hosts=None, window=1000):
+        self.limit = limit
+        self.timeout = timeout
+        self.hosts = dict(hosts or {})
+        self.window = window
+        self._lock = threading.Lock()
+        self._hosts = {}
+
+    def __repr__(self):
+        return '<HostLimits [{}]>'.format(self.limit)
+
+    def _host(self, host):
+        state = self._hosts.get(host)
+        if state is None:
+            with self._lock:
+                state = self._hosts.get(host)
+                if state is None:
+                    state = self._hosts[host] = _Host(
+                        self.hosts.get(host, self.limit), self.window
+                    )
+        return state
+
+    def acquire(self, environ):
+        """ Waits for the turn of a request to be sent to its host
+
+        :param environ: the environment of the request
+        :return: the semaphore of the host, to release once the response is
+        read
+        :raises: ~britney.errors.SporeHostBusyError
+        """
+        host = host_of(environ)
+        state = self._host(host)
+        start = clock()
+        acquired = state.semaphore.acquire(self.timeout)
+        waited = clock() - start
+        state.record(waited, acquired)
+        environ['spore.host_wait'] = waited
+        if not acquired:
+            raise SporeHostBusyError(
+                'Too many calls in flight to %s' % host, host=host,
+                waited=waited
+            )
+        return state.semaphore
+
+    def stats(self):
+        """ The calls in flight and waiting, and the time calls waited, by
+        host
+
+        :rtype: dict
+        """
+        return dict((host, state.stats())
+                    for host, state in list(self._hosts.items()))
+
+    def after_fork(self):
+        # the calls in flight belong to the parent process
+        self._lock = threading.Lock()
+        self._hosts = {}
@@ -0,0 +1,261 @@
+# -*- coding: utf-8 -*-
+
+"""
+britney.loader
+~~~~~~~~~~~~~~
+
+Turning many single-item lookups into one call of a bulk method. A method
+sets in its description with the *bulk* key which method of the client can
+fetch many items at once : ::
+
+    "get_item": {
+        "method": "GET",
+        "path": "/items/:id",
+        "required_params": ["id"],
+        "bulk": {
+            "method": "get_items",
+            "key_param": "id",
+            "bulk_param": "ids",
+            "result_key": "id",
+            "items": "results",
+            "max_size": 100,
+            "wait": 0.002
+        }
+    }
+
+Calls of *get_item* with only the *key_param* parameter issued from several
+threads within *wait* seconds are then sent as one call of *get_items*, with
+the list of the keys as *bulk_param*. Each caller gets a response holding its
+own item, found in the bulk response by its *result_key*. The method can also
+collect lookups without blocking, until one of the results is needed : ::
+
+    first = client.get_item.defer(1)
+    second = client.get_item.defer(2)
+    first.result().data
+
+The bulk response goes through the middlewares of the bulk method. The
+response of an item is built from it already decoded : it does not go through
+the middlewares of *get_item* again.
+"""
+
+from concurrent.futures import Future
+import json
+import threading
+import time
+
+import requests
+from requests.structures import CaseInsensitiveDict
+import six
+
+from .pagination import decoded, lookup
+
+# headers describing the body of the bulk response, not the one of an item
+ENTITY_HEADERS = ('Content-Length', 'Content-Encoding', 'Content-Range',
+                  'Content-MD5', 'Content-Disposition', 'Transfer-Encoding',
+                  'ETag', 'Last-Modified', 'Digest')
+
+clock = getattr(time, 'monotonic', time.time)
+
+DEFAULTS = {
+    'key_param': 'id',
+    'bulk_param': 'ids',
+    'result_key': 'id',
+    'items': None,
+    'max_size': 100,
+    'wait': 0.002,
+}
+
+
+def build_bulk(description):
+    """ Completes a bulk description with default values
+    """
+    if not description:
+        return None
+    return dict(DEFAULTS, **description)
+
+
+class LoaderFuture(Future):
+    """ The future response of a deferred lookup. Asking for its result
+    sends the batch it belongs to if it's still pending.
+    """
+
+    def __init__(self, loader, batch):
+        super(LoaderFuture, self).__init__()
+        self._loader = loader
+        self._batch = batch
+
+    def result(self, timeout=None):
+        self._loader.dispatch(self._batch)
+        return super(LoaderFuture, self).result(timeout)
+
+
+class _Batch(object):
+
+    def __init__(self, deadline):
+        # when the lookups waiting for it send it
+        self.deadline = deadline
+        self.futures = {}
+        self.full = threading.Event()
+        self.dispatched = False
+
+
+class Loader(object):
+    """ Collects lookups of single items to fetch them with a bulk method
+
+    :param method: the :py:class:`~britney.core.SporeMethod` fetching one
+    item
+    :param bulk_method: the :py:class:`~britney.core.SporeMethod` fetching
+    many items
+    :param key_param: the parameter of *method* identifying the item
+    :param bulk_param: the list parameter of *bulk_method*
+    :param result_key: the key identifying an item in the bulk response
+    :param items: the key of the items in the bulk response (defaults to None
+    when the response is the list of the items)
+    :param max_size: the maximum number of keys in a bulk call
+    :param wait: the number of seconds to wait for other lookups before
+    sending a bulk call
+    """
+
+    def __init__(self, method, bulk_method, key_param='id', bulk_param='ids',
+                 result_key='id', items=None, max_size=100, wait=0.002):
+        self.method = method
+        self.bulk_method = bulk_method
+        self.key_param = key_param
+        self.bulk_param = bulk_param
+        self.result_key = result_key
+        self.items = items
+        self.max_size = max_size
+        self.wait = wait
+
+        self._pending = None
+        self._lock = threading.Lock()
+
+    def __repr__(self):
+        return '<Loader [{} -> {}]>'.format(self.method.name,
+                                            self.bulk_method.name)
+
+    def derive(self, method, bulk_method):
+        """ Returns a loader with the same options for other methods, like the
+        methods of a derived client
+        """
+        return Loader(method, bulk_method, key_param=self.key_param,
+                      bulk_param=self.bulk_param, result_key=self.result_key,
+                      items=self.items, max_size=self.max_size,
+                      wait=self.wait)
+
+    def after_fork(self):
+        """ Forgets the lookups pending in the parent process and replaces its
+        lock
+        """
+        self._pending = None
+        self._lock = threading.Lock()
+
+    def accepts(self, kwargs):
+        """ Whether a call with these parameters can be batched
+        """
+        return len(kwargs) == 1 and self.key_param in kwargs
+
+    def defer(self, key):
+        """ Adds a lookup to the pending batch without sending it
+
+        :rtype: ~britney.loader.LoaderFuture
+        """
+        return self._add(key)[0]
+
+    def load(self, key):
+        """ Looks up an item, waiting for other lookups to batch them
+
+        :rtype: requests.Response
+        :raises: ~britney.errors.SporeMethodStatusError when the item is not
+        found
+        """
+        future, _ = self._add(key)
+        # any lookup sends the batch once its wait is over, the batch may
+        # have been opened by a deferred lookup
+        batch = future._batch
+        batch.full.wait(max(0, batch.deadline - clock()))
+        return future.result()
+
+    def _add(self, key):
+        with self._lock:
+            batch = self._pending
+            leader = batch is None
+            if leader:
+                batch = self._pending = _Batch(clock() + self.wait)
+
+            future = batch.futures.get(key)
+            if future is None:
+                future = batch.futures[key] = LoaderFuture(self, batch)
+
+            if len(batch.futures) >= self.max_size:
+                self._pending = None
+                batch.full.set()
+        return future, leader
+
+    def dispatch(self, batch):
+        """ Sends a batch of lookups if it has not been sent yet
+        """
+        with self._lock:
+            if batch.dispatched:
+                return
+            batch.dispatched = True
+            if self._pending is batch:
+                self._pending = None
+
+        try:
+            response = self.bulk_method(**{
+                self.bulk_param: list(batch.futures)
+            })
+            found = self.index(response)
+        except Exception as error:
+            for future in batch.futures.values():
+                future.set_exception(error)
+            return
+
+        for key, future in batch.futures.items():
+            try:
+                future.set_result(self.respond(
+                    response, found.get(six.text_type(key))
+                ))
+            except Exception as error:
+                future.set_exception(error)
+
+    def index(self, response):
+        """ Items of a bulk response by their key
+        """
+        items = decoded(response)
+        if self.items:
+            items = lookup(items, self.items)
+        return {
+            six.text_type(item.get(self.result_key)): item
+            for item in items or [] if isinstance(item, dict)
+        }
+
+    def respond(self, bulk_response, item):
+        """ Builds the response of a single lookup from the bulk response and
+        checks its status like *method* would. The headers describing the body
+        of the bulk response are left out, and the middlewares of *method* are
+        not applied.
+        """
+        response = requests.Response()
+        response.headers = CaseInsensitiveDict(bulk_response.headers)
+        for name in ENTITY_HEADERS:
+            response.headers.pop(name, None)
+        response.headers['Content-Type'] = 'application/json'
+        response.url = bulk_response.url
+        response.encoding = 'utf-8'
+        response.environ = dict(getattr(bulk_response, 'environ', None) or {})
+        response.environ['spore.expected_status'] = \
+            self.method.expected_status
+        if item is None:
+            response.status_code = 404
+            response.reason = 'Not Found'
+            response._content = b''
+        else:
+            response.status_code = bulk_response.status_code
+            response.reason = bulk_response.reason
+            response._content = json.dumps(item).encode('utf-8')
+        response.data = item
+
+        self.method.check_status(response)
+        return response
@@ -6,11 +6,30 @@ britney.middleware.auth
 
 """
 
-__all__ = ['Basic', 'ApiKey']
+__all__ = ['Basic', 'ApiKey', 'OAuth2', 'SigV4']
 
 
 import base64
+import hashlib
+import hmac
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+
+import requests
+from requests.compat import quote, unquote, urlencode, urlsplit
+import six
+from six.moves.urllib.parse import parse_qsl
+
 from . import base
+from .. import errors
+from ..request import RequestBuilder
+from ..transport import reset_session
+
+logger = logging.getLogger(__name__)
 
 
 def _basic_auth(username, password):
@@ -42,12 +61,12 @@ class Basic(Auth):
     def __init__(self, username, password):
         self.username = username
         self.password = password
+        self.authorization = _basic_auth(username, password)
 
     def process_request(self, environ):
         """
         """
-        base.add_header(environ, 'Authorization',
-                        _basic_auth(self.username, self.password))
+        base.add_header(environ, 'Authorization', self.authorization)
 
 
 class ApiKey(Auth):
@@ -64,4 +83,434 @@ class ApiKey(Auth):
     def process_request(self, environ):
         """
         """
-        base.add_header(environ, self.key, self.value)
\ No newline at end of file
+        base.add_header(environ, self.key, self.value)
+
+
+class _Token(object):
+    """ Bearer token shared by the middlewares using the same credentials
+    """
+
+    def __init__(self):
+        self.value = None
+        self.expires_at = 0
+        self.lifetime = 0
+        # held while fetching a token
+        self.lock = threading.Lock()
+        self.scheduled = False
+        self.schedule_lock = threading.Lock()
+
+    def after_fork(self):
+        # the thread refreshing the token in the parent doesn't exist here
+        self.lock = threading.Lock()
+        self.scheduled = False
+        self.schedule_lock = threading.Lock()
+
+
+_tokens = {}
+_tokens_lock = threading.Lock()
+
+
+def _after_fork():
+    global _tokens_lock
+    _tokens_lock = threading.Lock()
+    for token in _tokens.values():
+        token.after_fork()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_after_fork)
+
+
+class OAuth2(Auth):
+    """ Authenticates calls with bearer tokens got from the token endpoint of
+    an OAuth2 server with the client credentials grant.
+
+    Tokens are shared by all the middlewares using the same endpoint,
+    credentials and scope, and are refreshed by a single caller at a time. A
+    token about to expire is refreshed in the background while calls keep
+    using it. A call rejected with a 401 status is sent again once with a new
+    token, unless its file payload can't be rewound.
+    Enable this middleware after the format middlewares so that the
+    response of the retried call passes through them.
+
+    :param token_url: the url of the token endpoint
+    :param client_id: the identifier of the client
+    :param client_secret: the secret of the client
+    :param scope: the scope requested (defaults to None)
+    :param cache_path: a file keeping the token between restarts of the
+    process (defaults to None)
+    :param refresh_margin: seconds before the expiry of a token when it is
+    refreshed in the background, at most half its lifetime (defaults to 60)
+    :param timeout: timeout of the calls to the token endpoint in seconds
+    (defaults to 10)
+    :param session: the ``requests`` session calling the token endpoint
+    (defaults to a new session)
+    """
+
+    def __init__(self, token_url, client_id, client_secret, scope=None,
+                 cache_path=None, refresh_margin=60, timeout=10,
+                 session=None):
+        self.token_url = token_url
+        self.client_id = client_id
+        self.scope = scope
+        self.cache_path = cache_path
+        self.refresh_margin = refresh_margin
+        self.timeout = timeout
+        self.session = session or requests.Session()
+        self.credentials = _basic_auth(client_id, client_secret)
+        # tokens of other secrets of the client aren't shared
+        if isinstance(client_secret, six.text_type):
+            client_secret = client_secret.encode('utf-8')
+        self._secret_hash = _sha256(client_secret)
+
+        with _tokens_lock:
+            key = (token_url, client_id, scope, self._secret_hash)
+            if key not in _tokens:
+                _tokens[key] = _Token()
+                if cache_path:
+                    self.load(_tokens[key])
+            self._token = _tokens[key]
+
+    def after_fork(self):
+        """ Drops the connections to the token endpoint inherited from the
+        parent process
+        """
+        reset_session(self.session)
+
+    def token(self):
+        """ Returns a valid access token, fetching it when there is none or
+        when it has expired
+
+        :raises: ~britney.errors.SporeMethodStatusError when the token
+        endpoint refuses the credentials
+        """
+        token = self._token
+        value, expires_at = token.value, token.expires_at
+        now = time.time()
+        if value is None or now >= expires_at:
+            with token.lock:
+                if token.value is None or time.time() >= token.expires_at:
+                    self.refresh(token)
+                return token.value
+
+        if now >= expires_at - self._margin(token):
+            with token.schedule_lock:
+                schedule = not token.scheduled
+                token.scheduled = True
+            if schedule:
+                thread = threading.Thread(target=self._refresh_in_background,
+                                          args=(token,))
+                thread.daemon = True
+                thread.start()
+        return value
+
+    def invalidate(self, value):
+        """ Forgets a token refused by the service, unless it has been
+        refreshed since
+        """
+        with self._token.lock:
+            if self._token.value == value:
+                self._token.value = None
+
+    def refresh(self, token):
+        """ Fetches a new token from the token endpoint. The lock of the token
+        must be held.
+        """
+        data = {'grant_type': 'client_credentials'}
+        if self.scope:
+            data['scope'] = self.scope
+        response = self.session.post(
+            self.token_url, data=data, timeout=self.timeout,
+            headers={'Authorization': self.credentials,
+                     'Accept': 'application/json'}
+        )
+        if not response.ok:
+            raise errors.SporeMethodStatusError(response)
+
+        content = response.json()
+        token.value = content['access_token']
+        token.lifetime = int(content.get('expires_in', 3600))
+        token.expires_at = time.time() + token.lifetime
+        if self.cache_path:
+            self.save(token)
+
+    def _refresh_in_background(self, token):
+        try:
+            with token.lock:
+                if time.time() >= token.expires_at - self._margin(token):
+                    self.refresh(token)
+        except Exception:
+            logger.warning('Refreshing the token from %s failed',
+                           self.token_url, exc_info=True)
+        finally:
+            with token.schedule_lock:
+                token.scheduled = False
+
+    def _margin(self, token):
+        # a margin longer than the lifetime would refresh on every call
+        return min(self.refresh_margin, token.lifetime / 2.0)
+
+    def _cache_key(self):
+        return [self.token_url, self.client_id, self.scope,
+                self._secret_hash]
+
+    def load(self, token):
+        """ Reads a token from the cache file, if it belongs to the same
+        credentials and has not expired
+        """
+        try:
+            with open(self.cache_path) as cache_file:
+                content = json.load(cache_file)
+        except (IOError, OSError, ValueError):
+            return
+        if content.get('key') == self._cache_key() and \
+                content.get('expires_at', 0) > time.time():
+            token.value = content['access_token']
+            token.expires_at = content['expires_at']
+            token.lifetime = token.expires_at - time.time()
+
+    def save(self, token):
+        """ Writes a token to the cache file, readable by its owner only
+        """
+        directory = os.path.dirname(os.path.abspath(self.cache_path))
+        handle, path = tempfile.mkstemp(dir=directory)
+        try:
+            with os.fdopen(handle, 'w') as cache_file:
+                json.dump({'key': self._cache_key(),
+                           'access_token': token.value,
+                           'expires_at': token.expires_at}, cache_file)
+            replace = getattr(os, 'replace', os.rename)
+            replace(path, self.cache_path)
+        except (IOError, OSError):
+            logger.warning('Caching the token in %s failed', self.cache_path,
+                           exc_info=True)
+            if os.path.exists(path):
+                os.remove(path)
+
+    def process_request(self, environ):
+        """
+        """
+        token = self.token()
+        environ['spore.oauth2.token'] = token
+        base.add_header(environ, 'Authorization', 'Bearer ' + token)
+
+        # 401 responses reach process_response to be retried
+        expected_status = environ['spore.expected_status']
+        environ['spore.oauth2.expected_status'] = expected_status
+        if 401 not in expected_status:
+            environ['spore.expected_status'] = list(expected_status) + [401]
+        # file bodies read by the call are rewound to be sent again
+        environ['spore.oauth2.positions'] = _positions(environ)
+
+    def process_response(self, response):
+        """
+        """
+        environ = getattr(response, 'environ', None) or {}
+        if response.status_code != 401 or \
+                'spore.oauth2.token' not in environ or \
+                'spore.sender' not in environ:
+            return response
+
+        self.invalidate(environ['spore.oauth2.token'])
+        method = environ['spore.sender']
+        positions = environ.get('spore.oauth2.positions')
+        if positions is not None:
+            for body, position in positions:
+                body.seek(position)
+            token = self.token()
+            environ['spore.oauth2.token'] = token
+            base.add_header(environ, 'Authorization', 'Bearer ' + token)
+            # sent again like the first time
+            response = method.send(environ)
+
+        # checked as the method would
+        environ['spore.expected_status'] = \
+            environ['spore.oauth2.expected_status']
+        method.check_status(response)
+        return response
+
+
+def _positions(environ):
+    """ Returns the file objects of the payload and files of a request with
+    their positions, or None when one of them can't be rewound
+    """
+    bodies = [environ.get('spore.payload')]
+    files = environ.get('spore.files') or {}
+    for value in (files.values() if isinstance(files, dict)
+                  else (value for _, value in files)):
+        bodies.append(value[1] if isinstance(value, (tuple, list)) else value)
+
+    positions = []
+    for body in bodies:
+        if not hasattr(body, 'read'):
+            continue
+        try:
+            positions.append((body, body.tell()))
+        except (AttributeError, IOError, OSError, ValueError):
+            return None
+    return positions
+
+
+def _sha256(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+def _hmac(key, message):
+    return hmac.new(key, message.encode('utf-8'), hashlib.sha256).digest()
+
+
+def _uri_encode(value, safe='-_.~'):
+    return quote(value, safe=safe)
+
+
+def _hash_stream(stream, chunk_size=65536):
+    """ Hashes a file-like body by chunks and rewinds it, or returns None when
+    it can't be rewound
+    """
+    try:
+        position = stream.tell()
+    except (AttributeError, IOError, OSError):
+        return None
+    digest = hashlib.sha256()
+    while True:
+        chunk = stream.read(chunk_size)
+        if not chunk:
+            break
+        if isinstance(chunk, six.text_type):
+            chunk = chunk.encode('utf-8')
+        digest.update(chunk)
+    stream.seek(position)
+    return digest.hexdigest()
+
+
+class SigV4(Auth):
+    """ Signs calls like the AWS signature version 4 : an HMAC-SHA256 of the
+    method, canonical path, sorted query, signed headers and hash of the body,
+    with a key derived from the secret for the day, region and service.
+
+    The key of the day is derived once. File-like bodies are hashed by chunks
+    without being loaded, bodies that can't be rewound are sent unsigned.
+    Enable this middleware after all the middlewares changing the request.
+
+    :param access_key: the identifier of the key
+    :param secret_key: the secret of the key
+    :param region: the region of the service (eg: 'eu-west-1')
+    :param service: the name of the service (eg: 'execute-api')
+    :param session_token: a temporary session token (defaults to None)
+    :param signed_headers: names of other headers to sign when they are
+    set (defaults to Content-Type)
+    """
+
+    algorithm = 'AWS4-HMAC-SHA256'
+    unsigned_payload = 'UNSIGNED-PAYLOAD'
+
+    def __init__(self, access_key, secret_key, region, service,
+                 session_token=None, signed_headers=('Content-Type',)):
+        self.access_key = access_key
+        self.region = region
+        self.service = service
+        self.session_token = session_token
+        self.signed_headers = tuple(name.lower() for name in signed_headers)
+        self._secret = ('AWS4' + secret_key).encode('utf-8')
+        self._scope_suffix = '/{}/{}/aws4_request'.format(region, service)
+        self._signing_key = (None, None)
+
+    def signing_key(self, date):
+        """ Derives the key signing the requests of a day (eg: '20240131'),
+        or returns it from the cache
+        """
+        cached_date, key = self._signing_key
+        if cached_date != date:
+            key = _hmac(_hmac(_hmac(_hmac(self._secret, date), self.region),
+                              self.service), 'aws4_request')
+            self._signing_key = (date, key)
+        return key
+
+    def payload_hash(self, environ):
+        """ Hashes the body of the request, encoding a form payload once for
+        all
+        """
+        if environ.get('spore.files'):
+            return self.unsigned_payload
+
+        payload = environ['spore.payload']
+        if not payload:
+            return _sha256(b'')
+        if isinstance(payload, dict):
+            payload = urlencode(list(payload.items()), doseq=True)
+            environ['spore.payload'] = payload
+            environ['spore.payload_format'] = \
+                'application/x-www-form-urlencoded'
+            environ['spore.headers'].setdefault(
+                'Content-Type', 'application/x-www-form-urlencoded'
+            )
+        if isinstance(payload, six.text_type):
+            payload = payload.encode('utf-8')
+        if isinstance(payload, (six.binary_type, bytearray, memoryview)):
+            return _sha256(payload)
+        if hasattr(payload, 'read'):
+            return _hash_stream(payload) or self.unsigned_payload
+        return self.unsigned_payload
+
+    def canonical_request(self, environ, payload_hash):
+        """ Builds the canonical request, from the url and headers the request
+        will be sent with, and the list of signed headers
+        """
+        builder = RequestBuilder(environ)
+        headers = builder.headers
+        url = urlsplit(builder.uri)
+        path = _uri_encode(unquote(url.path), safe='-_.~/') or '/'
+        if self.service != 's3':
+            # the segments of the path are encoded twice but for S3
+            path = _uri_encode(path, safe='-_.~/')
+        # sorted by encoded name then value, not as joined strings
+        query = '&'.join('{}={}'.format(key, value) for key, value in sorted(
+            (_uri_encode(key), _uri_encode(value))
+            for key, value in parse_qsl(url.query, keep_blank_values=True)
+        ))
+
+        signed = {}
+        for name, value in headers.items():
+            lower = name.lower()
+            if lower == 'host' or lower.startswith('x-amz-') or \
+                    lower in self.signed_headers:
+                signed[lower] = ' '.join(str(value).split())
+        names = sorted(signed)
+
+        canonical = '\n'.join([
+            environ['REQUEST_METHOD'], path, query,
+            ''.join('{}:{}\n'.format(name, signed[name]) for name in names),
+            ';'.join(names), payload_hash
+        ])
+        return canonical, ';'.join(names)
+
+    def process_request(self, environ):
+        """
+        """
+        now = time.gmtime()
+        timestamp = time.strftime('%Y%m%dT%H%M%SZ', now)
+        date = timestamp[:8]
+
+        headers = environ['spore.headers']
+        payload_hash = self.payload_hash(environ)
+        headers['X-Amz-Date'] = timestamp
+        headers['X-Amz-Content-Sha256'] = payload_hash
+        if self.session_token:
+            headers['X-Amz-Security-Token'] = self.session_token
+
+        canonical, signed_headers = self.canonical_request(
+            environ, payload_hash
+        )
+        scope = date + self._scope_suffix
+        string_to_sign = '\n'.join([
+            self.algorithm, timestamp, scope,
+            _sha256(canonical.encode('utf-8'))
+        ])
+        signature = hmac.new(self.signing_key(date),
+                             string_to_sign.encode('utf-8'),
+                             hashlib.sha256).hexdigest()
+
+        base.add_header(environ, 'Authorization', (
+            '{} Credential={}/{}, SignedHeaders={}, Signature={}'
+        ).format(self.algorithm, self.access_key, scope, signed_headers,
+                 signature))
@@ -0,0 +1,401 @@
+# -*- coding: utf-8 -*-
+
+"""
+britney.middleware.cassette
+~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+Records the responses of real calls in a cassette and replays them offline,
+to test or load test services against real traffic without reaching their
+upstreams : ::
+
+    from britney.middleware import cassette
+
+    # record
+    with cassette.Cassette('/path/to/users') as users:
+        client.enable('Json')
+        client.enable(cassette.Record, cassette=users)
+        client.get_user(id=1)
+
+    # replay
+    users = cassette.Cassette('/path/to/users',
+                              rules={'search': {'ignore_params': ['nonce']}})
+    client.enable(cassette.Replay, cassette=users,
+                  middlewares=client.middlewares)
+
+A cassette is made of two append-only files : an index of the calls, one
+JSON list per line, and the concatenated bodies of the responses, which are
+memory-mapped on replay. The bodies of the replayed responses are copied from
+the mapping only when they are read. A cassette reads its files once, the
+first time it is replayed : the calls recorded afterwards are replayed by
+another :py:class:`Cassette` of the same path.
+
+:copyright: (c) 2013 by Arnaud Grausem
+:license: BSD see LICENSE for details
+"""
+
+__all__ = ['Cassette', 'Match', 'Record', 'Replay']
+
+
+import hashlib
+import io
+import itertools
+import json
+import mmap
+import os
+import threading
+
+from requests.compat import urlencode, urlsplit
+from requests.structures import CaseInsensitiveDict
+import six
+from six.moves.urllib.parse import parse_qsl, urlunsplit
+
+from . import base
+from .auth import _hash_stream
+from .. import errors
+from ..request import RequestBuilder
+from ..response import Response
+
+_DEFAULT_PORTS = {'http': 80, 'https': 443}
+
+# headers describing a body as it was sent, not as it was recorded
+_DROPPED_HEADERS = ('Content-Encoding', 'Transfer-Encoding',
+                    'Content-Length')
+
+
+def normalize_url(url):
+    """ Normalizes an url to compare calls : the scheme and host are
+    lowercased, the default port and the credentials are removed and the
+    parameters of the query are sorted
+    """
+    parts = urlsplit(url)
+    scheme = parts.scheme.lower()
+    netloc = parts.hostname or ''
+    if ':' in netloc:
+        netloc = '[%s]' % netloc
+    if parts.port and parts.port != _DEFAULT_PORTS.get(scheme):
+        netloc += ':%d' % parts.port
+    query = urlencode(sorted(parse_qsl(parts.query, keep_blank_values=True)))
+    return urlunsplit((scheme, netloc, parts.path or '/', query, ''))
+
+
+def body_hash(data, files):
+    """ Hashes the payload of a call, or returns None when it can't be read
+    without being consumed
+    """
+    if files:
+        fields = sorted(data.items()) if isinstance(data, dict) else []
+        data = urlencode(fields + [('files', name) for name in sorted(files)])
+    elif isinstance(data, dict):
+        data = urlencode(sorted(data.items()), doseq=True)
+    if not data:
+        return ''
+    if isinstance(data, six.text_type):
+        data = data.encode('utf-8')
+    if hasattr(data, 'read'):
+        return _hash_stream(data)
+    return hashlib.sha256(bytes(data)).hexdigest()
+
+
+def signature(environ):
+    """ Describes a call by the name of its method, its verb, its normalized
+    url and the hash of its payload
+    """
+    builder = RequestBuilder(environ)
+    return (environ.get('spore.method') or '', environ['REQUEST_METHOD'],
+            normalize_url(builder.uri), body_hash(builder.data, builder.files))
+
+
+class Match(object):
+    """ Rule telling which parts of the calls of a method must be the same to
+    replay a recording
+
+    :param host: compares the scheme, the host and the port (defaults to
+    True)
+    :param query: compares the parameters of the query (defaults to True)
+    :param ignore_params: names of the parameters of the query not compared
+    (defaults to none)
+    :param body: compares the payloads (defaults to True)
+    """
+
+    def __init__(self, host=True, query=True, ignore_params=(), body=True):
+        self.host = host
+        self.query = query
+        self.ignore_params = frozenset(ignore_params)
+        self.body = body
+
+    def key(self, call):
+        """ Returns the key of a call, as described by :py:func:`signature`
+        """
+        name, verb, url, payload_hash = call
+        if not self.host or not self.query or self.ignore_params:
+            scheme, netloc, path, query, _ = urlsplit(url)
+            if not self.host:
+                scheme = netloc = ''
+            if not self.query:
+                query = ''
+            elif self.ignore_params:
+                query = urlencode([
+                    (param, value) for param, value
+                    in parse_qsl(query, keep_blank_values=True)
+                    if param not in self.ignore_params
+                ])
+            url = urlunsplit((scheme, netloc, path, query, ''))
+        return name, verb, url, payload_hash if self.body else None
+
+
+def _rule(rule):
+    if rule is None:
+        return Match()
+    if isinstance(rule, dict):
+        return Match(**rule)
+    return rule
+
+
+class _Body(object):
+    """ Body of a replayed response, read from a view of the mapped bodies
+    """
+
+    def __init__(self, view):
+        self._view = view
+        self._position = 0
+
+    def read(self, size=-1):
+        end = len(self._view)
+        if size is not None and size >= 0:
+            end = min(end, self._position + size)
+        chunk = bytes(self._view[self._position:end])
+        self._position = end
+        if self._position >= len(self._view):
+            self.close()
+        return chunk
+
+    def close(self):
+        # the mapping can't be closed while views of it exist
+        if not six.PY2 and self._view:
+            self._view.release()
+        self._view = b''
+        self._position = 0
+
+
+class Cassette(object):
+    """ Recorded responses, indexed by the keys of their calls. When a call
+    was recorded several times, its responses are replayed in turn. The index
+    and the bodies are read the first time a call is looked up : the calls
+    recorded afterwards aren't replayed by this cassette.
+
+    :param path: the path of the cassette, without extension. The index is
+    stored in *path*.index and the bodies in *path*.bodies
+    :param rules: the :py:class:`Match` rules, or the dicts of their
+    parameters, by method name
+    :param match: the rule of the other methods (defaults to comparing
+    everything)
+    """
+
+    def __init__(self, path, rules=None, match=None):
+        self.path = path
+        self.index_path = path + '.index'
+        self.bodies_path = path + '.bodies'
+        self.match = _rule(match)
+        self.rules = dict(
+            (name, _rule(rule)) for name, rule in (rules or {}).items()
+        )
+        self._lock = threading.Lock()
+        self._entries = None
+        self._bodies = None
+        self._bodies_file = None
+        self._index_file = None
+
+    def __repr__(self):
+        return '<Cassette {}>'.format(self.path)
+
+    def __len__(self):
+        self.load()
+        return sum(len(entries) for entries, _ in self._entries.values())
+
+    def key(self, call):
+        """ Returns the key of a call, following the rule of its method
+        """
+        return self.rules.get(call[0], self.match).key(call)
+
+    def load(self):
+        """ Reads the index and maps the bodies in memory, once
+        """
+        if self._entries is not None:
+            return
+        with self._lock:
+            if self._entries is not None:
+                return
+            entries = {}
+            if os.path.exists(self.index_path):
+                with io.open(self.index_path, 'r', encoding='utf-8') as index:
+                    for line in index:
+                        entry = json.loads(line)
+                        entries.setdefault(self.key(tuple(entry[0])),
+                                           []).append(entry)
+            if os.path.exists(self.bodies_path) and \
+                    os.path.getsize(self.bodies_path):
+                with open(self.bodies_path, 'rb') as bodies:
+                    self._bodies = mmap.mmap(bodies.fileno(), 0,
+                                             access=mmap.ACCESS_READ)
+            self._entries = dict(
+                (key, (found, itertools.count()))
+                for key, found in entries.items()
+            )
+
+    def find(self, call, environ=None):
+        """ Returns the next recorded response of a call, or None
+
+        :param call: the call, as described by :py:func:`signature`
+        :param environ: the environment set on the response
+        :rtype: ~britney.response.Response
+        """
+        self.load()
+        found = self._entries.get(self.key(call))
+        if found is None:
+            return None
+        entries, counter = found
+        _, status, reason, headers, url, offset, length = \
+            entries[next(counter) % len(entries)]
+        if not length:
+            return Response(status, CaseInsensitiveDict(headers), url,
+                            environ=environ, content=b'', reason=reason)
+        if six.PY2:
+            # the mappings of Python 2 have no views
+            return Response(status, CaseInsensitiveDict(headers), url,
+                            environ=environ, reason=reason,
+                            content=self._bodies[offset:offset + length])
+        view = memoryview(self._bodies)[offset:offset + length]
+        return Response(status, CaseInsensitiveDict(headers), url,
+                        environ=environ, raw=_Body(view), reason=reason)
+
+    def record(self, call, response):
+        """ Appends the response of a call to the cassette
+        """
+        content = response.content or b''
+        headers = dict(
+            (name, value) for name, value in response.headers.items()
+            if name.title() not in _DROPPED_HEADERS
+        )
+        with self._lock:
+            if self._index_file is None:
+                self._bodies_file = open(self.bodies_path, 'ab')
+                self._index_file = io.open(self.index_path, 'a',
+                                           encoding='utf-8')
+            self._bodies_file.seek(0, os.SEEK_END)
+            offset = self._bodies_file.tell()
+            self._bodies_file.write(content)
+            self._bodies_file.flush()
+            entry = [list(call), response.status_code, response.reason or '',
+                     headers, response.url, offset, len(content)]
+            self._index_file.write(
+                six.text_type(json.dumps(entry, separators=(',', ':'))) +
+                u'\n'
+            )
+            self._index_file.flush()
+
+    def close(self):
+        """ Closes the files of the cassette
+        """
+        with self._lock:
+            for opened in (self._bodies_file, self._index_file):
+                if opened is not None:
+                    opened.close()
+            self._bodies_file = self._index_file = None
+            if self._bodies is not None:
+                try:
+                    self._bodies.close()
+                except BufferError:
+                    # responses not read yet, unmapped with the last of them
+                    pass
+            self._bodies = self._entries = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+def _cassette(cassette):
+    if isinstance(cassette, six.string_types):
+        return Cassette(cassette)
+    return cassette
+
+
+class _AnyStatus(object):
+
+    def __contains__(self, status):
+        return True
+
+
+class Record(base.Middleware):
+    """ Records the responses of the calls in a cassette, whatever their
+    status. It must be enabled last, so that it records the request as it is
+    sent and the response as it is received. Responses with an unexpected
+    status are still raised as errors, once recorded.
+
+    :param cassette: a :py:class:`Cassette` or its path
+    """
+
+    def __init__(self, cassette):
+        self.cassette = _cassette(cassette)
+
+    def process_request(self, environ):
+        environ['spore.cassette.call'] = signature(environ)
+        # all the responses reach process_response to be recorded
+        environ['spore.cassette.expected_status'] = \
+            environ['spore.expected_status']
+        environ['spore.expected_status'] = _AnyStatus()
+
+    def process_response(self, response):
+        environ = getattr(response, 'environ', None) or {}
+        if 'spore.cassette.call' not in environ:
+            return response
+        self.cassette.record(environ['spore.cassette.call'], response)
+
+        expected_status = environ['spore.cassette.expected_status']
+        environ['spore.expected_status'] = expected_status
+        if not 200 <= response.status_code <= 299 and \
+                response.status_code not in expected_status:
+            raise errors.SporeMethodStatusError(response)
+        return response
+
+
+class Replay(base.Middleware):
+    """ Answers the calls with the responses recorded in a cassette, without
+    sending them. Like with :py:class:`~britney.middleware.utils.Mock`, the
+    recorded responses go through the process_response of the given
+    middlewares, and their status is checked. It must be enabled last.
+
+    :param cassette: a :py:class:`Cassette` or its path
+    :param middlewares: middlewares whose process_response is applied to the
+    recorded responses
+    :param strict: raises an error when no recording matches a call, instead
+    of sending it (defaults to True)
+    """
+
+    def __init__(self, cassette, middlewares=None, strict=True):
+        self.cassette = _cassette(cassette)
+        self.middlewares = middlewares or []
+        self.strict = strict
+        self.cassette.load()
+
+    def process_request(self, environ):
+        call = signature(environ)
+        response = self.cassette.find(call, environ)
+        if response is None:
+            if self.strict:
+                raise errors.SporeMethodCallError(
+                    'No recorded response for {} {}'.format(*call[1:3])
+                )
+            return None
+
+        if not 200 <= response.status_code <= 299 and \
+                response.status_code not in environ['spore.expected_status']:
+            raise errors.SporeMethodStatusError(response)
+        for predicate, middleware in self.middlewares:
+            if middleware is not self and \
+                    hasattr(middleware, 'process_response') and \
+                    predicate(environ):
+                middleware.process_response(response)
+        return response
@@ -8,11 +8,20 @@ britney.middleware.utils
 :license: BSD see LICENSE for details
 """
 
+import io
+import random
+import re
+import time
+
 import requests
-from requests_testadapter import TestAdapter
-from six import b
+from requests.structures import CaseInsensitiveDict
+from requests.utils import get_encoding_from_headers
+import six
+from six.moves.http_client import responses as reasons
+
 from . import base
 from ..request import RequestBuilder
+from ..transport import Transport, encode_body
 
 
 def fake_response(request, content, status_code=200, headers=None):
@@ -29,12 +38,220 @@ def fake_response(request, content, status_code=200, headers=None):
     :return: a fake response
     :rtype: ~requests.Response
     """
-    session = requests.session()
-    session.mount('http://', TestAdapter(b(content), status=status_code,
-        headers=headers))
-    method = getattr(session, request.method.lower())
-    return method(request.url)
-    
+    if isinstance(content, six.text_type):
+        content = content.encode('utf-8')
+    response = requests.Response()
+    response.status_code = status_code
+    response.reason = reasons.get(status_code, '')
+    response.headers = CaseInsensitiveDict(headers or {})
+    response.encoding = get_encoding_from_headers(response.headers) \
+        or 'utf-8'
+    response.raw = io.BytesIO(content)
+    response._content = content
+    response.url = request.url
+    response.request = request
+    return response
+
+
+class _Node(object):
+    """ Segment of the templated paths of :py:class:`Routes`
+    """
+
+    def __init__(self):
+        self.literals = {}
+        # (pattern of the segment or None for a whole placeholder, child)
+        self.patterns = []
+        # verb -> (function, names of the placeholders)
+        self.funcs = {}
+
+    def child(self, segment, placeholder_p):
+        """ Returns the child node of a segment of a templated path, and the
+        names of the placeholders of the segment
+        """
+        matches = list(placeholder_p.finditer(segment))
+        if not matches:
+            return self.literals.setdefault(segment, _Node()), []
+
+        names = [match.group(1) or match.group(2) for match in matches]
+        if len(matches) == 1 and matches[0].group(0) == segment:
+            source = None
+        else:
+            source, position = '', 0
+            for match in matches:
+                source += re.escape(segment[position:match.start()])
+                source += '([^/]+?)'
+                position = match.end()
+            source += re.escape(segment[position:]) + '$'
+
+        for pattern, child in self.patterns:
+            if getattr(pattern, 'pattern', None) == source:
+                return child, names
+        child = _Node()
+        self.patterns.append((source and re.compile(source), child))
+        # whole placeholders match anything, so they come last
+        self.patterns.sort(key=lambda item: item[0] is None)
+        return child, names
+
+    def find(self, segments, index, values, verb):
+        if index == len(segments):
+            for key in (verb, None):
+                if key in self.funcs:
+                    func, names = self.funcs[key]
+                    return func, dict(zip(names, values))
+            return None
+
+        segment = segments[index]
+        child = self.literals.get(segment)
+        if child is not None:
+            found = child.find(segments, index + 1, values, verb)
+            if found is not None:
+                return found
+        for pattern, child in self.patterns:
+            if pattern is None:
+                captured = [segment] if segment else None
+            else:
+                match = pattern.match(segment)
+                captured = list(match.groups()) if match else None
+            if captured is not None:
+                found = child.find(segments, index + 1, values + captured,
+                                   verb)
+                if found is not None:
+                    return found
+        return None
+
+
+class Routes(object):
+    """ Index of the fake responses of a fake server. Routes are paths, with
+    placeholders like ``/users/{id}``, ``/users/:id`` or ``/users/:id.json``,
+    optionally bound to an HTTP verb with a (verb, path) tuple. Functions can
+    also respond to all the calls of a SPORE method, by its name.
+
+    Paths without placeholders are found with a dict lookup. Templated paths
+    are indexed by segment, so that finding a route doesn't depend on the
+    number of routes. Literal segments come before segments mixing text and
+    placeholders, which come before whole placeholders, and routes of a verb
+    come before routes of any verb.
+
+    :param fakes: a dict of functions taking a prepared request and returning
+    a response, by route
+    :param methods: a dict of the same functions, by method name
+    """
+
+    _PLACEHOLDER_P = re.compile(r'{(\w+)}|:(\w+)')
+
+    def __init__(self, fakes=None, methods=None):
+        self.methods = dict(methods or {})
+        self._static = {}
+        self._templates = _Node()
+        self._count = 0
+        for route, func in (fakes or {}).items():
+            self.add(route, func)
+
+    def __len__(self):
+        return self._count + len(self.methods)
+
+    def add(self, route, func):
+        """ Adds a route
+
+        :param route: a path or a (verb, path) tuple
+        :param func: the function building the response
+        """
+        verb, path = route if isinstance(route, tuple) else (None, route)
+        verb = verb.upper() if verb else None
+        self._count += 1
+        if not self._PLACEHOLDER_P.search(path):
+            self._static[(verb, path)] = func
+            return
+
+        node, names = self._templates, []
+        for segment in path.split('/'):
+            node, segment_names = node.child(segment, self._PLACEHOLDER_P)
+            names.extend(segment_names)
+        node.funcs[verb] = (func, names)
+
+    def match(self, verb, path, method_name=None):
+        """ Finds the function responding to a call
+
+        :return: the function and the values of the placeholders, or (None,
+        None) when no route matches
+        """
+        if method_name in self.methods:
+            return self.methods[method_name], {}
+        for key in ((verb, path), (None, path)):
+            if key in self._static:
+                return self._static[key], {}
+        found = self._templates.find(path.split('/'), 0, [], verb)
+        return found or (None, None)
+
+
+class Simulation(object):
+    """ Behavior of a fake upstream : the latency of its responses and the
+    rate of its errors
+
+    :param latency: the latency in seconds, or a callable returning it to
+    follow any distribution (defaults to 0)
+    :param jitter: the maximum number of seconds randomly added to or removed
+    from the latency (defaults to 0)
+    :param error_rate: the probability of an error response (defaults to 0)
+    :param error_status: the status of error responses (defaults to 503)
+    :param seed: the seed of the random generator (defaults to None)
+    """
+
+    def __init__(self, latency=0, jitter=0, error_rate=0, error_status=503,
+                 seed=None):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.random = random.Random(seed)
+
+    def delay(self):
+        """ Waits as long as the upstream would
+        """
+        latency = self.latency() if callable(self.latency) else self.latency
+        if self.jitter:
+            latency += self.random.uniform(-self.jitter, self.jitter)
+        if latency > 0:
+            time.sleep(latency)
+
+    def fails(self):
+        """ Tells whether the upstream answers the next call with an error
+        """
+        return bool(self.error_rate) and self.random.random() < self.error_rate
+
+    def respond(self, func, request):
+        """ Builds the response of a call, or an error response
+        """
+        self.delay()
+        if self.fails():
+            return fake_response(request, '', status_code=self.error_status)
+        return func(request)
+
+
+def _prepare(builder, environ):
+    """ Builds the prepared request given to the fake responses, without the
+    url parsing, cookies and hooks handling of ``requests``
+    """
+    request = requests.PreparedRequest()
+    request.method = environ['REQUEST_METHOD']
+    request.url = builder.uri
+    headers = builder.headers
+    request.body = encode_body(builder.data, builder.files, headers)
+    request.headers = CaseInsensitiveDict(headers)
+    return request
+
+
+def _respond(routes, simulation, builder, environ):
+    func, params = routes.match(environ['REQUEST_METHOD'], builder.path_info,
+                                environ.get('spore.method'))
+    if func is None:
+        return None
+    request = _prepare(builder, environ)
+    request.route_params = params
+    response = simulation.respond(func, request)
+    response.environ = environ
+    return response
+
 
 class Mock(base.Middleware):
     """ This middleware can add the ability to fake a server that exposes an
@@ -42,9 +259,11 @@ class Mock(base.Middleware):
 
     .. py:attribute:: fakes
 
-        fakes should be a dict. Keys are pathes and values associated are
+        fakes should be a dict. Keys are pathes, templated pathes (eg:
+        '/users/{id}') or (verb, path) tuples, and values associated are
         callables that takes a request as argument and returns a response
-        object
+        object. The values of the placeholders are set in the
+        *route_params* attribute of the request. See :py:class:`Routes`
 
     Here is an example to use it : ::
 
@@ -64,19 +283,29 @@ class Mock(base.Middleware):
         assert(result.text == 'OK')
         assert(result.status_code == 200)
         assert('Content-Type' in result.headers)
+
+    Calls whose path matches no route are sent to the server. The latency
+    and errors of the fake server are simulated with the named arguments of
+    :py:class:`Simulation`.
+
+    :param fakes: the functions building responses, by route
+    :param middlewares: middlewares whose process_response is applied to the
+    fake responses
+    :param methods: the functions building responses, by method name
     """
 
-    def __init__(self, fakes, middlewares=None):
-        self.fakes = fakes
+    def __init__(self, fakes=None, middlewares=None, methods=None,
+                 **simulation):
+        self.fakes = fakes or {}
         self.middlewares = middlewares or []
+        self.routes = Routes(self.fakes, methods)
+        self.simulation = Simulation(**simulation)
 
     def process_request(self, environ):
-        finalized_request = RequestBuilder(environ)
-        for path, func in self.fakes.items():
-            if path == finalized_request.path_info:
-                response = func(finalized_request())
-                response.environ = environ
-                return self.mock_process_response(response)
+        response = _respond(self.routes, self.simulation,
+                            RequestBuilder(environ), environ)
+        if response is not None:
+            return self.mock_process_response(response)
 
     def mock_process_response(self, response):
         if self.middlewares:
@@ -85,3 +314,34 @@ class Mock(base.Middleware):
                         predicate(response.environ):
                     middleware.process_response(response)
         return response
+
+
+class FakeTransport(Transport):
+    """ A transport answering with fake responses instead of sending the
+    requests, reusable by many clients and threads. Unlike the
+    :py:class:`Mock` middleware, the responses go through the middlewares
+    like real ones. Calls matching no route get a 404 response.
+
+    :param fakes: the functions building responses, by route. See
+    :py:class:`Routes`
+    :param methods: the functions building responses, by method name
+    :param simulation: the named arguments of :py:class:`Simulation`
+    """
+
+    def __init__(self, fakes=None, methods=None, **simulation):
+        self.routes = Routes(fakes, methods)
+        self.simulation = Simulation(**simulation)
+
+    def __repr__(self):
+        return '<FakeTransport [{} routes]>'.format(len(self.routes))
+
+    def prepare(self, environ):
+        return RequestBuilder(environ)
+
+    def send(self, request, environ, stream=True):
+        response = _respond(self.routes, self.simulation, request, environ)
+        if response is None:
+            response = fake_response(_prepare(request, environ), '',
+                                     status_code=404)
+            response.environ = environ
+        return response
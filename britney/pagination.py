@@ -0,0 +1,255 @@
+# -*- coding: utf-8 -*-
+
+"""
+britney.pagination
+~~~~~~~~~~~~~~~~~~
+
+Iterating over the items of paginated methods. The way a method paginates is
+set in its description with the *pagination* key : ::
+
+    "list_users": {
+        "method": "GET",
+        "path": "/users",
+        "optional_params": ["page", "per_page"],
+        "pagination": {
+            "style": "page",
+            "page_param": "page",
+            "size_param": "per_page",
+            "size": 100,
+            "items": "results",
+            "total": "count"
+        }
+    }
+
+Four styles are available :
+
+  * *page* : a page number is sent in *page_param*, starting at *first_page*
+  * *offset* : the index of the first item is sent in *offset_param*
+  * *cursor* : the value found at the *next_cursor* key of a page is sent in
+    *cursor_param* to get the next page
+  * *link* : the next page is the 'next' link of the Link header, called
+    with the parameters of the method found in its query. It's the last page
+    when the link brings no new parameter.
+
+*items* and *total* are keys of the decoded page (dotted for nested keys). If
+*items* is not set, a page is the list of the items. When the total number of
+items is known, the remaining pages of the page and offset styles are fetched
+concurrently, else the next page is fetched while the current one is
+consumed.
+"""
+
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from requests.compat import urlparse
+from six.moves.urllib.parse import parse_qsl
+
+from . import errors
+
+STYLES = ('page', 'offset', 'cursor', 'link')
+
+DEFAULTS = {
+    'style': 'page',
+    'page_param': 'page',
+    'first_page': 1,
+    'offset_param': 'offset',
+    'cursor_param': 'cursor',
+    'next_cursor': 'next',
+    'size_param': None,
+    'size': None,
+    'items': None,
+    'total': None,
+}
+
+
+def build_pagination(description):
+    """ Completes a pagination description with default values
+    """
+    if not description:
+        return None
+    return dict(DEFAULTS, **description)
+
+
+def lookup(data, key):
+    """ Gets the value of a dotted key in decoded data
+    """
+    for part in key.split('.'):
+        if not isinstance(data, dict):
+            return None
+        data = data.get(part)
+    return data
+
+
+def decoded(response):
+    """ Decoded content of a response, by a format middleware if enabled
+    """
+    data = getattr(response, 'data', None)
+    if data is None:
+        data = response.json() if response.content else {}
+    return data
+
+
+class Paginator(object):
+    """ Lazy iterator over the items of a paginated method
+
+    :param method: the paginated :py:class:`~britney.core.SporeMethod`
+    :param params: parameters passed to each call of the method
+    :param prefetch: fetches the next page while the current one is consumed
+    (defaults to True)
+    :param window: the maximum number of pages fetched concurrently when the
+    total is known (defaults to 4)
+    """
+
+    def __init__(self, method, params, prefetch=True, window=4):
+        if not method.pagination:
+            raise errors.SporeMethodCallError(
+                'Method %s is not paginated' % method.name
+            )
+        self.method = method
+        self.params = params
+        self.prefetch = prefetch
+        self.window = max(1, window)
+        self.conf = method.pagination
+
+    def __repr__(self):
+        return '<Paginator [{}]>'.format(self.method.name)
+
+    def __iter__(self):
+        for response in self.pages():
+            for item in self.items(response):
+                yield item
+
+    def items(self, response):
+        data = decoded(response)
+        if self.conf['items']:
+            data = lookup(data, self.conf['items'])
+        return data or []
+
+    def total(self, response):
+        if not self.conf['total']:
+            return None
+        total = lookup(decoded(response), self.conf['total'])
+        return int(total) if total is not None else None
+
+    def fetch(self, params):
+        kwargs = dict(self.params)
+        kwargs.update(params)
+        return self.method(**kwargs)
+
+    def _size_params(self):
+        if self.conf['size_param'] and self.conf['size']:
+            return {self.conf['size_param']: self.conf['size']}
+        return {}
+
+    def first_params(self):
+        params = self._size_params()
+        if self.conf['style'] == 'page':
+            params[self.conf['page_param']] = self.conf['first_page']
+        elif self.conf['style'] == 'offset':
+            params[self.conf['offset_param']] = 0
+        return params
+
+    def next_params(self, params, response):
+        """ Parameters to get the page following the one fetched with
+        *params*, or None if it was the last one
+        """
+        style = self.conf['style']
+        if style == 'cursor':
+            cursor = lookup(decoded(response), self.conf['next_cursor'])
+            if not cursor:
+                return None
+            return dict(params, **{self.conf['cursor_param']: cursor})
+
+        if style == 'link':
+            link = response.links.get('next', {}).get('url')
+            if not link:
+                return None
+            query = parse_qsl(urlparse(link).query)
+            next_params = dict(params, **{
+                key: value for key, value in query
+                if self.method.is_a_param(key)
+            })
+            # the link would lead to the same page again
+            return next_params if next_params != params else None
+
+        count = len(self.items(response))
+        size = self.conf['size']
+        if not count or (size and count < size):
+            return None
+        if style == 'page':
+            page_param = self.conf['page_param']
+            return dict(params, **{page_param: params[page_param] + 1})
+        offset_param = self.conf['offset_param']
+        return dict(params, **{offset_param: params[offset_param] + count})
+
+    def remaining_params(self, response):
+        """ Parameters of all the pages following the first one, when the
+        total number of items is known
+        """
+        total = self.total(response)
+        size = self.conf['size'] or len(self.items(response))
+        if total is None or not size or \
+                self.conf['style'] not in ('page', 'offset'):
+            return None
+
+        pages = []
+        for index in range(1, (total + size - 1) // size):
+            params = self._size_params()
+            if self.conf['style'] == 'page':
+                params[self.conf['page_param']] = \
+                    self.conf['first_page'] + index
+            else:
+                params[self.conf['offset_param']] = index * size
+            pages.append(params)
+        return pages
+
+    def pages(self):
+        """ Lazy iterator over the responses of each page
+        """
+        params = self.first_params()
+        response = self.fetch(params)
+
+        remaining = self.remaining_params(response)
+        if remaining is not None:
+            yield response
+            for page in self._concurrent_pages(remaining):
+                yield page
+        elif not self.prefetch:
+            while response is not None:
+                yield response
+                params = self.next_params(params, response)
+                response = self.fetch(params) if params else None
+        else:
+            for page in self._prefetched_pages(params, response):
+                yield page
+
+    def _concurrent_pages(self, remaining):
+        pending = deque()
+        executor = ThreadPoolExecutor(max_workers=self.window)
+        try:
+            remaining = deque(remaining)
+            while remaining or pending:
+                while remaining and len(pending) < self.window:
+                    pending.append(
+                        executor.submit(self.fetch, remaining.popleft())
+                    )
+                yield pending.popleft().result()
+        finally:
+            for future in pending:
+                future.cancel()
+            executor.shutdown(wait=False)
+
+    def _prefetched_pages(self, params, response):
+        executor = ThreadPoolExecutor(max_workers=1)
+        future = None
+        try:
+            while response is not None:
+                params = self.next_params(params, response)
+                future = executor.submit(self.fetch, params) \
+                    if params else None
+                yield response
+                response = future.result() if future is not None else None
+        finally:
+            if future is not None:
+                future.cancel()
+            executor.shutdown(wait=False)
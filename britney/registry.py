@@ -0,0 +1,168 @@
+# -*- coding: utf-8 -*-
+
+"""
+britney.registry
+~~~~~~~~~~~~~~~~
+
+A process-wide registry of clients, to build a client once per description,
+base url and middlewares instead of once per use : ::
+
+    import britney
+
+    def handler(request):
+        client = britney.get_client('/path/to/api.json', base_url=URL,
+                                    middlewares=['Json'])
+        return client.get_user(id=request.user_id).data
+
+A client is built again when its description file changes. The clients of
+the registry share one transport, so that clients of a same host share its
+pool of connections.
+"""
+
+import json
+import os
+import threading
+import time
+
+clock = getattr(time, 'monotonic', time.time)
+
+
+class _Entry(object):
+
+    __slots__ = ('client', 'mtime', 'checked')
+
+    def __init__(self, client, mtime, checked):
+        self.client = client
+        self.mtime = mtime
+        self.checked = checked
+
+
+def _mtime(spec_uri):
+    """ The modification time of a description file, or None for an url or
+    a missing file
+    """
+    if spec_uri.startswith('http'):
+        return None
+    try:
+        stat = os.stat(spec_uri)
+    except OSError:
+        return None
+    return getattr(stat, 'st_mtime_ns', stat.st_mtime)
+
+
+def _middleware(middleware):
+    if isinstance(middleware, (tuple, list)):
+        return middleware[0], dict(middleware[1])
+    return middleware, {}
+
+
+class Registry(object):
+    """ Clients built once and shared, by description, base url, middlewares
+    and transport
+
+    :param transport: the transport shared by the clients built without one
+    (defaults to a :py:class:`~britney.transport.RequestsTransport` built
+    when first needed)
+    :param check_interval: the minimum number of seconds between two checks
+    of the modification time of a description file (defaults to 1)
+    """
+
+    def __init__(self, transport=None, check_interval=1.0):
+        self._transport = transport
+        self.check_interval = check_interval
+        # reentrant, as the transport is built while building a client
+        self._lock = threading.RLock()
+        self._entries = {}
+
+    def __repr__(self):
+        return '<Registry [{} clients]>'.format(len(self._entries))
+
+    def __len__(self):
+        return len(self._entries)
+
+    @property
+    def transport(self):
+        """ The transport shared by the clients
+        """
+        if self._transport is None:
+            with self._lock:
+                if self._transport is None:
+                    from .transport import RequestsTransport
+                    self._transport = RequestsTransport()
+        return self._transport
+
+    def key(self, spec_uri, base_url=None, middlewares=(), transport=None):
+        """ The key of a client in the registry
+        """
+        if not spec_uri.startswith('http'):
+            spec_uri = os.path.abspath(spec_uri)
+        enabled = json.dumps([_middleware(middleware)
+                              for middleware in middlewares],
+                             sort_keys=True, default=repr)
+        return (spec_uri, base_url, enabled,
+                id(transport) if transport is not None else None)
+
+    def _changed(self, entry, spec_uri, now):
+        entry.checked = now
+        mtime = _mtime(spec_uri)
+        return mtime is not None and mtime != entry.mtime
+
+    def get(self, spec_uri, base_url=None, middlewares=(), transport=None):
+        """ Returns the client of a description, built if it's not in the
+        registry yet or if its description file changed
+
+        :param spec_uri: the path or url of the description
+        :param base_url: the base url replacing the one of the description
+        (defaults to None)
+        :param middlewares: the middlewares enabled on the client, as names
+        or classes, or (middleware, dict of named arguments) tuples
+        :param transport: the transport of the client (defaults to the
+        transport of the registry)
+        :rtype: ~britney.core.Spore
+        """
+        key = self.key(spec_uri, base_url, middlewares, transport)
+        path = key[0]
+        now = clock()
+        entry = self._entries.get(key)
+        if entry is not None and (
+                now - entry.checked < self.check_interval or
+                not self._changed(entry, path, now)):
+            return entry.client
+
+        with self._lock:
+            current = self._entries.get(key)
+            if current is not None and current is not entry:
+                # built meanwhile by another thread
+                return current.client
+            mtime = _mtime(path)
+            client = self.build(spec_uri, base_url, middlewares, transport)
+            self._entries[key] = _Entry(client, mtime, now)
+            return client
+
+    def build(self, spec_uri, base_url, middlewares, transport):
+        """ Builds a client of the registry
+        """
+        from . import new
+        client = new(spec_uri, base_url=base_url,
+                     transport=transport if transport is not None
+                     else self.transport)
+        for middleware in middlewares:
+            middleware, kwargs = _middleware(middleware)
+            client.enable(middleware, **kwargs)
+        return client
+
+    def clear(self):
+        """ Forgets the clients
+        """
+        with self._lock:
+            self._entries.clear()
+
+    def after_fork(self):
+        self._lock = threading.RLock()
+
+
+#: the registry of :py:func:`britney.get_client`
+registry = Registry()
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=registry.after_fork)
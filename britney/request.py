@@ -8,6 +8,11 @@ from requests import Request
 from requests.compat import quote
 from .utils import get_http_date
 
+#: scheme of the base urls reaching a service through a Unix domain socket,
+#: whose path is percent-encoded as the host (eg:
+#: ``http+unix://%2Frun%2Fsvc.sock/api``)
+UNIX_SCHEME = 'http+unix'
+
 
 class RequestBuilder(object):
     """
@@ -46,12 +51,14 @@ class RequestBuilder(object):
             if self.env['spore.userinfo']:
                 uri += self.env['spore.userinfo'] + '@'
 
-            uri += self.env['SERVER_NAME']
-
-            if self.env['wsgi.url_scheme'] == 'https':
+            if self.env.get('spore.unix_socket'):
+                uri += quote(self.env['spore.unix_socket'], safe='')
+            elif self.env['wsgi.url_scheme'] == 'https':
+                uri += self.env['SERVER_NAME']
                 if self.env['SERVER_PORT'] != 443:
                     uri += ':%d' % self.env['SERVER_PORT']
             else:
+                uri += self.env['SERVER_NAME']
                 if self.env['SERVER_PORT'] != 80:
                     uri += ':%d' % self.env['SERVER_PORT']
 
@@ -92,13 +99,21 @@ class RequestBuilder(object):
     def headers(self):
         """
         """
-        headers = {
-            'Host': '{0[SERVER_NAME]}:{0[SERVER_PORT]}'.format(self.env),
+        default_port = 443 if self.env['wsgi.url_scheme'] == 'https' else 80
+        if self.env.get('spore.unix_socket') or \
+                self.env['SERVER_PORT'] == default_port:
+            # without the default port, as HTTP clients send it
+            host = self.env['SERVER_NAME']
+        else:
+            host = '{0[SERVER_NAME]}:{0[SERVER_PORT]}'.format(self.env)
+        # a new dict, leaving the headers set by the middlewares untouched
+        headers = dict(self.env['spore.headers'])
+        headers.update({
+            'Host': host,
             'User-Agent': self.env['HTTP_USER_AGENT'],
             'Date': get_http_date()
-        }
-        self.env['spore.headers'].update(headers)
-        return self.env['spore.headers']
+        })
+        return headers
 
     @property
     def data(self):
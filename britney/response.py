@@ -0,0 +1,138 @@
+# -*- coding: utf-8 -*-
+
+"""
+britney.response
+~~~~~~~~~~~~~~~~
+
+A lightweight response for transports that don't rely on ``requests``. It
+exposes the part of the interface of :py:class:`requests.Response` used by
+methods and middlewares.
+"""
+
+import json
+
+import requests
+from requests.utils import get_encoding_from_headers, parse_header_links
+
+from . import errors
+
+
+class Response(object):
+    """ Response of the REST Web Service
+
+    :param status_code: the HTTP status of the response
+    :param headers: a case insensitive mapping of the headers
+    :param url: the url of the request
+    :param environ: the environment of the request
+    :param raw: a file-like object to read the body from when *content* is
+    not given
+    :param content: the body of the response
+    :param reason: the reason phrase of the status
+    :param http_version: the version of the protocol used (eg: 'HTTP/2')
+    """
+
+    def __init__(self, status_code, headers, url, environ=None, raw=None,
+                 content=None, reason='', http_version='HTTP/1.1'):
+        self.status_code = status_code
+        self.headers = headers
+        self.url = url
+        self.environ = environ
+        self.raw = raw
+        self.reason = reason
+        self.http_version = http_version
+        self.request = None
+        self._content = content
+        self._encoding = None
+
+    def __repr__(self):
+        return '<Response [{}]>'.format(self.status_code)
+
+    def __getstate__(self):
+        # like requests.Response, pickled without its environment and its
+        # connection
+        state = dict(self.__dict__, environ=None, raw=None)
+        state['_content'] = self.content
+        return state
+
+    def __bool__(self):
+        return self.ok
+
+    __nonzero__ = __bool__
+
+    @property
+    def ok(self):
+        return self.status_code < 400
+
+    @property
+    def content(self):
+        """ The body of the response, read once from *raw* if needed
+        """
+        if self._content is None:
+            self._content = self.raw.read() if self.raw is not None else b''
+            self.release()
+        return self._content
+
+    @property
+    def encoding(self):
+        if self._encoding is None:
+            self._encoding = get_encoding_from_headers(self.headers) \
+                or 'utf-8'
+        return self._encoding
+
+    @encoding.setter
+    def encoding(self, value):
+        self._encoding = value
+
+    @property
+    def text(self):
+        return self.content.decode(self.encoding, 'replace')
+
+    def json(self, **kwargs):
+        return json.loads(self.text, **kwargs)
+
+    @property
+    def links(self):
+        header = self.headers.get('Link')
+        if not header:
+            return {}
+        return {
+            link.get('rel') or link.get('url'): link
+            for link in parse_header_links(header)
+        }
+
+    def iter_content(self, chunk_size=1):
+        """ Iterates over the body by chunks, without loading it when it has
+        not been read yet
+        """
+        if self._content is not None or self.raw is None:
+            content = self.content
+            for start in range(0, len(content), chunk_size):
+                yield content[start:start + chunk_size]
+            return
+        try:
+            while True:
+                chunk = self.raw.read(chunk_size)
+                if not chunk:
+                    break
+                yield chunk
+        finally:
+            self.release()
+
+    def raise_for_status(self):
+        if not self.ok:
+            raise errors.SporeMethodStatusError(self)
+
+    def release(self):
+        """ Gives the connection back to its pool
+        """
+        release_conn = getattr(self.raw, 'release_conn', None)
+        if release_conn is not None:
+            release_conn()
+
+    def close(self):
+        if self.raw is not None:
+            self.raw.close()
+        self.release()
+
+
+RESPONSE_TYPES = (requests.models.Response, Response)
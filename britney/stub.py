@@ -0,0 +1,330 @@
+# -*- coding: utf-8 -*-
+
+"""
+britney.stub
+~~~~~~~~~~~~
+
+A local HTTP server answering the methods of a SPORE description, to
+exercise clients end-to-end over real sockets without the real service.
+Every method is routed by its verb and its path, and answers with its
+expected status and a canned or generated body : ::
+
+    import britney
+    from britney import stub
+
+    with stub.serve('/path/to/api.json', responses={
+        'get_user': {'id': 1, 'name': 'Britney'},
+        'create_user': stub.StubResponse({'id': 2}, status=201),
+        'search': lambda request: [request.params['q']],
+    }, latency=0.01) as server:
+        client = britney.new('/path/to/api.json', base_url=server.base_url)
+        client.enable('Json')
+        client.get_user(id=1)
+
+Methods without a canned response answer with their name and the values of
+their parameters, in JSON.
+"""
+
+import collections
+import io
+import json
+import threading
+
+import six
+from six.moves import BaseHTTPServer, socketserver
+from six.moves.http_client import responses as reasons
+from six.moves.urllib.parse import parse_qsl, unquote, urlparse
+
+from .core import SporeMethod
+from .middleware.utils import Routes, Simulation
+
+
+#: the call received by the stub server, passed to the callables building
+#: responses
+StubRequest = collections.namedtuple(
+    'StubRequest', ['method_name', 'params', 'body', 'environ']
+)
+
+
+class StubResponse(object):
+    """ A response of the stub server
+
+    :param body: the body of the response. Dicts and lists are sent as JSON
+    (defaults to the name of the method and its parameters, in JSON)
+    :param status: the status of the response (defaults to the expected
+    status of the method)
+    :param headers: the headers of the response (defaults to None)
+    """
+
+    def __init__(self, body=None, status=None, headers=None):
+        self.body = body
+        self.status = status
+        self.headers = headers or {}
+
+    def __repr__(self):
+        return '<StubResponse [{}]>'.format(self.status)
+
+
+def default_status(expected_status):
+    """ The status answered by a method : its first expected success status,
+    or its first expected status, or 200
+    """
+    for status in expected_status:
+        if 200 <= status <= 299:
+            return status
+    return expected_status[0] if expected_status else 200
+
+
+def _encode(body):
+    if isinstance(body, (dict, list)):
+        return json.dumps(body).encode('utf-8'), 'application/json'
+    if isinstance(body, six.text_type):
+        return body.encode('utf-8'), 'text/plain; charset=utf-8'
+    return body, 'application/octet-stream'
+
+
+def _load(description):
+    if not isinstance(description, six.string_types):
+        return description
+    from . import _new_from_file, _new_from_url
+    if description.startswith('http'):
+        return _new_from_url(description)
+    return _new_from_file(description)
+
+
+class StubApp(object):
+    """ WSGI application answering the methods of a SPORE description
+
+    :param description: the description, or its path or url
+    :param responses: the responses by method name. Values are
+    :py:class:`StubResponse`, bodies or callables taking a
+    :py:class:`StubRequest` and returning one of them
+    :param base_path: the path the methods are served under (defaults to the
+    path of the base url of the description)
+    :param simulation: the named arguments of
+    :py:class:`~britney.middleware.utils.Simulation`, to add latency and
+    errors
+    """
+
+    def __init__(self, description, responses=None, base_path=None,
+                 **simulation):
+        description = _load(description)
+        if base_path is None:
+            base_path = urlparse(description.get('base_url', '')).path
+        self.base_path = base_path.rstrip('/')
+        self.responses = responses or {}
+        self.simulation = Simulation(**simulation)
+        self.routes = Routes()
+        self.statuses = {}
+
+        for name, method in description.get('methods', {}).items():
+            method_base_path = self.base_path
+            if method.get('base_url'):
+                method_base_path = urlparse(method['base_url']).path.rstrip(
+                    '/'
+                )
+            path = method_base_path + method['path'].split('?')[0]
+            self.routes.add((method['method'], path), name)
+            self.statuses[name] = default_status(
+                method.get('expected_status') or []
+            )
+
+    def __repr__(self):
+        return '<StubApp [{} methods]>'.format(len(self.statuses))
+
+    def respond(self, name, params, environ):
+        """ Builds the response of a method
+        """
+        length = int(environ.get('CONTENT_LENGTH') or 0)
+        body = environ['wsgi.input'].read(length) if length else b''
+        response = self.responses.get(name)
+        if callable(response):
+            response = response(StubRequest(name, params, body, environ))
+        if not isinstance(response, StubResponse):
+            response = StubResponse(response)
+
+        status = response.status or self.statuses[name]
+        content = response.body
+        if content is None:
+            content = {'method': name, 'params': params}
+        content, content_type = _encode(content)
+        headers = dict({'Content-Type': content_type}, **response.headers)
+        if status in (204, 304):
+            # neither a body nor its length
+            headers.pop('Content-Length', None)
+            return status, headers, b''
+        headers['Content-Length'] = str(len(content))
+        if environ['REQUEST_METHOD'] == 'HEAD':
+            # the length of the body of a GET, without the body
+            content = b''
+        return status, headers, content
+
+    def __call__(self, environ, start_response):
+        name, params = self.routes.match(environ['REQUEST_METHOD'],
+                                         environ['PATH_INFO'])
+        self.simulation.delay()
+        if name is None:
+            status, headers, content = 404, {'Content-Length': '0'}, b''
+        elif self.simulation.fails():
+            status, headers, content = (self.simulation.error_status,
+                                        {'Content-Length': '0'}, b'')
+        else:
+            params = dict(
+                parse_qsl(environ.get('QUERY_STRING', ''),
+                          keep_blank_values=True),
+                **params
+            )
+            status, headers, content = self.respond(name, params, environ)
+
+        start_response('%d %s' % (status, reasons.get(status, '')),
+                       list(headers.items()))
+        return [content]
+
+
+class _StubHandler(BaseHTTPServer.BaseHTTPRequestHandler):
+    """ Runs the WSGI application with persistent HTTP/1.1 connections,
+    unlike the handler of :py:mod:`wsgiref`
+    """
+
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+
+    def read_body(self):
+        if self.headers.get('Transfer-Encoding', '').lower() != 'chunked':
+            length = int(self.headers.get('Content-Length') or 0)
+            return self.rfile.read(length)
+        chunks = []
+        while True:
+            size = int(self.rfile.readline().split(b';')[0], 16)
+            if not size:
+                self.rfile.readline()
+                return b''.join(chunks)
+            chunks.append(self.rfile.read(size))
+            self.rfile.readline()
+
+    def environ(self, body):
+        path, _, query = self.path.partition('?')
+        host, port = self.server.server_address[:2]
+        environ = {
+            'REQUEST_METHOD': self.command,
+            'SCRIPT_NAME': '',
+            'PATH_INFO': unquote(path),
+            'QUERY_STRING': query,
+            'CONTENT_TYPE': self.headers.get('Content-Type', ''),
+            'CONTENT_LENGTH': str(len(body)),
+            'SERVER_NAME': host,
+            'SERVER_PORT': str(port),
+            'SERVER_PROTOCOL': self.request_version,
+            'wsgi.version': (1, 0),
+            'wsgi.url_scheme': 'http',
+            'wsgi.input': io.BytesIO(body),
+            'wsgi.errors': io.StringIO(),
+            'wsgi.multithread': True,
+            'wsgi.multiprocess': False,
+            'wsgi.run_once': False,
+        }
+        for name, value in self.headers.items():
+            key = 'HTTP_' + name.upper().replace('-', '_')
+            if key not in ('HTTP_CONTENT_TYPE', 'HTTP_CONTENT_LENGTH'):
+                environ[key] = value
+        return environ
+
+    def handle_call(self):
+        response = {}
+
+        def start_response(status, headers, exc_info=None):
+            response['status'] = status
+            response['headers'] = headers
+
+        content = b''.join(self.server.app(self.environ(self.read_body()),
+                                           start_response))
+        code, _, reason = response['status'].partition(' ')
+        self.send_response(int(code), reason)
+        for name, value in response['headers']:
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(content)
+
+    def log_message(self, *args):
+        pass
+
+
+for _verb in SporeMethod.HTTP_METHODS:
+    setattr(_StubHandler, 'do_' + _verb, _StubHandler.handle_call)
+
+
+class _StubHTTPServer(socketserver.ThreadingMixIn, BaseHTTPServer.HTTPServer):
+
+    daemon_threads = True
+
+
+class StubServer(object):
+    """ Serves a WSGI application, like a :py:class:`StubApp`, from a thread
+    of the current process, one thread per connection
+
+    :param app: the WSGI application
+    :param host: the address to listen on (defaults to 127.0.0.1)
+    :param port: the port to listen on (defaults to a free port)
+    """
+
+    def __init__(self, app, host='127.0.0.1', port=0):
+        self.app = app
+        self.server = _StubHTTPServer((host, port), _StubHandler)
+        self.server.app = app
+        self.thread = None
+
+    def __repr__(self):
+        return '<StubServer {}>'.format(self.url)
+
+    @property
+    def url(self):
+        """ The url of the server
+        """
+        host, port = self.server.server_address[:2]
+        return 'http://%s:%d' % (host, port)
+
+    @property
+    def base_url(self):
+        """ The base url to give to the clients
+        """
+        return self.url + getattr(self.app, 'base_path', '')
+
+    def start(self):
+        """ Serves the application from a daemon thread
+        """
+        self.thread = threading.Thread(target=self.server.serve_forever)
+        self.thread.daemon = True
+        self.thread.start()
+        return self
+
+    def stop(self):
+        """ Stops serving and closes the listening socket
+        """
+        if self.thread is not None:
+            self.server.shutdown()
+            self.thread.join()
+            self.thread = None
+        self.server.server_close()
+
+    def __enter__(self):
+        if self.thread is None:
+            self.start()
+        return self
+
+    def __exit__(self, *args):
+        self.stop()
+
+
+def serve(description, responses=None, host='127.0.0.1', port=0,
+          **options):
+    """ Starts a stub server answering the methods of a description
+
+    :param description: the description, or its path or url
+    :param responses: the responses by method name. See :py:class:`StubApp`
+    :param host: the address to listen on (defaults to 127.0.0.1)
+    :param port: the port to listen on (defaults to a free port)
+    :param options: the other named arguments of :py:class:`StubApp`
+    :rtype: StubServer
+    """
+    return StubServer(StubApp(description, responses, **options), host,
+                      port).start()
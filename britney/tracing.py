@@ -0,0 +1,246 @@
+# -*- coding: utf-8 -*-
+
+"""
+britney.tracing
+~~~~~~~~~~~~~~~
+
+Request lifecycle tracing. A :py:class:`Tracer` enabled on a client records
+timestamped events for each call of a :py:class:`~britney.core.SporeMethod`,
+keeps the slowest ones in a bounded buffer and hands them to exporters.
+"""
+
+from collections import deque
+import logging
+import random
+import threading
+import time
+
+_clock = getattr(time, 'perf_counter', time.time)
+
+logger = logging.getLogger(__name__)
+
+ENVIRON_SUMMARY_KEYS = ('REQUEST_METHOD', 'SERVER_NAME', 'SERVER_PORT',
+                        'SCRIPT_NAME', 'PATH_INFO', 'QUERY_STRING',
+                        'spore.method', 'spore.authentication')
+
+
+def summarize_environ(environ):
+    """ Builds a summary of the request environment safe to keep in memory or
+    to export : parameters and headers values are left out as they may carry
+    credentials.
+
+    :param environ: the environment of the request
+    :rtype: dict
+    """
+    summary = {key: environ.get(key) for key in ENVIRON_SUMMARY_KEYS}
+    summary['spore.params'] = [
+        param for param, _ in (environ.get('spore.params') or [])
+    ]
+    summary['spore.headers'] = sorted(environ.get('spore.headers') or {})
+    return summary
+
+
+class Trace(object):
+    """ Events recorded during one call of a method
+
+    .. py:attribute:: events
+
+        a list of ``(name, offset, detail)`` tuples where offset is the
+        number of seconds elapsed since the start of the call
+
+    .. py:attribute:: environ
+
+        the environment of the request while the call runs, then its summary
+        once the trace is kept
+    """
+
+    def __init__(self, method, sampled=True):
+        self.method = method
+        self.sampled = sampled
+        self.timestamp = time.time()
+        self.start = _clock()
+        self.duration = None
+        self.events = []
+        self.environ = {}
+        self.status = None
+        self.error = None
+
+    def __repr__(self):
+        return '<Trace [{}]>'.format(self.method)
+
+    def mark(self, name, detail=None):
+        """ Records an event happening now
+
+        :param name: name of the event (eg: 'request.prepared')
+        :param detail: optional information about the event
+        """
+        self.events.append((name, _clock() - self.start, detail))
+
+    def to_dict(self):
+        """ Serializable representation of the trace
+        """
+        return {
+            'method': self.method,
+            'timestamp': self.timestamp,
+            'duration': self.duration,
+            'status': self.status,
+            'error': self.error,
+            'environ': self.environ,
+            'events': [
+                {'name': name, 'offset': offset, 'detail': detail}
+                for name, offset, detail in self.events
+            ],
+        }
+
+
+class LogExporter(object):
+    """ Exporter writing kept traces to a logger
+
+    :param logger: the logger to use (defaults to the 'britney.tracing'
+    logger)
+    :param level: the logging level (defaults to logging.INFO)
+    """
+
+    def __init__(self, logger=None, level=logging.INFO):
+        self.logger = logger or logging.getLogger(__name__)
+        self.level = level
+
+    def __call__(self, trace):
+        self.logger.log(self.level, '%s %s %.6fs %s', trace.method,
+                        trace.status or trace.error, trace.duration,
+                        ' '.join('%s=%.6f' % (name, offset)
+                                 for name, offset, _ in trace.events))
+
+
+class Tracer(object):
+    """ Collects traces of calls made by the methods of a client.
+
+    A trace is kept when it has been head sampled (decided at the start of the
+    call with *sample_rate*) or when it is slow (decided at the end of the
+    call with *slow_threshold* or *slow_percentile*). Kept traces are pushed
+    to the exporters and to a ring buffer of *buffer_size* traces.
+
+    :param sample_rate: probability for a call to be kept whatever its
+    duration (defaults to 0.0)
+    :param slow_threshold: duration in seconds above which a call is kept
+    (defaults to None)
+    :param slow_percentile: keeps calls slower than this percentile of the
+    recent durations, eg: 99 (defaults to None)
+    :param window: number of recent durations used to compute the percentile
+    (defaults to 1000)
+    :param buffer_size: number of kept traces remembered (defaults to 100)
+    :param exporters: a list of callables receiving each kept trace
+    """
+
+    def __init__(self, sample_rate=0.0, slow_threshold=None,
+                 slow_percentile=None, window=1000, buffer_size=100,
+                 exporters=None):
+        self.sample_rate = sample_rate
+        self.slow_threshold = slow_threshold
+        self.slow_percentile = slow_percentile
+        self.exporters = list(exporters or [])
+        self.traces = deque(maxlen=buffer_size)
+
+        self._durations = deque(maxlen=window)
+        self._percentile_value = None
+        self._refresh_every = max(1, window // 10)
+        self._since_refresh = 0
+        self._lock = threading.Lock()
+
+    def __repr__(self):
+        return '<Tracer [{} traces]>'.format(len(self.traces))
+
+    def after_fork(self):
+        """ Replaces the lock inherited from the parent process
+        """
+        self._lock = threading.Lock()
+
+    @property
+    def tail_sampling(self):
+        return self.slow_threshold is not None \
+            or self.slow_percentile is not None
+
+    def add_exporter(self, exporter):
+        """ Adds a callable receiving each kept trace
+        """
+        self.exporters.append(exporter)
+
+    def begin(self, method_name):
+        """ Starts the trace of a call. Returns None when the call will not be
+        kept whatever its duration, so that nothing gets recorded.
+
+        :param method_name: name of the called method
+        :rtype: ~britney.tracing.Trace or None
+        """
+        sampled = self.sample_rate >= 1 or \
+            (self.sample_rate > 0 and random.random() < self.sample_rate)
+        if not sampled and not self.tail_sampling:
+            return None
+        return Trace(method_name, sampled=sampled)
+
+    def end(self, trace, response=None, error=None):
+        """ Ends the trace of a call and keeps it if sampled or slow. The
+        environment of the request bound to the trace is then replaced by its
+        summary.
+
+        :return: True if the trace has been kept
+        """
+        trace.duration = _clock() - trace.start
+        if response is not None:
+            trace.status = response.status_code
+        if error is not None:
+            trace.error = repr(error)
+
+        environ, trace.environ = trace.environ, {}
+        slow = self._is_slow(trace.duration)
+        if not (trace.sampled or slow):
+            return False
+
+        trace.environ = summarize_environ(environ)
+        self.traces.append(trace)
+        for exporter in self.exporters:
+            # a failing exporter doesn't fail the call
+            try:
+                exporter(trace)
+            except Exception:
+                logger.warning('Exporting the trace of %s failed',
+                               trace.method, exc_info=True)
+        return True
+
+    def _is_slow(self, duration):
+        slow = self.slow_threshold is not None and \
+            duration >= self.slow_threshold
+        if self.slow_percentile is None:
+            return slow
+
+        with self._lock:
+            self._durations.append(duration)
+            self._since_refresh += 1
+            if self._percentile_value is None or \
+                    self._since_refresh >= self._refresh_every:
+                self._since_refresh = 0
+                self._percentile_value = percentile(self._durations,
+                                                    self.slow_percentile)
+            return slow or duration >= self._percentile_value
+
+    def slowest(self, count=10):
+        """ The slowest traces in the buffer
+        """
+        return sorted(self.traces, key=lambda trace: trace.duration,
+                      reverse=True)[:count]
+
+    def clear(self):
+        self.traces.clear()
+
+
+def percentile(values, rank):
+    """ Nearest rank percentile of a sequence of values
+
+    :param values: a sequence of numbers
+    :param rank: the percentile wanted, between 0 and 100
+    """
+    ordered = sorted(values)
+    if not ordered:
+        return None
+    index = int(round(rank / 100.0 * (len(ordered) - 1)))
+    return ordered[min(max(index, 0), len(ordered) - 1)]
@@ -0,0 +1,616 @@
+# -*- coding: utf-8 -*-
+
+"""
+britney.transport
+~~~~~~~~~~~~~~~~~
+
+HTTP engines sending the requests built by methods. A transport prepares a
+request from the environment left by the middlewares and sends it. Clients
+use a :py:class:`RequestsTransport` by default, any other transport can be
+set with :py:meth:`~britney.core.Spore.set_transport` : ::
+
+    from britney.transport import Urllib3Transport
+
+    client = britney.new('/path/to/api.json')
+    client.set_transport(Urllib3Transport(maxsize=10))
+
+The ``requests`` and ``urllib3`` transports also reach services listening on
+a Unix domain socket, with base urls like
+``http+unix://%2Frun%2Fsvc.sock/api``.
+They can open connections ahead of the first calls (see
+:py:meth:`~britney.core.Spore.warmup`), and resolve hosts through a
+:py:class:`~britney.dns.DnsCache`.
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+import socket
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+from requests.compat import unquote, urlencode
+import six
+from six.moves.http_cookiejar import DefaultCookiePolicy
+import urllib3
+from urllib3.connection import HTTPConnection
+from urllib3.exceptions import EmptyPoolError, HTTPError, NewConnectionError
+from urllib3.poolmanager import SSL_KEYWORDS
+
+from .dns import DnsCache
+from .request import UNIX_SCHEME, RequestBuilder
+from .response import Response
+
+
+def encode_body(data, files, headers):
+    """ Encodes a payload as bytes, as ``requests`` would, and sets its
+    content type in *headers* if not set yet
+    """
+    if files:
+        fields = list(data.items()) if isinstance(data, dict) else []
+        for name, value in files.items():
+            if isinstance(value, (tuple, list)):
+                filename, fileobj = value[0], value[1]
+                value = (filename, fileobj.read()) + tuple(value[2:])
+            else:
+                value = (getattr(value, 'name', name), value.read())
+            fields.append((name, value))
+        body, content_type = urllib3.encode_multipart_formdata(fields)
+        headers.setdefault('Content-Type', content_type)
+        return body
+
+    if not data:
+        return None
+    if isinstance(data, dict):
+        headers.setdefault('Content-Type',
+                           'application/x-www-form-urlencoded')
+        return urlencode(list(data.items()), doseq=True).encode('utf-8')
+    if isinstance(data, six.text_type):
+        return data.encode('utf-8')
+    return data
+
+
+def compile_request(environ):
+    """ Compiles the environment of a request into its method, url, body and
+    headers, for the transports that don't rely on ``requests``
+    """
+    builder = RequestBuilder(environ)
+    headers = builder.headers
+    body = encode_body(builder.data, builder.files, headers)
+
+    userinfo = environ.get('spore.userinfo')
+    if userinfo and 'Authorization' not in headers:
+        headers['Authorization'] = urllib3.make_headers(
+            basic_auth=userinfo
+        )['authorization']
+
+    return environ['REQUEST_METHOD'], builder.uri, body, headers
+
+
+class UnixHTTPConnection(HTTPConnection):
+    """ HTTP connection over a Unix domain socket
+
+    :param socket_path: the path of the socket
+    """
+
+    def __init__(self, socket_path, *args, **kwargs):
+        self.socket_path = socket_path
+        super(UnixHTTPConnection, self).__init__('localhost', *args, **kwargs)
+
+    def _new_conn(self):
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        if isinstance(self.timeout, (int, float)):
+            sock.settimeout(self.timeout)
+        try:
+            sock.connect(self.socket_path)
+        except socket.error as error:
+            sock.close()
+            raise NewConnectionError(
+                self, 'Failed to establish a new connection: %s' % error
+            )
+        return sock
+
+
+class UnixHTTPConnectionPool(urllib3.HTTPConnectionPool):
+    """ Pool of connections to a Unix domain socket, which path is given
+    percent-encoded as the host, as in the urls
+    """
+
+    ConnectionCls = UnixHTTPConnection
+
+    def __init__(self, host, port=None, **kwargs):
+        for keyword in SSL_KEYWORDS:
+            kwargs.pop(keyword, None)
+        super(UnixHTTPConnectionPool, self).__init__('localhost', **kwargs)
+        self.socket_path = unquote(host)
+
+    def __str__(self):
+        return '{}(socket_path={})'.format(type(self).__name__,
+                                           self.socket_path)
+
+    def _new_conn(self):
+        self.num_connections += 1
+        return self.ConnectionCls(self.socket_path,
+                                  timeout=self.timeout.connect_timeout,
+                                  **self.conn_kw)
+
+
+def support_unix_sockets(pool_manager):
+    """ Lets a ``urllib3`` pool manager open pools of connections to the
+    Unix domain sockets of ``http+unix`` urls
+
+    :param pool_manager: the pool manager to extend
+    """
+    http_key = pool_manager.key_fn_by_scheme['http']
+
+    def unix_key(context):
+        # socket paths are case sensitive, unlike the hosts
+        return http_key(context)._replace(key_host=context['host'])
+
+    pool_manager.pool_classes_by_scheme = dict(
+        pool_manager.pool_classes_by_scheme,
+        **{UNIX_SCHEME: UnixHTTPConnectionPool}
+    )
+    pool_manager.key_fn_by_scheme = dict(
+        pool_manager.key_fn_by_scheme, **{UNIX_SCHEME: unix_key}
+    )
+    return pool_manager
+
+
+class _CachedDnsConnection(object):
+    """ Connection resolving its host through the :py:class:`DnsCache` of
+    its class, and trying each address in turn
+    """
+
+    dns_cache = None
+
+    def _new_conn(self):
+        host = self._dns_host
+        try:
+            addresses = self.dns_cache.resolve(host, self.port)
+        except socket.gaierror:
+            addresses = None
+        if not addresses:
+            # reported by urllib3 as usual
+            return super(_CachedDnsConnection, self)._new_conn()
+
+        error = None
+        for address in addresses:
+            self._dns_host = address[4][0]
+            try:
+                return super(_CachedDnsConnection, self)._new_conn()
+            except NewConnectionError as connection_error:
+                error = connection_error
+            finally:
+                self._dns_host = host
+        # the host may have moved
+        self.dns_cache.forget(host, self.port)
+        raise error
+
+
+def use_dns_cache(pool_manager, dns_cache):
+    """ Lets a ``urllib3`` pool manager resolve the hosts of its new pools
+    through a cache
+
+    :param pool_manager: the pool manager to extend
+    :param dns_cache: a :py:class:`~britney.dns.DnsCache` instance
+    """
+    pool_classes = {}
+    for scheme in ('http', 'https'):
+        pool_class = pool_manager.pool_classes_by_scheme[scheme]
+        connection_class = type(
+            'Cached' + pool_class.ConnectionCls.__name__,
+            (_CachedDnsConnection, pool_class.ConnectionCls),
+            {'dns_cache': dns_cache}
+        )
+        pool_classes[scheme] = type('Cached' + pool_class.__name__,
+                                    (pool_class,),
+                                    {'ConnectionCls': connection_class})
+    pool_manager.pool_classes_by_scheme = dict(
+        pool_manager.pool_classes_by_scheme, **pool_classes
+    )
+    return pool_manager
+
+
+def _build_dns_cache(dns_cache):
+    if dns_cache is True:
+        return DnsCache()
+    # an empty cache is falsy
+    return None if dns_cache is False else dns_cache
+
+
+def warm_pool(pool, connections):
+    """ Opens connections of a ``urllib3`` pool ahead of the calls, at once,
+    up to the size of the pool
+
+    :param pool: the connection pool
+    :param connections: the number of connections wanted in the pool
+    :return: the number of connections opened
+    """
+    borrowed, idle = [], []
+    try:
+        for _ in range(min(connections, pool.pool.maxsize)):
+            try:
+                borrowed.append(pool._get_conn(timeout=0))
+            except EmptyPoolError:
+                break
+        idle = [conn for conn in borrowed if conn.sock is None]
+        if idle:
+            with ThreadPoolExecutor(min(len(idle), 16)) as executor:
+                list(executor.map(lambda conn: conn.connect(), idle))
+    finally:
+        for conn in borrowed:
+            pool._put_conn(conn)
+    return len(idle)
+
+
+#: errors of a transport warming up connections to an unreachable host
+WARMUP_ERRORS = (socket.error, HTTPError)
+
+
+class UnixAdapter(HTTPAdapter):
+    """ ``requests`` adapter sending ``http+unix`` urls to their socket, never
+    through a proxy
+    """
+
+    def init_poolmanager(self, *args, **kwargs):
+        super(UnixAdapter, self).init_poolmanager(*args, **kwargs)
+        support_unix_sockets(self.poolmanager)
+
+    def get_connection(self, url, proxies=None):
+        return super(UnixAdapter, self).get_connection(url)
+
+    def get_connection_with_tls_context(self, request, verify, proxies=None,
+                                        cert=None):
+        return super(UnixAdapter, self).get_connection_with_tls_context(
+            request, verify, cert=cert
+        )
+
+    def request_url(self, request, proxies):
+        return request.path_url
+
+
+def reset_session(session):
+    """ Replaces the connection pools of the adapters of a ``requests``
+    session by new ones, dropping the connections without closing them
+    """
+    for adapter in session.adapters.values():
+        if isinstance(adapter, HTTPAdapter):
+            adapter.proxy_manager = {}
+            adapter.init_poolmanager(adapter._pool_connections,
+                                     adapter._pool_maxsize,
+                                     block=adapter._pool_block)
+
+
+class Transport(object):
+    """ Base class of the transports
+
+    .. py:attribute:: limits
+
+        a :py:class:`~britney.limits.HostLimits` instance limiting the calls
+        in flight to each host through the transport, or None
+    """
+
+    limits = None
+
+    def prepare(self, environ):
+        """ Builds the request to send from the environment
+
+        :param environ: the environment of the request
+        """
+        raise NotImplementedError
+
+    def send(self, request, environ, stream=True):
+        """ Sends a prepared request. The body of the response may not be read
+        yet when *stream* is True.
+
+        :param request: a request returned by :py:meth:`prepare`
+        :param environ: the environment of the request, set as the *environ*
+        attribute of the response
+        :param stream: leaves the body unread (defaults to True)
+        """
+        raise NotImplementedError
+
+    def close(self):
+        """ Closes the pooled connections
+        """
+
+    def warmup(self, url, connections=1):
+        """ Opens connections to the host of an url ahead of the calls.
+        Transports without a pool of connections open none.
+
+        :param url: the url of the host
+        :param connections: the number of connections wanted (defaults to 1)
+        :return: the number of connections opened
+        """
+        return 0
+
+    def after_fork(self):
+        """ Drops the connections and locks inherited from the parent process,
+        in a child process
+        """
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+class RequestsTransport(Transport):
+    """ Sends requests with a ``requests`` session, keeping its connections
+    alive between calls. Cookies are not kept from one call to another.
+
+    :param session: the session to use (defaults to a new session)
+    :param verify: verifies TLS certificates (defaults to True)
+    :param dns_cache: a :py:class:`~britney.dns.DnsCache` resolving the
+    hosts, or True for a new one (defaults to None)
+    """
+
+    def __init__(self, session=None, verify=True, dns_cache=None):
+        if session is None:
+            session = requests.Session()
+            session.cookies.set_policy(
+                DefaultCookiePolicy(allowed_domains=[])
+            )
+        session.mount(UNIX_SCHEME + '://', UnixAdapter())
+        self.session = session
+        self.verify = verify
+        self.dns_cache = _build_dns_cache(dns_cache)
+        self._use_dns_cache()
+
+    def _use_dns_cache(self):
+        if self.dns_cache is None:
+            return
+        for prefix, adapter in self.session.adapters.items():
+            if isinstance(adapter, HTTPAdapter) and \
+                    not prefix.startswith(UNIX_SCHEME):
+                use_dns_cache(adapter.poolmanager, self.dns_cache)
+
+    def __repr__(self):
+        return '<RequestsTransport>'
+
+    def prepare(self, environ):
+        return RequestBuilder(environ)()
+
+    def send(self, request, environ, stream=True):
+        response = self.session.send(request, verify=self.verify,
+                                     stream=stream)
+        response.environ = environ
+        return response
+
+    def close(self):
+        self.session.close()
+
+    def warmup(self, url, connections=1):
+        adapter = self.session.get_adapter(url)
+        if not isinstance(adapter, HTTPAdapter):
+            return 0
+        if hasattr(adapter, 'get_connection_with_tls_context'):
+            pool = adapter.get_connection_with_tls_context(
+                requests.Request('GET', url).prepare(), self.verify
+            )
+        else:
+            pool = adapter.get_connection(url)
+        return warm_pool(pool, connections)
+
+    def after_fork(self):
+        reset_session(self.session)
+        if self.dns_cache is not None:
+            self.dns_cache.after_fork()
+            self._use_dns_cache()
+
+
+class Urllib3Transport(Transport):
+    """ Sends requests straight through a ``urllib3`` pool manager, without
+    the hooks, cookies, redirections and proxies handling of ``requests``.
+    Responses are :py:class:`~britney.response.Response` objects.
+
+    :param pool_manager: the pool manager to use (defaults to a new one)
+    :param dns_cache: a :py:class:`~britney.dns.DnsCache` resolving the
+    hosts, or True for a new one (defaults to None)
+    :param pool_kwargs: named arguments to build the pool manager (eg:
+    num_pools, maxsize, timeout)
+    """
+
+    def __init__(self, pool_manager=None, dns_cache=None, **pool_kwargs):
+        self.pool_kwargs = pool_kwargs
+        self.own_pool_manager = pool_manager is None
+        self.dns_cache = _build_dns_cache(dns_cache)
+        self.pool_manager = self._extend(
+            pool_manager or urllib3.PoolManager(**pool_kwargs)
+        )
+
+    def _extend(self, pool_manager):
+        if self.dns_cache is not None:
+            use_dns_cache(pool_manager, self.dns_cache)
+        return support_unix_sockets(pool_manager)
+
+    def __repr__(self):
+        return '<Urllib3Transport>'
+
+    def prepare(self, environ):
+        return compile_request(environ)
+
+    def send(self, request, environ, stream=True):
+        method, url, body, headers = request
+        raw = self.pool_manager.urlopen(
+            method, url, body=body, headers=headers, redirect=False,
+            retries=False, preload_content=not stream, decode_content=True
+        )
+        content = None if stream else raw.data
+        return Response(raw.status, raw.headers, url, environ=environ,
+                        raw=raw, content=content, reason=raw.reason)
+
+    def close(self):
+        self.pool_manager.clear()
+
+    def warmup(self, url, connections=1):
+        return warm_pool(self.pool_manager.connection_from_url(url),
+                         connections)
+
+    def after_fork(self):
+        if self.dns_cache is not None:
+            self.dns_cache.after_fork()
+        if self.own_pool_manager:
+            self.pool_manager = self._extend(
+                urllib3.PoolManager(**self.pool_kwargs)
+            )
+        else:
+            self.pool_manager.clear()
+
+
+class HttpxBody(object):
+    """ The body of a streamed ``httpx`` response, as a file object read by
+    :py:class:`~britney.response.Response`. The turn of its call is given
+    back once it's read or closed.
+
+    :param response: the ``httpx.Response``, opened as a stream
+    :param release: a function giving the turn of the call back (defaults to
+    None)
+    """
+
+    def __init__(self, response, release=None):
+        self.response = response
+        self._chunks = None
+        self._buffer = b''
+        self._release = release
+
+    def read(self, amt=None):
+        """ Reads *amt* bytes of the decoded body, or the rest of it
+        """
+        if self._chunks is None:
+            self._chunks = self.response.iter_bytes()
+        parts, size = [self._buffer], len(self._buffer)
+        while amt is None or size < amt:
+            chunk = next(self._chunks, None)
+            if chunk is None:
+                break
+            parts.append(chunk)
+            size += len(chunk)
+        data = b''.join(parts)
+        if amt is not None:
+            data, self._buffer = data[:amt], data[amt:]
+        else:
+            self._buffer = b''
+        if not data:
+            self.close()
+        return data
+
+    def close(self):
+        try:
+            self.response.close()
+        finally:
+            release, self._release = self._release, None
+            if release is not None:
+                release()
+
+    release_conn = close
+
+
+class Http2Transport(Transport):
+    """ Multiplexes concurrent calls over a few HTTP/2 connections per host,
+    with ``httpx``. It's an optional dependency : ::
+
+        $> pip install britney[http2]
+
+    Over TLS, connections fall back to HTTP/1.1 when the server doesn't
+    negotiate h2. Over cleartext connections, HTTP/2 is only used with
+    *prior_knowledge* that the server speaks it.
+    Unix domain sockets are not supported.
+
+    Bodies are streamed : a call holds its turn until its body is read or its
+    response closed. Calls to a host beyond *max_connections* times
+    *max_concurrent_streams* wait for their turn. ``httpx`` then spreads them
+    over the connections, up to the number of streams each connection
+    accepts.
+
+    :param max_connections: the maximum number of connections of the
+    transport (defaults to 2)
+    :param max_concurrent_streams: the maximum number of calls in flight on
+    each connection, counted by host (defaults to 100)
+    :param prior_knowledge: speaks HTTP/2 without negotiation, which
+    disables the fall back to HTTP/1.1 (defaults to False)
+    :param timeout: timeout of the requests in seconds (defaults to None)
+    :param verify: verifies TLS certificates, against the authorities of an
+    ``ssl.SSLContext`` if given (defaults to True)
+    :param client: the ``httpx.Client`` to use (defaults to a new one)
+    """
+
+    def __init__(self, max_connections=2, max_concurrent_streams=100,
+                 prior_knowledge=False, timeout=None, verify=True,
+                 client=None):
+        try:
+            import httpx
+        except ImportError:
+            raise ImportError('HTTP/2 transport requires httpx[http2], '
+                              'install britney[http2]')
+
+        self.max_connections = max_connections
+        self.max_concurrent_streams = max_concurrent_streams
+        self.own_client = client is None
+        self._client_kwargs = {
+            'http1': not prior_knowledge, 'http2': True, 'verify': verify,
+            'timeout': timeout, 'follow_redirects': False,
+            'trust_env': False,
+            'limits': httpx.Limits(max_connections=max_connections,
+                                   max_keepalive_connections=max_connections)
+        }
+        self.client = client or httpx.Client(**self._client_kwargs)
+        self._lock = threading.Lock()
+        # semaphores of the calls in flight, by origin
+        self._streams = {}
+
+    def __repr__(self):
+        return '<Http2Transport>'
+
+    def prepare(self, environ):
+        method, url, body, headers = compile_request(environ)
+        headers.pop('Host', None)
+        # httpx iterates over the items of other buffers
+        if isinstance(body, (bytearray, memoryview)):
+            body = bytes(body)
+        return self.client.build_request(method, url, content=body,
+                                         headers=headers)
+
+    def streams(self, url):
+        """ Returns the semaphore of the calls in flight to the origin of an
+        url
+        """
+        origin = (url.scheme, url.host, url.port)
+        streams = self._streams.get(origin)
+        if streams is None:
+            with self._lock:
+                streams = self._streams.setdefault(
+                    origin, threading.BoundedSemaphore(
+                        self.max_connections * self.max_concurrent_streams
+                    )
+                )
+        return streams
+
+    def send(self, request, environ, stream=True):
+        streams = self.streams(request.url)
+        streams.acquire()
+        try:
+            raw = self.client.send(request, stream=True)
+        except BaseException:
+            streams.release()
+            raise
+        response = Response(raw.status_code, raw.headers, str(request.url),
+                            environ=environ,
+                            raw=HttpxBody(raw, streams.release),
+                            reason=raw.reason_phrase,
+                            http_version=raw.http_version)
+        if not stream:
+            response.content
+        return response
+
+    def close(self):
+        self.client.close()
+
+    def after_fork(self):
+        # a client given to the transport is left to its owner
+        if self.own_client:
+            import httpx
+            self.client = httpx.Client(**self._client_kwargs)
+        self._lock = threading.Lock()
+        self._streams = {}
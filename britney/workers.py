@@ -0,0 +1,109 @@
+# -*- coding: utf-8 -*-
+
+"""
+britney.workers
+~~~~~~~~~~~~~~~
+
+Fans calls out to worker processes when decoding responses costs more CPU
+than a single process has. Each worker builds its own client from the same
+description, only the name of the method and its parameters are sent to it,
+and only the decoded results come back : ::
+
+    from britney.workers import ProcessPool
+
+    def setup(client):
+        client.enable('Json')
+
+    with ProcessPool('/path/to/api.json', setup=setup, processes=4) as pool:
+        users = list(pool.map('get_user', [{'id': id} for id in range(100)]))
+
+*setup* and *result* are sent to the workers, so they must be picklable, like
+functions defined at the top level of a module.
+"""
+
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+
+# client of the worker process
+_client = None
+
+
+def decoded(response):
+    """ The data decoded by a format middleware, or the body of the response
+    """
+    return getattr(response, 'data', response.content)
+
+
+def _initialize(spec_uri, base_url, setup):
+    global _client
+    from . import new
+    _client = new(spec_uri, base_url=base_url)
+    if setup is not None:
+        setup(_client)
+
+
+def _call(method_name, kwargs, result):
+    response = getattr(_client, method_name)(**kwargs)
+    return result(response)
+
+
+class ProcessPool(object):
+    """ A pool of processes calling the methods of their own client
+
+    :param spec_uri: the path or url of the description of the client
+    :param base_url: the base url replacing the one of the description
+    (defaults to None)
+    :param setup: a callable receiving the client of each worker, to enable
+    middlewares for example (defaults to None)
+    :param processes: the number of worker processes (defaults to the number
+    of processors)
+    :param result: a callable turning a response into the result sent back
+    (defaults to :py:func:`decoded`)
+    :param mp_context: the multiprocessing context starting the workers
+    (defaults to the default context)
+    """
+
+    def __init__(self, spec_uri, base_url=None, setup=None, processes=None,
+                 result=decoded, mp_context=None):
+        self.result = result
+        kwargs = {} if mp_context is None else {'mp_context': mp_context}
+        self.executor = ProcessPoolExecutor(
+            max_workers=processes, initializer=_initialize,
+            initargs=(spec_uri, base_url, setup), **kwargs
+        )
+
+    def __repr__(self):
+        return '<ProcessPool>'
+
+    def submit(self, method_name, **kwargs):
+        """ Calls a method in a worker
+
+        :param method_name: the name of the method
+        :param kwargs: the parameters of the call
+        :rtype: concurrent.futures.Future
+        """
+        return self.executor.submit(_call, method_name, kwargs, self.result)
+
+    def map(self, method_name, calls, chunksize=1):
+        """ Calls a method in the workers once for each dict of parameters,
+        yielding the results in order. The errors of the calls are raised
+        when their result is reached.
+
+        :param method_name: the name of the method
+        :param calls: an iterable of dicts of parameters
+        :param chunksize: the number of calls sent to a worker at once
+        (defaults to 1)
+        """
+        return self.executor.map(_call, repeat(method_name), calls,
+                                 repeat(self.result), chunksize=chunksize)
+
+    def shutdown(self, wait=True):
+        """ Stops the workers
+        """
+        self.executor.shutdown(wait=wait)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.shutdown()
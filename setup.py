@@ -26,12 +26,17 @@ setup(
     license='PSF',
     description='Python implementation of SPORE',
     long_description=long_description,
-    packages=find_packages(),
+    packages=find_packages(exclude=('benchmarks', 'benchmarks.*')),
     download_url='http://pypi.python.org/pypi/britney',
     install_requires=libraries,
+    extras_require={
+        'http2': ['httpx[http2]'],
+    },
     dependency_links=dependency_links,
     keywords=['SPORE', 'REST Api', 'client'],
-    entry_points={},
+    entry_points={
+        'console_scripts': ['britney = britney.cli:main'],
+    },
     classifiers=(
         'Development Status :: 4 - Beta',
         'Environment :: Web Environment',
@@ -0,0 +1,20 @@
+# -*- coding: utf-8 -*-
+
+"""
+ASGI application answering the calls of the HTTP/2 tests with the version of
+the protocol and the path of the request. Python 3.5+ only.
+"""
+
+import json
+
+
+async def app(scope, receive, send):
+    if scope['type'] != 'http':
+        return
+    body = json.dumps({
+        'http_version': scope['http_version'],
+        'path': scope['path'],
+    }).encode('utf-8')
+    await send({'type': 'http.response.start', 'status': 200,
+                'headers': [(b'content-type', b'application/json')]})
+    await send({'type': 'http.response.body', 'body': body})
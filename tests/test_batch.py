@@ -0,0 +1,140 @@
+# -*- coding: utf-8 -*-
+
+import json
+import re
+import unittest
+import responses
+import britney
+from britney import errors
+from britney.core import Spore
+from britney.middleware import auth
+
+
+def batch_callback(request):
+    """ Answers each part with the id found in its path, or a 404 for id 0
+    """
+    boundary = re.search(r'boundary=(\w+)',
+                         request.headers['Content-Type']).group(1)
+    parts = request.body.split(('--%s' % boundary).encode())[1:-1]
+    body = []
+    for part in reversed(parts):
+        content_id = re.search(br'Content-ID: <(\w+)>', part).group(1)
+        request_line = part.split(b'\r\n\r\n', 1)[1].split(b'\r\n')[0]
+        user_id = int(re.search(br'/users/(\d+)', request_line).group(1))
+        if user_id:
+            status = 'HTTP/1.1 200 OK'
+            content = json.dumps({'id': user_id})
+        else:
+            status = 'HTTP/1.1 404 Not Found'
+            content = json.dumps({'detail': 'not found'})
+        body.append(
+            '--response\r\nContent-Type: application/http\r\n'
+            'Content-ID: <response-%s>\r\n\r\n%s\r\n'
+            'Content-Type: application/json\r\n\r\n%s\r\n'
+            % (content_id.decode(), status, content)
+        )
+    body.append('--response--\r\n')
+    return 200, {'Content-Type': 'multipart/mixed; boundary=response'}, \
+        ''.join(body)
+
+
+class TestBatch(unittest.TestCase):
+
+    def setUp(self):
+        self.client = Spore(name='test', base_url='http://api.test.org/',
+                            authentication=True,
+                            batch={'method': 'POST', 'path': '/batch'},
+                            methods={
+                                'get_user': {
+                                    'method': 'GET',
+                                    'path': '/users/:id',
+                                    'required_params': ['id']
+                                }
+                            })
+        self.client.enable('Json')
+        self.client.enable(auth.ApiKey, key_name='X-Api-Key', key_value='k')
+        responses.add_callback(responses.POST, 'http://api.test.org/batch',
+                               callback=batch_callback)
+
+    @responses.activate
+    def test_batch(self):
+        with self.client.batch() as batch:
+            first = batch.get_user(id=1)
+            second = batch.get_user(id=2)
+
+        self.assertEqual(len(responses.calls), 1)
+        self.assertEqual(first.response.data, {'id': 1})
+        self.assertEqual(second.response.data, {'id': 2})
+        self.assertEqual(first.response.status_code, 200)
+
+    @responses.activate
+    def test_parts_go_through_middlewares(self):
+        with self.client.batch() as batch:
+            batch.get_user(id=1)
+
+        body = responses.calls[0].request.body
+        self.assertIn(b'GET /users/1 HTTP/1.1', body)
+        self.assertIn(b'X-Api-Key: k', body)
+        self.assertIn(b'Accept: application/json', body)
+
+    @responses.activate
+    def test_part_status(self):
+        with self.client.batch() as batch:
+            found = batch.get_user(id=1)
+            missing = batch.get_user(id=0)
+
+        self.assertEqual(found.response.data, {'id': 1})
+        with self.assertRaises(britney.HTTPError) as status_error:
+            missing.response
+        self.assertEqual(status_error.exception.response.status_code, 404)
+
+    @responses.activate
+    def test_malformed_part_status(self):
+        def callback(request):
+            status, headers, body = batch_callback(request)
+            return status, headers, body.replace('HTTP/1.1 404 Not Found', '',
+                                                 1)
+        responses.reset()
+        responses.add_callback(responses.POST, 'http://api.test.org/batch',
+                               callback=callback)
+
+        with self.client.batch() as batch:
+            found = batch.get_user(id=1)
+            malformed = batch.get_user(id=0)
+
+        self.assertEqual(found.response.data, {'id': 1})
+        with self.assertRaises(errors.SporeMethodCallError) as call_error:
+            malformed.response
+        self.assertIn(malformed.content_id, call_error.exception.cause)
+
+    @responses.activate
+    def test_max_size(self):
+        with self.client.batch(max_size=2) as batch:
+            calls = [batch.get_user(id=index) for index in range(1, 6)]
+
+        self.assertEqual(len(responses.calls), 3)
+        self.assertEqual([call.response.data['id'] for call in calls],
+                         [1, 2, 3, 4, 5])
+
+    def test_not_sent(self):
+        batch = self.client.batch()
+        call = batch.get_user(id=1)
+        with self.assertRaises(errors.SporeMethodCallError):
+            call.response
+
+    def test_unknown_method(self):
+        with self.assertRaises(AttributeError):
+            self.client.batch().unknown()
+
+    def test_no_batch_endpoint(self):
+        client = Spore(name='test', base_url='http://api.test.org/',
+                       methods={'test': {'method': 'GET', 'path': '/test'}})
+        with self.assertRaises(errors.SporeMethodCallError):
+            client.batch()
+
+    def test_bad_batch_description(self):
+        with self.assertRaises(errors.SporeClientBuildError) as build_error:
+            Spore(name='test', base_url='http://api.test.org/',
+                  batch={'path': '/batch'},
+                  methods={'test': {'method': 'GET', 'path': '/test'}})
+        self.assertIn('batch', build_error.exception.errors)
@@ -0,0 +1,115 @@
+# -*- coding: utf-8 -*-
+
+import io
+import json
+import os
+import shutil
+import tempfile
+import unittest
+from contextlib import redirect_stdout
+from britney.bench import LoadGenerator, Report, outcome
+from britney import cli
+from britney.core import Spore
+from britney.middleware import utils
+
+
+class TestLoadGenerator(unittest.TestCase):
+
+    def setUp(self):
+        self.client = Spore(name='test', base_url='http://api.test.org',
+                            methods={'get_user': {
+                                'method': 'GET', 'path': '/users/:id',
+                                'required_params': ['id']
+                            }})
+
+        def user(request):
+            status = 503 if request.route_params['id'] == '0' else 200
+            return utils.fake_response(request, '{}', status_code=status)
+
+        self.client.set_transport(utils.FakeTransport({'/users/{id}': user}))
+
+    def test_outcome(self):
+        self.assertEqual(outcome(self.client.get_user, {'id': 1}), 200)
+        self.assertEqual(outcome(self.client.get_user, {'id': 0}), 503)
+        self.assertEqual(outcome(self.client.get_user, {}),
+                         'SporeMethodCallError')
+
+    def test_report(self):
+        report = Report('get_user', 2.0, [(0.001 * index, 200)
+                                          for index in range(1, 1001)] +
+                        [(2.0, 503), (2.0, 'ConnectionError')])
+        self.assertEqual(report.calls, 1002)
+        self.assertEqual(report.throughput, 501)
+        self.assertAlmostEqual(report.percentiles[50], 0.5, places=2)
+        self.assertEqual(report.percentiles[99.9], 2.0)
+        self.assertEqual(report.errors, {503: 1, 'ConnectionError': 1})
+        result = report.to_dict()
+        self.assertEqual(result['statuses'], {'200': 1000, '503': 1,
+                                              'ConnectionError': 1})
+        self.assertEqual(result['latency']['max'], 2.0)
+        self.assertIn('p99.9', report.format())
+
+    def test_closed_loop(self):
+        report = LoadGenerator(self.client.get_user,
+                               [{'id': index % 5} for index in range(100)],
+                               concurrency=4, duration=5).run()
+        self.assertEqual(report.calls, 100)
+        self.assertEqual(report.errors, {503: 20})
+        self.assertLess(report.duration, 5)
+
+    def test_open_loop(self):
+        report = LoadGenerator(self.client.get_user,
+                               [{'id': 1}] * 1000, concurrency=2,
+                               rate=200, duration=0.2).run()
+        self.assertIn(report.calls, (40, 41))
+        self.assertEqual(dict(report.outcomes), {200: report.calls})
+
+
+class TestCli(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.spec = os.path.join(self.directory, 'api.json')
+        with open(self.spec, 'w') as spec_file:
+            json.dump({'name': 'test', 'base_url': 'http://api.test.org/v1',
+                       'methods': {'get_user': {
+                           'method': 'GET', 'path': '/users/:id',
+                           'required_params': ['id']
+                       }}}, spec_file)
+        self.params = os.path.join(self.directory, 'params.jsonl')
+        with open(self.params, 'w') as params_file:
+            params_file.write('{"id": 1}\n{"id": 2}\n')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def run_cli(self, *argv):
+        output = io.StringIO()
+        with redirect_stdout(output):
+            code = cli.main(list(argv))
+        return code, output.getvalue()
+
+    def test_bench_stub(self):
+        code, output = self.run_cli('bench', self.spec, 'get_user', '--stub',
+                                    '--params-file', self.params,
+                                    '--concurrency', '2', '--duration',
+                                    '0.2', '--enable', 'Json', '--json')
+        self.assertEqual(code, 0)
+        report = json.loads(output)
+        self.assertGreater(report['calls'], 0)
+        self.assertEqual(report['statuses'], {'200': report['calls']})
+
+    def test_params(self):
+        args = cli.parser().parse_args(['bench', self.spec, 'get_user',
+                                        '--param', 'format=json',
+                                        '--params-file', self.params])
+        params = cli.params(args)
+        self.assertEqual([next(params) for _ in range(3)],
+                         [{'format': 'json', 'id': 1},
+                          {'format': 'json', 'id': 2},
+                          {'format': 'json', 'id': 1}])
+
+    def test_unknown_method(self):
+        code, _ = self.run_cli('bench', self.spec, 'unknown', '--duration',
+                               '0')
+        self.assertEqual(code, 2)
@@ -2,14 +2,22 @@
 
 import json
 import os
+import threading
+import time
+import tracemalloc
 import requests
 import unittest
+from requests.compat import urlsplit
+from six.moves.urllib.parse import parse_qs
 from britney import errors
 from britney import spyre
 from britney.core import Spore
 from britney.core import SporeMethod
 from britney.middleware import auth
 from britney.middleware import format as content_type
+from britney.middleware.base import Middleware, add_header
+from britney.middleware import utils
+from test_transport import EchoHandler, EchoServer
 
 
 class TestClientBuilder(unittest.TestCase):
@@ -44,6 +52,14 @@ class TestClientBuilder(unittest.TestCase):
         self.assertEqual(client.meta, {})
         self.assertEqual(client.middlewares, [])
 
+    def test_method_base_url(self):
+        client = Spore(name='my_client', base_url='http://my_url.org',
+                methods={'my_method': {'method': 'GET', 'path': '/api',
+                                       'base_url': 'http://other.org'},
+                         'other_method': {'method': 'GET', 'path': '/api'}})
+        self.assertEqual(client.my_method.base_url, 'http://other.org')
+        self.assertEqual(client.other_method.base_url, 'http://my_url.org')
+
     def test_bad_method_description(self):
         with self.assertRaises(errors.SporeClientBuildError) as build_error:
             Spore(name='my_client', base_url='http://my_url.org',
@@ -228,3 +244,230 @@ class TestClientGenerator(unittest.TestCase):
         client2 = spyre(os.path.join(self.data_path, 'api2.json'))
         self.assertFalse(client1.test_requires == client2.test_requires)
 
+
+
+class Layer(Middleware):
+
+    def __init__(self, index):
+        self.index = index
+
+    def process_request(self, environ):
+        add_header(environ, 'X-Layer-%d' % self.index, str(self.index))
+
+
+class TestThreadSafety(unittest.TestCase):
+    """ Hammers one client from many threads while middlewares and defaults
+    are changed
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        cls.server = EchoServer(('127.0.0.1', 0), EchoHandler)
+        cls.thread = threading.Thread(target=cls.server.serve_forever)
+        cls.thread.daemon = True
+        cls.thread.start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def setUp(self):
+        self.client = Spore(
+            name='my_client',
+            base_url='http://127.0.0.1:%d' % self.server.server_address[1],
+            methods={'list_users': {'method': 'GET', 'path': '/users',
+                                    'optional_params': ['a', 'b']}}
+        )
+
+    def test_middlewares_replaced(self):
+        middlewares = self.client.middlewares
+        self.client.enable(Layer, index=0)
+        self.assertEqual(middlewares, [])
+        self.assertIs(self.client.list_users.middlewares,
+                      self.client.middlewares)
+        self.client.middlewares = []
+        self.assertEqual(self.client.list_users.middlewares, [])
+
+    def test_defaults_replaced(self):
+        defaults = self.client.defaults
+        self.client.add_default('a', 1)
+        self.assertEqual(defaults, {})
+        self.assertEqual(self.client.list_users.defaults, {'a': 1})
+
+    def test_stress(self):
+        failures = []
+        running = threading.Event()
+        running.set()
+
+        def call():
+            try:
+                while running.is_set():
+                    data = self.client.list_users().json()
+                    layers = sorted(int(value) for name, value
+                                    in data['headers'].items()
+                                    if name.startswith('X-Layer-'))
+                    assert layers == list(range(len(layers))), layers
+                    query = parse_qs(urlsplit(data['path']).query)
+                    if 'b' in query:
+                        a, b = int(query['a'][0]), int(query['b'][0])
+                        assert a in (b, b + 1), (a, b)
+            except Exception as error:
+                failures.append(error)
+
+        threads = [threading.Thread(target=call) for _ in range(16)]
+        for thread in threads:
+            thread.start()
+        try:
+            for index in range(50):
+                self.client.enable(Layer, index=index)
+                self.client.add_default('a', index)
+                self.client.add_default('b', index)
+                time.sleep(0.001)
+        finally:
+            running.clear()
+            for thread in threads:
+                thread.join()
+
+        self.assertEqual(failures, [])
+        self.assertEqual(len(self.client.list_users.middlewares), 50)
+
+
+def echo_url(request):
+    return utils.fake_response(request, json.dumps({
+        'url': request.url, 'tenant': request.headers.get('X-Tenant')
+    }), headers={'Content-Type': 'application/json'})
+
+
+class Tenant(Middleware):
+
+    def __init__(self, name):
+        self.name = name
+
+    def process_request(self, environ):
+        add_header(environ, 'X-Tenant', self.name)
+
+
+class TestDerivedClient(unittest.TestCase):
+
+    def setUp(self):
+        self.client = Spore(name='test', base_url='http://api.test.org/v1',
+                            methods={
+            'get_user': {'method': 'GET', 'path': '/users/:id',
+                         'required_params': ['id'],
+                         'optional_params': ['fields'],
+                         'description': 'Gets a user'},
+            'list_users': {'method': 'GET', 'path': '/users',
+                           'optional_params': ['page', 'fields']},
+        })
+        self.transport = utils.FakeTransport({'/users': echo_url,
+                                              '/users/{id}': echo_url})
+        self.client.set_transport(self.transport)
+        self.client.enable('Json')
+        self.client.add_default('fields', 'name')
+
+    def test_shared(self):
+        tenant = self.client.derive(base_url='http://tenant.test.org/v1')
+        self.assertIs(tenant.transport, self.client.transport)
+        self.assertIs(tenant.get_user.transport, self.transport)
+        self.assertIs(tenant.get_user.path, self.client.get_user.path)
+        self.assertEqual(tenant.get_user.__doc__, 'Gets a user')
+        self.assertEqual(tenant.get_user(id=1).data['url'],
+                         'http://tenant.test.org/v1/users/1?fields=name')
+        self.assertEqual(self.client.get_user(id=1).data['url'],
+                         'http://api.test.org/v1/users/1?fields=name')
+
+    def test_method_base_url(self):
+        client = Spore(name='test', base_url='http://api.test.org/v1',
+                       batch={'method': 'POST', 'path': '/batch'},
+                       methods={
+            'get_user': {'method': 'GET', 'path': '/users/:id',
+                         'required_params': ['id']},
+            'get_item': {'method': 'GET', 'path': '/items/:id',
+                         'required_params': ['id'],
+                         'base_url': 'http://items.test.org/v2'},
+        })
+        tenant = client.derive(base_url='http://tenant.test.org/v1')
+        self.assertEqual(tenant.get_user.base_url,
+                         'http://tenant.test.org/v1')
+        self.assertEqual(tenant.get_item.base_url, 'http://items.test.org/v2')
+        other = tenant.derive(base_url='http://other.test.org/v1')
+        self.assertEqual(other.get_user.base_url, 'http://other.test.org/v1')
+        self.assertEqual(other.get_item.base_url, 'http://items.test.org/v2')
+        self.assertEqual(other.batch().method.base_url,
+                         'http://other.test.org/v1')
+
+    def test_warmup_and_tracing_before_calls(self):
+        client = Spore(name='test', base_url='http://api.test.org/v1',
+                       methods={
+            'get_user': {'method': 'GET', 'path': '/users/:id',
+                         'required_params': ['id']},
+            'get_item': {'method': 'GET', 'path': '/items/:id',
+                         'required_params': ['id'],
+                         'base_url': 'http://items.test.org/v2'},
+        })
+        tenant = client.derive(base_url='http://tenant.test.org/v1')
+        self.assertEqual(sorted(tenant.warmup()),
+                         ['http://items.test.org/', 'http://tenant.test.org/'])
+        self.assertEqual(tenant._methods, {})
+        tracer = tenant.enable_tracing()
+        self.assertIs(tenant.get_item.tracer, tracer)
+        self.assertIsNone(client.get_item.tracer)
+
+    def test_overlay(self):
+        tenant = self.client.derive(defaults={'page': 2},
+                                    middlewares=[Tenant('a')])
+        self.assertEqual(tenant.base_url, self.client.base_url)
+        self.assertEqual(tenant.defaults, {'fields': 'name', 'page': 2})
+        self.assertEqual(len(tenant.middlewares), 2)
+        data = tenant.list_users().data
+        self.assertEqual(data['tenant'], 'a')
+        self.assertIn('page=2', data['url'])
+
+        self.assertIsNone(self.client.list_users().data['tenant'])
+        self.assertEqual(self.client.defaults, {'fields': 'name'})
+        self.assertEqual(len(self.client.middlewares), 1)
+
+        tenant.add_default('fields', 'id')
+        tenant.enable(Tenant, name='b')
+        self.assertIn('fields=id', tenant.list_users().data['url'])
+        self.assertEqual(tenant.list_users.middlewares, tenant.middlewares)
+        self.assertEqual(self.client.defaults, {'fields': 'name'})
+
+    def test_lazy_methods(self):
+        tenant = self.client.derive()
+        self.assertEqual(tenant._methods, {})
+        method = tenant.get_user
+        self.assertIs(tenant.get_user, method)
+        self.assertEqual(list(tenant._methods), ['get_user'])
+        self.assertFalse(hasattr(tenant, 'unknown'))
+
+        derived = tenant.derive(middlewares=[Tenant('c')])
+        self.assertIs(derived._definitions, self.client._methods)
+        self.assertEqual(derived.get_user(id=3).data['tenant'], 'c')
+
+    def test_set_transport_and_tracing(self):
+        tenant = self.client.derive()
+        tracer = tenant.enable_tracing()
+        transport = utils.FakeTransport({'/users': echo_url})
+        tenant.set_transport(transport)
+        tenant.list_users()
+        self.assertIs(tenant.list_users.transport, transport)
+        self.assertIs(self.client.list_users.transport, self.transport)
+        self.assertIs(tenant.list_users.tracer, tracer)
+        self.assertIsNone(self.client.list_users.tracer)
+
+    def test_memory(self):
+        tracemalloc.start()
+        try:
+            before = tracemalloc.get_traced_memory()[0]
+            tenants = [self.client.derive(
+                base_url='http://tenant%d.test.org/v1' % index,
+                defaults={'tenant': index}
+            ) for index in range(1000)]
+            for tenant in tenants:
+                tenant.get_user
+            used = tracemalloc.get_traced_memory()[0] - before
+        finally:
+            tracemalloc.stop()
+        self.assertLess(used / len(tenants), 8 * 1024)
@@ -0,0 +1,167 @@
+# -*- coding: utf-8 -*-
+
+import ast
+import importlib.util
+import json
+import os
+import shutil
+import tempfile
+import unittest
+from britney import errors
+from britney import cli
+from britney.compiler import CompiledClient, CompiledMethod
+from britney.compiler import compile_description, compile_file
+from britney.core import Spore
+from britney.middleware import utils
+
+
+DESCRIPTION = {
+    'name': 'Test API',
+    'base_url': 'http://api.test.org/v1',
+    'formats': ['json'],
+    'methods': {
+        'get_user': {'method': 'GET', 'path': '/users/:id',
+                     'required_params': ['id'],
+                     'optional_params': ['fields', 'from'],
+                     'description': 'Gets a "user" by id'},
+        'list_users': {'method': 'GET', 'path': '/users',
+                       'optional_params': ['page'],
+                       'pagination': {'style': 'page'}},
+        'get_users': {'method': 'GET', 'path': '/users/many',
+                      'required_params': ['ids']},
+        'get-item': {'method': 'POST', 'path': '/items',
+                     'required_payload': True,
+                     'expected_status': [201]},
+    }
+}
+
+
+def user(request):
+    return utils.fake_response(request, json.dumps(
+        {'url': request.url}
+    ), headers={'Content-Type': 'application/json'})
+
+
+class TestCompiler(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.module_path = os.path.join(self.directory, 'api_client.py')
+        source, self.stubs = compile_description(DESCRIPTION, 'api.json')
+        with open(self.module_path, 'w') as module_file:
+            module_file.write(source)
+        spec = importlib.util.spec_from_file_location('api_client',
+                                                      self.module_path)
+        self.module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(self.module)
+        self.transport = utils.FakeTransport({
+            '/users/{id}': user,
+            '/users': user,
+            ('POST', '/items'): lambda request: utils.fake_response(
+                request, request.body, 201),
+        })
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_client(self):
+        client = self.module.new(transport=self.transport)
+        self.assertIsInstance(client, CompiledClient)
+        self.assertEqual(sorted(client._methods),
+                         ['get-item', 'get_user', 'get_users', 'list_users'])
+        self.assertEqual(client.get_user.__doc__, 'Gets a "user" by id')
+        self.assertEqual(client.list_users.pagination['style'], 'page')
+        self.assertIs(client.get_user.middlewares, client.middlewares)
+        # the methods keep the slots of SporeMethod
+        for method in client._methods.values():
+            self.assertFalse(hasattr(method, '__dict__'))
+
+    def test_same_environ(self):
+        client = self.module.new()
+        runtime = Spore(**DESCRIPTION)
+        for name, kwargs in (('get_user', {'id': 1, 'fields': 'name'}),
+                             ('list_users', {})):
+            compiled_environ = getattr(client, name).build_environ(
+                dict(kwargs))
+            runtime_environ = getattr(runtime, name).build_environ(
+                dict(kwargs))
+            for environ in (compiled_environ, runtime_environ):
+                del environ['spore.transport'], environ['spore.sender']
+            self.assertEqual(compiled_environ['PATH_INFO'],
+                             runtime_environ['PATH_INFO'].replace(
+                                 ':id', '{id}'))
+            del compiled_environ['PATH_INFO'], runtime_environ['PATH_INFO']
+            self.assertEqual(compiled_environ, runtime_environ)
+
+    def test_calls(self):
+        client = self.module.new(base_url='http://api.test.org/v1',
+                                 transport=self.transport)
+        client.enable('Json')
+        self.assertEqual(client.get_user(id=1, fields='name').data['url'],
+                         'http://api.test.org/v1/users/1?fields=name')
+        self.assertEqual(getattr(client, 'get-item')(payload={'a': 1}).data,
+                         {'a': 1})
+        self.assertRaises(errors.SporeMethodCallError, client.get_user)
+        self.assertRaises(errors.SporeMethodCallError, client.get_user, id=1,
+                          unknown=2)
+        self.assertRaises(errors.SporeMethodCallError,
+                          getattr(client, 'get-item'))
+
+    def test_defaults_and_base_url(self):
+        client = self.module.new(transport=self.transport)
+        client.add_default('fields', 'id')
+        client.get_user.base_url = 'http://other.test.org/v1'
+        self.assertEqual(client.get_user(id=2).url,
+                         'http://other.test.org/v1/users/2?fields=id')
+
+    def test_missing_base_url(self):
+        description = dict(DESCRIPTION)
+        del description['base_url']
+        source, _ = compile_description(description)
+        namespace = {}
+        exec(compile(source, 'api_client', 'exec'), namespace)
+        self.assertRaises(errors.SporeClientBuildError, namespace['new'])
+        self.assertEqual(namespace['new']('http://api.test.org').base_url,
+                         'http://api.test.org')
+
+    def test_invalid_description(self):
+        description = dict(DESCRIPTION, methods={'broken': {'path': '/'}})
+        self.assertRaises(errors.SporeClientBuildError, compile_description,
+                          description)
+
+    def test_module_names_not_shadowed(self):
+        description = dict(DESCRIPTION, methods={
+            'compiled': {'method': 'GET', 'path': '/compiled'},
+            'other': {'method': 'GET', 'path': '/other'},
+        })
+        source, _ = compile_description(description)
+        namespace = {}
+        exec(compile(source, 'compiled.py', 'exec'), namespace)
+        self.assertIs(namespace['CompiledMethod'], CompiledMethod)
+        self.assertIn(CompiledMethod, namespace['OtherMethod'].__mro__)
+        self.assertEqual(namespace['new']().compiled.__class__.__name__,
+                         'CompiledMethod2')
+
+    def test_stubs(self):
+        tree = ast.parse(self.stubs)
+        methods = dict((node.name, node) for node in tree.body
+                       if isinstance(node, ast.ClassDef))
+        call = methods['GetUserMethod'].body[0]
+        self.assertEqual([arg.arg for arg in call.args.kwonlyargs],
+                         ['id', 'fields', 'payload', 'files',
+                          'payload_format', 'download_to'])
+        self.assertEqual(call.args.kwarg.arg, 'kwargs')
+        self.assertIn('get_user: GetUserMethod', self.stubs)
+        self.assertNotIn('get-item:', self.stubs)
+
+    def test_cli(self):
+        spec = os.path.join(self.directory, 'api.json')
+        with open(spec, 'w') as spec_file:
+            json.dump(DESCRIPTION, spec_file)
+        output = os.path.join(self.directory, 'compiled.py')
+        self.assertEqual(compile_file(spec, output),
+                         [output, os.path.join(self.directory,
+                                               'compiled.pyi')])
+        with open(spec, 'w') as spec_file:
+            json.dump({'name': 'broken', 'methods': {'a': {}}}, spec_file)
+        self.assertEqual(cli.main(['compile', spec, '-o', output]), 1)
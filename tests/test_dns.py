@@ -0,0 +1,108 @@
+# -*- coding: utf-8 -*-
+
+import socket
+import unittest
+from britney.core import Spore
+from britney.dns import DnsCache
+from britney.transport import RequestsTransport, Urllib3Transport
+from test_transport import serve, stop
+
+
+class Resolver(object):
+    """ Resolves every host to the addresses given, counting the calls
+    """
+
+    def __init__(self, *hosts):
+        self.hosts = hosts
+        self.calls = 0
+
+    def __call__(self, host, port, family=0, type=0):
+        self.calls += 1
+        addresses = []
+        for address in self.hosts:
+            addresses.extend(socket.getaddrinfo(address, port, family, type))
+        return addresses
+
+
+class TestDnsCache(unittest.TestCase):
+
+    def test_ttl(self):
+        resolver = Resolver('127.0.0.1')
+        cache = DnsCache(ttl=60, resolver=resolver)
+        first = cache.resolve('api.britney.test', 80)
+        self.assertIs(cache.resolve('api.britney.test', 80), first)
+        self.assertEqual(resolver.calls, 1)
+        self.assertEqual(first[0][4], ('127.0.0.1', 80))
+
+        cache.resolve('api.britney.test', 443)
+        cache.forget('api.britney.test', 80)
+        self.assertEqual(len(cache), 1)
+        cache.resolve('api.britney.test', 80)
+        self.assertEqual(resolver.calls, 3)
+
+        cache.ttl = 0
+        cache.clear()
+        cache.resolve('api.britney.test', 80)
+        cache.resolve('api.britney.test', 80)
+        self.assertEqual(resolver.calls, 5)
+
+
+class TestCachedTransports(unittest.TestCase):
+
+    def setUp(self):
+        self.server = serve()
+        self.base_url = 'http://api.britney.test:%d/api' % \
+            self.server.server_address[1]
+
+    def tearDown(self):
+        stop(self.server)
+
+    def client(self, transport):
+        client = Spore(name='test', base_url=self.base_url, methods={
+            'get_user': {'method': 'GET', 'path': '/users/:id',
+                         'required_params': ['id']},
+        })
+        client.set_transport(transport)
+        client.enable('Json')
+        return client
+
+    def test_urllib3(self):
+        resolver = Resolver('127.0.0.1')
+        transport = Urllib3Transport(maxsize=3, dns_cache=DnsCache(
+            resolver=resolver))
+        client = self.client(transport)
+        self.assertEqual(client.warmup(connections_per_host=3),
+                         {'http://api.britney.test:%d/' %
+                          self.server.server_address[1]: 3})
+        response = client.get_user(id=1)
+        self.assertEqual(response.data['headers']['Host'],
+                         'api.britney.test:%d' % self.server.server_address[1])
+        self.assertEqual(resolver.calls, 1)
+        transport.close()
+
+    def test_requests(self):
+        resolver = Resolver('127.0.0.1')
+        transport = RequestsTransport(dns_cache=DnsCache(resolver=resolver))
+        client = self.client(transport)
+        self.assertEqual(client.get_user(id=1).data['path'], '/api/users/1')
+        transport.after_fork()
+        self.assertEqual(client.get_user(id=2).data['path'], '/api/users/2')
+        self.assertEqual(resolver.calls, 1)
+        transport.close()
+
+    def test_next_address(self):
+        # nothing listens on 127.0.0.2 at this port
+        resolver = Resolver('127.0.0.2', '127.0.0.1')
+        cache = DnsCache(resolver=resolver)
+        with Urllib3Transport(dns_cache=cache, timeout=2) as transport:
+            self.assertEqual(self.client(transport).get_user(id=1).status_code,
+                             200)
+        self.assertEqual(len(cache), 1)
+
+    def test_unreachable(self):
+        cache = DnsCache(resolver=Resolver('127.0.0.2'))
+        with Urllib3Transport(dns_cache=cache, timeout=2) as transport:
+            self.assertEqual(self.client(transport).warmup(),
+                             {'http://api.britney.test:%d/' %
+                              self.server.server_address[1]: 0})
+        self.assertEqual(len(cache), 0)
@@ -0,0 +1,202 @@
+# -*- coding: utf-8 -*-
+
+import hashlib
+import io
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+from six.moves import BaseHTTPServer, socketserver
+from britney import errors
+from britney.core import Spore
+from britney.download import Download, parse_checksum
+from britney.middleware.utils import FakeTransport, fake_response
+from britney.transport import RequestsTransport, Urllib3Transport
+
+try:
+    import httpx
+    from britney.transport import Http2Transport
+except ImportError:
+    httpx = None
+
+
+ARTIFACT = os.urandom(3 * 1024 * 1024 + 17)
+DIGEST = hashlib.sha256(ARTIFACT).hexdigest()
+
+
+class ArtifactHandler(BaseHTTPServer.BaseHTTPRequestHandler):
+
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        status = 404 if 'missing' in self.path else 200
+        body = ARTIFACT if status == 200 else b'missing'
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/octet-stream')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class ArtifactServer(socketserver.ThreadingMixIn, BaseHTTPServer.HTTPServer):
+
+    daemon_threads = True
+
+
+def artifact(headers=None, content=ARTIFACT):
+    return lambda request: fake_response(request, content, headers=headers)
+
+
+class TestDownload(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'artifact.bin')
+        self.client = Spore(name='test', base_url='http://api.test.org',
+                            methods={
+            'get_artifact': {'method': 'GET', 'path': '/artifacts/:id',
+                             'required_params': ['id']},
+        })
+        self.set_route(artifact())
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def set_route(self, route):
+        self.client.set_transport(FakeTransport({'/artifacts/{id}': route}))
+
+    def test_path(self):
+        response = self.client.get_artifact(id=1, download_to=self.path)
+        with open(self.path, 'rb') as downloaded:
+            self.assertEqual(downloaded.read(), ARTIFACT)
+        self.assertEqual(response.content, b'')
+        self.assertEqual(response.download.path, self.path)
+        self.assertEqual(response.download.size, len(ARTIFACT))
+        self.assertIsNone(response.download.buffer)
+        self.assertEqual(os.listdir(self.directory), ['artifact.bin'])
+
+    def test_file_object(self):
+        target = io.BytesIO()
+        response = self.client.get_artifact(id=1, download_to=target)
+        self.assertEqual(target.getvalue(), ARTIFACT)
+        self.assertIsNone(response.download.path)
+
+    def test_checksum(self):
+        response = self.client.get_artifact(id=1, download_to=Download(
+            self.path, checksum='SHA256:' + DIGEST.upper()
+        ))
+        self.assertEqual(response.download.digest, DIGEST)
+
+        with self.assertRaises(errors.SporeDownloadError) as error:
+            self.client.get_artifact(id=1, download_to=Download(
+                self.path + '.other', checksum=('md5', '0' * 32)
+            ))
+        self.assertEqual(error.exception.expected_values, '0' * 32)
+        self.assertEqual(os.listdir(self.directory), ['artifact.bin'])
+
+        self.assertRaises(ValueError, Download, self.path, checksum='md5')
+        self.assertRaises(ValueError, parse_checksum, 'unknown:00')
+
+    def test_content_length(self):
+        self.set_route(artifact(headers={
+            'Content-Length': str(len(ARTIFACT) + 1)
+        }))
+        with self.assertRaises(errors.SporeDownloadError) as error:
+            self.client.get_artifact(id=1, download_to=self.path)
+        self.assertEqual(error.exception.received, len(ARTIFACT))
+        self.assertFalse(os.listdir(self.directory))
+
+    def test_mmap(self):
+        response = self.client.get_artifact(id=1, download_to=Download(
+            self.path, mmap=True
+        ))
+        buffer = response.download.buffer
+        self.assertEqual(buffer[:64], ARTIFACT[:64])
+        self.assertEqual(len(buffer), len(ARTIFACT))
+        self.assertRaises(TypeError, buffer.write, b'x')
+        buffer.close()
+
+        # files opened for writing only are mapped again from their path
+        with open(self.path, 'wb') as target:
+            response = self.client.get_artifact(id=1, download_to=Download(
+                target, mmap=True
+            ))
+        self.assertEqual(response.download.buffer[-64:], ARTIFACT[-64:])
+        response.download.buffer.close()
+
+        self.set_route(artifact(content=b''))
+        response = self.client.get_artifact(id=1, download_to=Download(
+            self.path, mmap=True
+        ))
+        self.assertEqual(response.download.buffer, b'')
+
+    def test_error_status(self):
+        self.set_route(lambda request: fake_response(request, 'missing',
+                                                     status_code=404))
+        with self.assertRaises(errors.SporeMethodStatusError) as error:
+            self.client.get_artifact(id=1, download_to=self.path)
+        self.assertEqual(error.exception.response.content, b'missing')
+        self.assertFalse(os.path.exists(self.path))
+
+    def test_not_hedged(self):
+        hedger = self.client.get_artifact.enable_hedging(delay=0)
+        self.client.get_artifact(id=1, download_to=self.path)
+        self.assertEqual(hedger.calls, 0)
+
+
+class TestTransportDownload(unittest.TestCase):
+
+    def setUp(self):
+        self.server = ArtifactServer(('127.0.0.1', 0), ArtifactHandler)
+        thread = threading.Thread(target=self.server.serve_forever,
+                                  kwargs={'poll_interval': 0.05})
+        thread.daemon = True
+        thread.start()
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'artifact.bin')
+        self.client = Spore(
+            name='test',
+            base_url='http://127.0.0.1:%d' % self.server.server_address[1],
+            methods={'get_artifact': {'method': 'GET',
+                                      'path': '/artifacts/:id',
+                                      'required_params': ['id']}}
+        )
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        shutil.rmtree(self.directory)
+
+    def check_download(self, transport):
+        with transport:
+            self.client.set_transport(transport)
+            response = self.client.get_artifact(id=1, download_to=Download(
+                self.path, checksum='sha256:' + DIGEST, chunk_size=65536
+            ))
+            self.assertEqual(response.download.size, len(ARTIFACT))
+            self.assertRaises(errors.SporeMethodStatusError,
+                              self.client.get_artifact, id='missing',
+                              download_to=self.path)
+            # the connection went back to the pool
+            self.assertEqual(self.client.get_artifact(id=2).content,
+                             ARTIFACT)
+
+    def test_urllib3(self):
+        self.check_download(Urllib3Transport(maxsize=1, block=True,
+                                             timeout=5))
+
+    def test_requests(self):
+        self.check_download(RequestsTransport())
+
+    @unittest.skipIf(httpx is None, 'httpx[http2] is required')
+    def test_http2(self):
+        transport = Http2Transport(max_connections=1,
+                                   max_concurrent_streams=1, timeout=5)
+        self.check_download(transport)
+        # the turn of each call was given back
+        streams = transport.streams(httpx.URL(self.client.base_url))
+        self.assertTrue(streams.acquire(False))
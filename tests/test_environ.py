@@ -0,0 +1,54 @@
+# -*- coding: utf-8 -*-
+
+import pickle
+import unittest
+from britney.environ import Environ
+
+
+class TestEnviron(unittest.TestCase):
+
+    def setUp(self):
+        self.environ = Environ({'REQUEST_METHOD': 'GET',
+                                'spore.headers': {}})
+
+    def test_mapping(self):
+        environ = self.environ
+        self.assertEqual(environ['REQUEST_METHOD'], 'GET')
+        self.assertNotIn('PATH_INFO', environ)
+        self.assertRaises(KeyError, lambda: environ['PATH_INFO'])
+        self.assertIsNone(environ.get('PATH_INFO'))
+
+        environ['spore.oauth2.expected_status'] = [200]
+        self.assertIn('spore.oauth2.expected_status', environ)
+        self.assertEqual(len(environ), 3)
+        self.assertEqual(list(environ), ['REQUEST_METHOD', 'spore.headers',
+                                         'spore.oauth2.expected_status'])
+
+        del environ['REQUEST_METHOD']
+        del environ['spore.oauth2.expected_status']
+        self.assertEqual(dict(environ), {'spore.headers': {}})
+        self.assertRaises(KeyError, environ.__delitem__, 'REQUEST_METHOD')
+        self.assertRaises(KeyError, environ.__delitem__, 'unknown')
+
+    def test_setdefault(self):
+        self.environ.setdefault('spore.headers', {})['X-Test'] = '1'
+        self.assertEqual(self.environ['spore.headers'], {'X-Test': '1'})
+        self.assertEqual(self.environ.setdefault('PATH_INFO', '/'), '/')
+        self.assertEqual(self.environ.setdefault('custom', 1), 1)
+        self.assertEqual(self.environ['custom'], 1)
+
+    def test_copy(self):
+        self.environ['custom'] = 1
+        copy = self.environ.copy()
+        copy['REQUEST_METHOD'] = 'POST'
+        copy['custom'] = 2
+        self.assertEqual(self.environ['REQUEST_METHOD'], 'GET')
+        self.assertEqual(self.environ['custom'], 1)
+        self.assertIs(copy['spore.headers'], self.environ['spore.headers'])
+
+    def test_equality_and_pickle(self):
+        self.assertEqual(self.environ, {'REQUEST_METHOD': 'GET',
+                                        'spore.headers': {}})
+        self.assertEqual(pickle.loads(pickle.dumps(self.environ)),
+                         self.environ)
+        self.assertFalse(hasattr(self.environ, '__dict__'))
@@ -0,0 +1,212 @@
+# -*- coding: utf-8 -*-
+
+import json
+import threading
+import time
+import unittest
+from britney import errors
+from britney.core import Spore
+from britney.limits import HostLimits
+from britney.middleware import utils
+from britney.response import Response
+
+
+class Replicas(object):
+    """ Fake route answering slowly the calls listed in *slow*
+    """
+
+    def __init__(self, slow=(), delay=0.3):
+        self.slow = set(slow)
+        self.delay = delay
+        self.calls = 0
+        self.lock = threading.Lock()
+
+    def __call__(self, request):
+        with self.lock:
+            index = self.calls
+            self.calls += 1
+        if index in self.slow:
+            time.sleep(self.delay)
+        return utils.fake_response(request, json.dumps({'call': index}))
+
+
+class SlowBody(object):
+    """ Body of a response taking *duration* seconds to be read, unless
+    it's closed
+    """
+
+    def __init__(self, content, duration):
+        self.content = content
+        self.duration = duration
+        self.closed = threading.Event()
+
+    def read(self, amt=None):
+        if self.closed.wait(self.duration):
+            return b''
+        return self.content
+
+    def close(self):
+        self.closed.set()
+
+
+class TestHedging(unittest.TestCase):
+
+    def setUp(self):
+        self.replicas = Replicas()
+        self.client = Spore(name='test', base_url='http://api.test.org',
+                            methods={
+            'get_user': {'method': 'GET', 'path': '/users/:id',
+                         'required_params': ['id']},
+            'create_user': {'method': 'POST', 'path': '/users'},
+        })
+        self.client.set_transport(utils.FakeTransport({
+            '/users/{id}': self.replicas, '/users': self.replicas
+        }))
+        self.client.enable('Json')
+
+    def test_hedged(self):
+        self.replicas.slow = set([0])
+        hedger = self.client.get_user.enable_hedging(delay=0.02)
+        start = time.time()
+        response = self.client.get_user(id=1)
+        self.assertLess(time.time() - start, 0.25)
+        self.assertEqual(response.data, {'call': 1})
+        self.assertEqual(hedger.stats(), {'calls': 1, 'hedged': 1,
+                                          'hedge_wins': 1,
+                                          'threshold': 0.02})
+
+    def test_loser_released(self):
+        bodies = []
+
+        def replica(request):
+            index = len(bodies)
+            body = SlowBody(json.dumps({'call': index}).encode('utf-8'),
+                            0.5 if index == 0 else 0)
+            bodies.append(body)
+            if index == 0:
+                time.sleep(0.1)
+            return Response(200, {}, request.url, raw=body)
+
+        transport = utils.FakeTransport({'/users/{id}': replica})
+        transport.limits = HostLimits(2)
+        self.client.set_transport(transport)
+        self.client.get_user.enable_hedging(delay=0.02)
+        start = time.time()
+        self.assertEqual(self.client.get_user(id=1).data, {'call': 1})
+
+        # closed once its headers are received, without reading its body
+        self.assertTrue(bodies[0].closed.wait(0.3))
+        for _ in range(30):
+            if not transport.limits.stats()['api.test.org:80']['in_flight']:
+                break
+            time.sleep(0.01)
+        self.assertEqual(
+            transport.limits.stats()['api.test.org:80']['in_flight'], 0
+        )
+        self.assertLess(time.time() - start, 0.4)
+
+    def test_not_late(self):
+        hedger = self.client.get_user.enable_hedging(delay=0.5)
+        self.assertEqual(self.client.get_user(id=1).data, {'call': 0})
+        self.assertEqual(hedger.hedged, 0)
+        self.assertEqual(self.replicas.calls, 1)
+
+    def test_max_rate(self):
+        self.replicas.slow = set(range(10))
+        self.replicas.delay = 0.05
+        hedger = self.client.get_user.enable_hedging(delay=0.01, max_rate=0,
+                                                     burst=1)
+        for _ in range(3):
+            self.client.get_user(id=1)
+        self.assertEqual(hedger.calls, 3)
+        self.assertEqual(hedger.hedged, 1)
+
+    def test_sent_inline_without_hedge(self):
+        threads = []
+
+        def route(request):
+            threads.append(threading.current_thread())
+            return utils.fake_response(request, '{}')
+
+        self.client.set_transport(utils.FakeTransport({'/users/{id}': route}))
+        hedger = self.client.get_user.enable_hedging(delay=0.5, max_rate=0,
+                                                     burst=0)
+        for _ in range(2):
+            self.client.get_user(id=1)
+        self.assertEqual(threads, [threading.current_thread()] * 2)
+        self.assertIsNone(hedger._executor)
+        self.assertEqual(hedger.calls, 2)
+
+    def test_close(self):
+        hedger = self.client.get_user.enable_hedging(delay=0.5)
+        self.client.get_user(id=1)
+        executor = hedger._executor
+        self.client.close()
+        self.assertIsNone(hedger._executor)
+        self.assertRaises(RuntimeError, executor.submit, time.time)
+        # started again by the next call
+        self.assertEqual(self.client.get_user(id=1).data, {'call': 1})
+
+        executor = hedger._executor
+        self.client.get_user.disable_hedging()
+        self.assertRaises(RuntimeError, executor.submit, time.time)
+
+    def test_percentile(self):
+        hedger = self.client.get_user.enable_hedging(percentile=50,
+                                                     min_samples=16)
+        self.assertIsNone(hedger.threshold)
+        for _ in range(16):
+            self.client.get_user(id=1)
+        self.assertIsNotNone(hedger.threshold)
+        self.assertEqual(hedger.hedged, 0)
+
+    def test_both_failed(self):
+        def fail(request):
+            time.sleep(0.05)
+            raise RuntimeError('replica down')
+
+        self.client.set_transport(utils.FakeTransport({'/users/{id}': fail}))
+        self.client.get_user.enable_hedging(delay=0.01)
+        self.assertRaises(RuntimeError, self.client.get_user, id=1)
+
+    def test_error_of_first_request(self):
+        calls = []
+
+        def fail(request):
+            calls.append(request)
+            if len(calls) == 1:
+                time.sleep(0.05)
+                raise RuntimeError('primary down')
+            raise ValueError('hedge down')
+
+        self.client.set_transport(utils.FakeTransport({'/users/{id}': fail}))
+        self.client.get_user.enable_hedging(delay=0.01)
+        self.assertRaises(RuntimeError, self.client.get_user, id=1)
+        self.assertEqual(len(calls), 2)
+
+    def test_disable(self):
+        self.client.get_user.enable_hedging(delay=0.01)
+        self.client.get_user.disable_hedging()
+        self.assertIsNone(self.client.get_user.hedger)
+
+    def test_safe_methods_only(self):
+        self.assertRaises(errors.SporeMethodCallError,
+                          self.client.create_user.enable_hedging, delay=0.01)
+        self.assertRaises(errors.SporeMethodCallError,
+                          self.client.get_user.enable_hedging)
+        with self.assertRaises(errors.SporeClientBuildError) as build_error:
+            Spore(name='test', base_url='http://api.test.org', methods={
+                'create_user': {'method': 'POST', 'path': '/users',
+                                'hedge': {'delay': 0.01}},
+            })
+        self.assertIn('hedge',
+                      build_error.exception.errors['methods']
+                      ['create_user'].errors)
+
+    def test_description(self):
+        client = Spore(name='test', base_url='http://api.test.org', methods={
+            'get_user': {'method': 'GET', 'path': '/users/:id',
+                         'hedge': {'percentile': 95, 'max_rate': 0.1}},
+        })
+        self.assertEqual(client.get_user.hedger.percentile, 95)
+        self.assertEqual(client.get_user.hedge['max_rate'], 0.1)
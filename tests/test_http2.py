@@ -0,0 +1,202 @@
+# -*- coding: utf-8 -*-
+
+import json
+import os
+import shutil
+import socket
+import tempfile
+import threading
+import unittest
+from britney.core import Spore
+
+try:
+    import asyncio
+    import httpx
+    from hypercorn.asyncio import serve
+    from hypercorn.config import Config
+    from britney.transport import Http2Transport
+    # a coroutine, a syntax error before Python 3.5
+    from asgi_app import app
+except (ImportError, SyntaxError):
+    httpx = None
+
+try:
+    import ssl
+    import trustme
+except ImportError:
+    trustme = None
+
+
+def free_port():
+    sock = socket.socket()
+    sock.bind(('127.0.0.1', 0))
+    port = sock.getsockname()[1]
+    sock.close()
+    return port
+
+
+class ServerMixin(object):
+    """ Runs the application with hypercorn in a thread, for the tests of the
+    class
+    """
+
+    scheme = 'http'
+
+    @classmethod
+    def configure(cls, config):
+        pass
+
+    @classmethod
+    def setUpClass(cls):
+        cls.port = free_port()
+        config = Config()
+        config.bind = ['127.0.0.1:%d' % cls.port]
+        config.loglevel = 'ERROR'
+        cls.configure(config)
+        cls.loop = asyncio.new_event_loop()
+        cls.stopped = asyncio.Event()
+        ready = threading.Event()
+
+        def run():
+            asyncio.set_event_loop(cls.loop)
+            cls.loop.call_soon(ready.set)
+            cls.loop.run_until_complete(
+                serve(app, config, shutdown_trigger=cls.stopped.wait)
+            )
+
+        cls.thread = threading.Thread(target=run)
+        cls.thread.daemon = True
+        cls.thread.start()
+        ready.wait()
+        for _ in range(50):
+            try:
+                socket.create_connection(('127.0.0.1', cls.port)).close()
+                break
+            except socket.error:
+                threading.Event().wait(0.05)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.loop.call_soon_threadsafe(cls.stopped.set)
+        cls.thread.join(5)
+
+    def client(self, transport):
+        client = Spore(name='test',
+                       base_url='%s://127.0.0.1:%d/api' % (self.scheme,
+                                                           self.port),
+                       methods={'get_user': {
+                           'method': 'GET', 'path': '/users/:id',
+                           'required_params': ['id']
+                       }})
+        client.set_transport(transport)
+        client.enable('Json')
+        return client
+
+
+@unittest.skipIf(httpx is None, 'httpx[http2] and hypercorn are required')
+class TestHttp2Transport(ServerMixin, unittest.TestCase):
+
+    def test_prior_knowledge(self):
+        with Http2Transport(prior_knowledge=True) as transport:
+            response = self.client(transport).get_user(id=1)
+        self.assertEqual(response.http_version, 'HTTP/2')
+        self.assertEqual(response.data, {'http_version': '2',
+                                         'path': '/api/users/1'})
+
+    def test_fall_back(self):
+        with Http2Transport() as transport:
+            response = self.client(transport).get_user(id=1)
+        self.assertEqual(response.http_version, 'HTTP/1.1')
+        self.assertEqual(response.data['http_version'], '1.1')
+
+    def test_multiplexed(self):
+        results = []
+        with Http2Transport(prior_knowledge=True, max_connections=1,
+                            max_concurrent_streams=4) as transport:
+            client = self.client(transport)
+
+            def call(user_id):
+                results.append(client.get_user(id=user_id).data['path'])
+
+            threads = [threading.Thread(target=call, args=(user_id,))
+                       for user_id in range(20)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+        self.assertEqual(sorted(results),
+                         sorted('/api/users/%d' % user_id
+                                for user_id in range(20)))
+
+    def test_streamed(self):
+        with Http2Transport(prior_knowledge=True) as transport:
+            environ = self.client(transport).get_user.build_environ({'id': 1})
+            response = transport.send(transport.prepare(environ), environ)
+            self.assertIsNone(response._content)
+            self.assertEqual(json.loads(response.text)['path'],
+                             '/api/users/1')
+            self.assertEqual(transport.send(
+                transport.prepare(environ), environ, stream=False
+            )._content, response.content)
+
+    def test_streams_by_origin(self):
+        with Http2Transport(max_connections=1,
+                            max_concurrent_streams=1) as transport:
+            first = transport.streams(httpx.URL('http://a.test.org/users'))
+            self.assertIs(
+                transport.streams(httpx.URL('http://a.test.org/items')), first
+            )
+            self.assertIsNot(
+                transport.streams(httpx.URL('http://b.test.org/users')), first
+            )
+            self.assertIsNot(
+                transport.streams(httpx.URL('https://a.test.org/users')),
+                first
+            )
+
+
+@unittest.skipIf(httpx is None or trustme is None,
+                 'httpx[http2], hypercorn and trustme are required')
+class TestHttp2TransportOverTls(ServerMixin, unittest.TestCase):
+
+    scheme = 'https'
+    alpn_protocols = ['h2', 'http/1.1']
+
+    @classmethod
+    def configure(cls, config):
+        cls.directory = tempfile.mkdtemp()
+        cls.authority = trustme.CA()
+        certificate = cls.authority.issue_cert('127.0.0.1')
+        config.certfile = os.path.join(cls.directory, 'cert.pem')
+        config.keyfile = os.path.join(cls.directory, 'key.pem')
+        certificate.cert_chain_pems[0].write_to_path(config.certfile)
+        certificate.private_key_pem.write_to_path(config.keyfile)
+        config.alpn_protocols = cls.alpn_protocols
+
+    @classmethod
+    def tearDownClass(cls):
+        super(TestHttp2TransportOverTls, cls).tearDownClass()
+        shutil.rmtree(cls.directory)
+
+    def transport(self):
+        context = ssl.create_default_context()
+        self.authority.configure_trust(context)
+        return Http2Transport(verify=context)
+
+    def test_negotiated(self):
+        with self.transport() as transport:
+            response = self.client(transport).get_user(id=1)
+        self.assertEqual(response.http_version, 'HTTP/2')
+        self.assertEqual(response.data['http_version'], '2')
+
+
+class TestHttp1FallBackOverTls(TestHttp2TransportOverTls):
+
+    alpn_protocols = ['http/1.1']
+
+    def test_negotiated(self):
+        with self.transport() as transport:
+            response = self.client(transport).get_user(id=1)
+        self.assertEqual(response.http_version, 'HTTP/1.1')
+        self.assertEqual(response.data['http_version'], '1.1')
@@ -0,0 +1,148 @@
+# -*- coding: utf-8 -*-
+
+import json
+import threading
+import time
+import unittest
+from britney import errors
+from britney.core import Spore
+from britney.limits import FifoSemaphore, HostLimits
+from britney.middleware import utils
+
+DESCRIPTION = {
+    'name': 'test',
+    'base_url': 'http://api.test.org/v1',
+    'methods': {
+        'get_user': {'method': 'GET', 'path': '/users/:id',
+                     'required_params': ['id']},
+        'list_users': {'method': 'GET', 'path': '/users'},
+    }
+}
+
+
+class Upstream(object):
+    """ Fake routes counting the calls in flight
+    """
+
+    def __init__(self, delay=0.02):
+        self.delay = delay
+        self.lock = threading.Lock()
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    def __call__(self, request):
+        with self.lock:
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        time.sleep(self.delay)
+        with self.lock:
+            self.in_flight -= 1
+        return utils.fake_response(request, json.dumps({}))
+
+
+def run_threads(targets):
+    threads = [threading.Thread(target=target) for target in targets]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+
+class TestFifoSemaphore(unittest.TestCase):
+
+    def test_order(self):
+        semaphore = FifoSemaphore(1)
+        self.assertTrue(semaphore.acquire())
+        order = []
+
+        def wait(index):
+            semaphore.acquire()
+            order.append(index)
+            semaphore.release()
+
+        threads = []
+        for index in range(5):
+            threads.append(threading.Thread(target=wait, args=(index,)))
+            threads[-1].start()
+            while semaphore.waiting < index + 1:
+                time.sleep(0.001)
+        semaphore.release()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(order, list(range(5)))
+        self.assertEqual(semaphore.in_use, 0)
+
+    def test_timeout(self):
+        semaphore = FifoSemaphore(1)
+        semaphore.acquire()
+        self.assertFalse(semaphore.acquire(timeout=0.01))
+        self.assertEqual(semaphore.waiting, 0)
+        semaphore.release()
+        self.assertTrue(semaphore.acquire(timeout=0))
+
+
+class TestHostLimits(unittest.TestCase):
+
+    def setUp(self):
+        self.upstream = Upstream()
+        self.transport = utils.FakeTransport({'/users': self.upstream,
+                                              '/users/{id}': self.upstream})
+        self.clients = [Spore(**DESCRIPTION), Spore(**DESCRIPTION)]
+        for client in self.clients:
+            client.set_transport(self.transport)
+
+    def test_shared_limit(self):
+        limits = self.transport.limits = HostLimits(2)
+        calls = []
+        for client in self.clients:
+            calls.extend([client.list_users] * 3)
+            calls.extend([lambda client=client: client.get_user(id=1)] * 3)
+        run_threads(calls)
+        self.assertEqual(self.upstream.max_in_flight, 2)
+
+        stats = limits.stats()['api.test.org:80']
+        self.assertEqual(stats['calls'], 12)
+        self.assertEqual(stats['in_flight'], 0)
+        self.assertEqual(stats['timeouts'], 0)
+        self.assertGreater(stats['wait_max'], 0.01)
+        self.assertLessEqual(stats['wait_p50'], stats['wait_max'])
+
+    def test_host_limit(self):
+        self.transport.limits = HostLimits(4, hosts={'api.test.org:80': 1})
+        run_threads([self.clients[0].list_users] * 4)
+        self.assertEqual(self.upstream.max_in_flight, 1)
+
+    def test_wait_in_environ(self):
+        self.transport.limits = HostLimits(1)
+        response = self.clients[0].list_users()
+        self.assertGreaterEqual(response.environ['spore.host_wait'], 0)
+
+    def test_timeout(self):
+        self.upstream.delay = 0.2
+        limits = self.transport.limits = HostLimits(1, timeout=0.01)
+        failures = []
+
+        def call():
+            try:
+                self.clients[0].list_users()
+            except errors.SporeHostBusyError as error:
+                failures.append(error)
+
+        run_threads([call] * 3)
+        self.assertEqual(len(failures), 2)
+        self.assertEqual(failures[0].host, 'api.test.org:80')
+        self.assertGreaterEqual(failures[0].waited, 0.01)
+        self.assertIsInstance(failures[0], errors.SporeMethodCallError)
+        self.assertEqual(limits.stats()['api.test.org:80']['timeouts'], 2)
+
+    def test_error_releases(self):
+        limits = HostLimits(1)
+        transport = utils.FakeTransport({'/users': self.fail})
+        transport.limits = limits
+        self.clients[0].set_transport(transport)
+        for _ in range(2):
+            self.assertRaises(RuntimeError, self.clients[0].list_users)
+        self.assertEqual(limits.stats()['api.test.org:80']['in_flight'], 0)
+
+    def fail(self, request):
+        raise RuntimeError('upstream failed')
@@ -0,0 +1,135 @@
+# -*- coding: utf-8 -*-
+
+import json
+import threading
+import unittest
+import responses
+from six.moves.urllib.parse import parse_qs, urlparse
+import britney
+from britney import errors
+from britney.core import Spore
+
+
+def bulk_callback(request):
+    ids = parse_qs(urlparse(request.url).query)['ids']
+    return 200, {}, json.dumps({
+        'results': [{'id': int(item_id), 'name': 'item %s' % item_id}
+                    for item_id in ids if item_id != '0']
+    })
+
+
+class TestLoader(unittest.TestCase):
+
+    def setUp(self):
+        self.client = Spore(name='test', base_url='http://api.test.org/',
+                            methods={
+            'get_item': {
+                'method': 'GET', 'path': '/items/:id',
+                'required_params': ['id'], 'optional_params': ['fields'],
+                'bulk': {'method': 'get_items', 'key_param': 'id',
+                         'bulk_param': 'ids', 'result_key': 'id',
+                         'items': 'results', 'max_size': 3, 'wait': 0.2}
+            },
+            'get_items': {
+                'method': 'GET', 'path': '/items',
+                'required_params': ['ids']
+            },
+        })
+        self.client.enable('Json')
+        responses.add_callback(responses.GET, 'http://api.test.org/items',
+                               callback=bulk_callback,
+                               content_type='application/json')
+
+    @responses.activate
+    def test_concurrent_calls(self):
+        results = {}
+
+        def lookup(item_id):
+            results[item_id] = self.client.get_item(id=item_id).data
+
+        threads = [threading.Thread(target=lookup, args=(item_id,))
+                   for item_id in (1, 2, 3)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(responses.calls), 1)
+        self.assertEqual(results[2], {'id': 2, 'name': 'item 2'})
+        self.assertIn('ids=', responses.calls[0].request.url)
+
+    @responses.activate
+    def test_defer(self):
+        first = self.client.get_item.defer(1)
+        second = self.client.get_item.defer(2)
+        self.assertEqual(len(responses.calls), 0)
+
+        self.assertEqual(first.result().data['id'], 1)
+        self.assertEqual(second.result().data['id'], 2)
+        self.assertEqual(len(responses.calls), 1)
+
+    @responses.activate
+    def test_defer_then_call(self):
+        future = self.client.get_item.defer(1)
+        results = []
+        thread = threading.Thread(target=lambda: results.append(
+            self.client.get_item(id=2).data
+        ))
+        thread.daemon = True
+        thread.start()
+        thread.join(2)
+        self.assertFalse(thread.is_alive())
+        self.assertEqual(results, [{'id': 2, 'name': 'item 2'}])
+        self.assertEqual(future.result().data['id'], 1)
+        self.assertEqual(len(responses.calls), 1)
+
+    @responses.activate
+    def test_max_size(self):
+        futures = [self.client.get_item.defer(item_id)
+                   for item_id in range(1, 6)]
+        self.assertEqual(len(responses.calls), 0)
+        self.assertEqual([future.result().data['id'] for future in futures],
+                         [1, 2, 3, 4, 5])
+        self.assertEqual(len(responses.calls), 2)
+
+    @responses.activate
+    def test_item_headers(self):
+        first = self.client.get_item.defer(1)
+        second = self.client.get_item.defer(2)
+        first_headers = first.result().headers
+        self.assertNotIn('Content-Length', first_headers)
+        self.assertEqual(first_headers['Content-Type'], 'application/json')
+        self.assertIsNot(first_headers, second.result().headers)
+
+    @responses.activate
+    def test_same_key(self):
+        first = self.client.get_item.defer(1)
+        second = self.client.get_item.defer(1)
+        self.assertIs(first, second)
+
+    @responses.activate
+    def test_not_found(self):
+        with self.assertRaises(britney.HTTPError) as status_error:
+            self.client.get_item(id=0)
+        self.assertEqual(status_error.exception.response.status_code, 404)
+
+    @responses.activate
+    def test_not_batched(self):
+        responses.add(responses.GET, 'http://api.test.org/items/1',
+                      body='{"id": 1}', content_type='application/json')
+        response = self.client.get_item(id=1, fields='name')
+        self.assertEqual(response.data, {'id': 1})
+        self.assertEqual(responses.calls[0].request.url,
+                         'http://api.test.org/items/1?fields=name')
+
+    def test_no_bulk_method(self):
+        with self.assertRaises(errors.SporeMethodCallError):
+            self.client.get_items.defer(1)
+
+    def test_unknown_bulk_method(self):
+        with self.assertRaises(errors.SporeClientBuildError) as build_error:
+            Spore(name='test', base_url='http://api.test.org/', methods={
+                'get_item': {'method': 'GET', 'path': '/items/:id',
+                             'bulk': {'method': 'unknown'}}
+            })
+        self.assertIn('get_item', build_error.exception.errors['methods'])
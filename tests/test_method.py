@@ -1,6 +1,8 @@
 # -*- coding: utf-8 -*-
 
+from array import array
 from functools import partial
+import io
 import unittest
 from six import StringIO
 from britney.core import SporeMethod, Spore
@@ -72,6 +74,54 @@ class TestMethodFormats(unittest.TestCase):
         self.assertIsNone(method.formats)
 
 
+class TestMethodFootprint(unittest.TestCase):
+    """ Tests the compact representation of the methods and of the
+    environment of their calls
+    """
+
+    def setUp(self):
+        self.method = SporeMethod(
+            method='GET', name='test_method', path='/test/:id',
+            api_base_url='http://my_test.org', required_params=['id'],
+            optional_params=['page'], expected_status=[200, 404],
+            documentation='Gets a test'
+        )
+
+    def test_no_dict(self):
+        self.assertFalse(hasattr(self.method, '__dict__'))
+        self.assertRaises(AttributeError, setattr, self.method, 'other', 1)
+        self.assertEqual(self.method.required_params, ('id',))
+        self.assertEqual(self.method.expected_status, (200, 404))
+
+    def test_documentation(self):
+        self.assertEqual(self.method.__doc__, 'Gets a test')
+        self.assertTrue(SporeMethod.__doc__.strip().startswith('A method'))
+        method = SporeMethod(method='GET', name='other', path='/',
+                             api_base_url='http://my_test.org',
+                             description='Described')
+        self.assertEqual(method.__doc__, 'Described')
+
+    def test_params_replaced(self):
+        self.method.optional_params = ['page', 'size']
+        self.assertTrue(self.method.is_a_param('size'))
+        self.assertEqual(
+            sorted(self.method.build_params(id=1, size=2)),
+            [('id', 1), ('size', 2)]
+        )
+
+    def test_environ_template(self):
+        first = self.method.build_environ({'id': 1})
+        second = self.method.build_environ({'id': 2})
+        self.assertIsNot(first['spore.headers'], second['spore.headers'])
+        self.assertEqual(first['SERVER_NAME'], 'my_test.org')
+
+        self.method.base_url = 'https://other.org:8443/v1'
+        environ = self.method.build_environ({'id': 1})
+        self.assertEqual(environ['SERVER_PORT'], 8443)
+        self.assertEqual(environ['SCRIPT_NAME'], '/v1')
+        self.assertEqual(environ['wsgi.url_scheme'], 'https')
+
+
 class TestMethodRequiredParameters(unittest.TestCase):
     """ Tests the value of the built parameters in case of required and
     optional parameters defined in description, and the exceptions raised when
@@ -221,6 +271,17 @@ class TestMethodBaseEnviron(unittest.TestCase):
         self.assertEqual(base_environ['QUERY_STRING'], '')
         self.assertEqual(base_environ['wsgi.url_scheme'], 'https')
 
+    def test_unix_socket(self):
+        method = SporeMethod(method='GET', name='test_method', path='/test',
+                base_url='http+unix://%2Frun%2FSvc.sock/api/')
+        base_environ = method.base_environ()
+        self.assertEqual(base_environ['spore.unix_socket'], '/run/Svc.sock')
+        self.assertEqual(base_environ['SERVER_NAME'], 'localhost')
+        self.assertEqual(base_environ['SERVER_PORT'], 80)
+        self.assertEqual(base_environ['SCRIPT_NAME'], '/api')
+        self.assertEqual(base_environ['PATH_INFO'], '/test')
+        self.assertEqual(base_environ['wsgi.url_scheme'], 'http+unix')
+
 
 class TestMethodBuilder(unittest.TestCase):
     """ Test method generation, errors catched in REST description and
@@ -276,6 +337,57 @@ class TestMethodPayload(unittest.TestCase):
         self.assertEqual(payload, {'test': 'data'})
 
 
+class TestMethodRawPayload(unittest.TestCase):
+    """ Test payloads sent as they are, with their content type
+    """
+
+    def setUp(self):
+        self.method = SporeMethod(method='POST', name='test_method',
+                                  path='/test',
+                                  api_base_url='http://my_test.org')
+
+    def build(self, payload, **kwargs):
+        return self.method.build_environ(dict(
+            kwargs, payload=payload, payload_format='application/json'
+        ))
+
+    def test_bytes(self):
+        for payload in (b'{"id": 1}', bytearray(b'{"id": 1}'),
+                        memoryview(b'{"id": 1}')):
+            environ = self.build(payload)
+            self.assertIs(environ['spore.payload'], payload)
+            self.assertEqual(environ['spore.payload_format'],
+                             'application/json')
+            self.assertEqual(environ['spore.headers'], {
+                'Content-Type': 'application/json', 'Content-Length': '9'
+            })
+
+    def test_buffer_of_items(self):
+        environ = self.build(memoryview(array('i', [1, 2, 3])))
+        self.assertEqual(environ['spore.headers']['Content-Length'],
+                         str(3 * array('i').itemsize))
+        self.assertEqual(environ['spore.payload'].format, 'B')
+
+    def test_file_object(self):
+        payload = io.BytesIO(b'{"id": 1}')
+        payload.read(2)
+        environ = self.build(payload)
+        self.assertEqual(environ['spore.headers']['Content-Length'], '7')
+
+    def test_empty_file_object(self):
+        environ = self.build(io.BytesIO())
+        self.assertEqual(environ['spore.headers']['Content-Length'], '0')
+        self.assertEqual(environ['spore.payload'], b'')
+
+    def test_errors(self):
+        self.assertRaises(errors.SporeMethodCallError, self.build,
+                          {'id': 1})
+        self.assertRaises(errors.SporeMethodCallError, self.build, b'{}',
+                          files={'my_file': StringIO()})
+        self.assertRaises(errors.SporeMethodCallError, self.build,
+                          memoryview(b'abcd')[::2])
+
+
 class TestMethodStatus(unittest.TestCase):
     """ Test checking expected http status from response
     """
@@ -0,0 +1,162 @@
+# -*- coding: utf-8 -*-
+
+import json
+import re
+import unittest
+import responses
+from six.moves.urllib.parse import parse_qs, urlparse
+from britney import errors
+from britney.core import Spore
+
+ITEMS = list(range(23))
+
+
+def page_callback(request):
+    query = parse_qs(urlparse(request.url).query)
+    page = int(query['page'][0])
+    size = int(query['per_page'][0])
+    items = ITEMS[(page - 1) * size:page * size]
+    return 200, {}, json.dumps({'results': items, 'count': len(ITEMS)})
+
+
+def offset_callback(request):
+    query = parse_qs(urlparse(request.url).query)
+    offset = int(query['offset'][0])
+    return 200, {}, json.dumps(ITEMS[offset:offset + 10])
+
+
+def cursor_callback(request):
+    query = parse_qs(urlparse(request.url).query)
+    start = int(query.get('cursor', ['0'])[0])
+    end = start + 10
+    return 200, {}, json.dumps({
+        'data': ITEMS[start:end],
+        'meta': {'next': str(end) if end < len(ITEMS) else None}
+    })
+
+
+def link_callback(request):
+    query = parse_qs(urlparse(request.url).query)
+    start = int(query.get('since', ['0'])[0])
+    end = start + 10
+    headers = {}
+    if end < len(ITEMS):
+        headers['Link'] = '<http://api.test.org/linked?since=%d>; ' \
+                          'rel="next"' % end
+    return 200, headers, json.dumps(ITEMS[start:end])
+
+
+class TestPagination(unittest.TestCase):
+
+    def setUp(self):
+        self.client = Spore(name='test', base_url='http://api.test.org/',
+                            methods={
+            'paged': {
+                'method': 'GET', 'path': '/paged',
+                'optional_params': ['page', 'per_page', 'filter'],
+                'pagination': {'style': 'page', 'size_param': 'per_page',
+                               'size': 5, 'items': 'results'}
+            },
+            'counted': {
+                'method': 'GET', 'path': '/paged',
+                'optional_params': ['page', 'per_page'],
+                'pagination': {'style': 'page', 'size_param': 'per_page',
+                               'size': 5, 'items': 'results',
+                               'total': 'count'}
+            },
+            'offset': {
+                'method': 'GET', 'path': '/offset',
+                'optional_params': ['offset'],
+                'pagination': {'style': 'offset', 'size': 10}
+            },
+            'cursor': {
+                'method': 'GET', 'path': '/cursor',
+                'optional_params': ['cursor'],
+                'pagination': {'style': 'cursor', 'items': 'data',
+                               'next_cursor': 'meta.next'}
+            },
+            'linked': {
+                'method': 'GET', 'path': '/linked',
+                'optional_params': ['since'],
+                'pagination': {'style': 'link'}
+            },
+            'not_paged': {'method': 'GET', 'path': '/paged'},
+        })
+        self.client.enable('Json')
+
+    def add(self, path, callback):
+        responses.add_callback(
+            responses.GET, re.compile(r'http://api\.test\.org/%s.*' % path),
+            callback=callback, content_type='application/json'
+        )
+
+    @responses.activate
+    def test_page(self):
+        self.add('paged', page_callback)
+        self.assertListEqual(list(self.client.paged.paginate()), ITEMS)
+        self.assertEqual(len(responses.calls), 5)
+
+    @responses.activate
+    def test_page_without_prefetch(self):
+        self.add('paged', page_callback)
+        items = list(self.client.paged.paginate(prefetch=False))
+        self.assertListEqual(items, ITEMS)
+
+    @responses.activate
+    def test_page_with_params(self):
+        self.add('paged', page_callback)
+        list(self.client.paged.paginate(filter='all'))
+        self.assertIn('filter=all', responses.calls[0].request.url)
+
+    @responses.activate
+    def test_concurrent_pages(self):
+        self.add('paged', page_callback)
+        items = list(self.client.counted.paginate(window=3))
+        self.assertListEqual(items, ITEMS)
+        self.assertEqual(len(responses.calls), 5)
+
+    @responses.activate
+    def test_offset(self):
+        self.add('offset', offset_callback)
+        self.assertListEqual(list(self.client.offset.paginate()), ITEMS)
+
+    @responses.activate
+    def test_cursor(self):
+        self.add('cursor', cursor_callback)
+        self.assertListEqual(list(self.client.cursor.paginate()), ITEMS)
+
+    @responses.activate
+    def test_link(self):
+        self.add('linked', link_callback)
+        self.assertListEqual(list(self.client.linked.paginate()), ITEMS)
+
+    @responses.activate
+    def test_link_without_params(self):
+        responses.add(
+            responses.GET, 'http://api.test.org/linked',
+            json=ITEMS[:10], headers={
+                'Link': '<http://api.test.org/linked?page=2>; rel="next"'
+            }
+        )
+        items = list(self.client.linked.paginate())
+        self.assertListEqual(items, ITEMS[:10])
+        self.assertEqual(len(responses.calls), 1)
+
+    @responses.activate
+    def test_lazy(self):
+        self.add('paged', page_callback)
+        iterator = iter(self.client.paged.paginate(prefetch=False))
+        self.assertEqual(next(iterator), 0)
+        self.assertEqual(len(responses.calls), 1)
+
+    def test_not_paginated(self):
+        with self.assertRaises(errors.SporeMethodCallError):
+            self.client.not_paged.paginate()
+
+    def test_unknown_style(self):
+        with self.assertRaises(errors.SporeClientBuildError) as build_error:
+            Spore(name='test', base_url='http://api.test.org/', methods={
+                'paged': {'method': 'GET', 'path': '/paged',
+                          'pagination': {'style': 'unknown'}}
+            })
+        self.assertIn('paged', build_error.exception.errors['methods'])
@@ -0,0 +1,111 @@
+# -*- coding: utf-8 -*-
+
+import json
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+import britney
+from britney.registry import Registry, registry
+from britney.middleware import auth
+from britney.middleware import utils
+
+
+DESCRIPTION = {
+    'name': 'Test API',
+    'base_url': 'http://api.test.org/v1',
+    'methods': {
+        'get_user': {'method': 'GET', 'path': '/users/:id',
+                     'required_params': ['id']},
+    }
+}
+
+
+class TestRegistry(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.spec = os.path.join(self.directory, 'api.json')
+        self.write(DESCRIPTION)
+        self.registry = Registry(check_interval=0)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def write(self, description, mtime=None):
+        with open(self.spec, 'w') as spec_file:
+            json.dump(description, spec_file)
+        if mtime is not None:
+            os.utime(self.spec, (mtime, mtime))
+
+    def test_shared_client(self):
+        client = self.registry.get(self.spec, middlewares=['Json'])
+        self.assertIs(self.registry.get(self.spec, middlewares=['Json']),
+                      client)
+        self.assertIs(self.registry.get(os.path.relpath(self.spec),
+                                        middlewares=['Json']), client)
+        self.assertEqual(len(client.middlewares), 1)
+        self.assertEqual(len(self.registry), 1)
+
+    def test_keys(self):
+        client = self.registry.get(self.spec)
+        other = self.registry.get(self.spec, base_url='http://other.org')
+        basic = self.registry.get(self.spec, middlewares=[
+            (auth.Basic, {'username': 'login', 'password': 'secret'})
+        ])
+        self.assertEqual(len(set(map(id, (client, other, basic)))), 3)
+        self.assertEqual(other.base_url, 'http://other.org')
+        self.assertIs(basic, self.registry.get(self.spec, middlewares=[
+            (auth.Basic, {'password': 'secret', 'username': 'login'})
+        ]))
+
+    def test_shared_transport(self):
+        client = self.registry.get(self.spec)
+        other = self.registry.get(self.spec, base_url='http://other.org')
+        self.assertIs(client.transport, other.transport)
+        self.assertIs(client.get_user.transport, self.registry.transport)
+
+        transport = utils.FakeTransport()
+        own = self.registry.get(self.spec, transport=transport)
+        self.assertIs(own.transport, transport)
+        self.assertIsNot(own, client)
+
+    def test_reload(self):
+        self.write(DESCRIPTION, mtime=1000000000)
+        client = self.registry.get(self.spec)
+        self.assertIs(self.registry.get(self.spec), client)
+
+        methods = dict(DESCRIPTION['methods'], list_users={
+            'method': 'GET', 'path': '/users'
+        })
+        self.write(dict(DESCRIPTION, methods=methods), mtime=1000000100)
+        reloaded = self.registry.get(self.spec)
+        self.assertIsNot(reloaded, client)
+        self.assertTrue(hasattr(reloaded, 'list_users'))
+        self.assertIs(reloaded.transport, client.transport)
+
+    def test_check_interval(self):
+        self.registry.check_interval = 3600
+        client = self.registry.get(self.spec)
+        self.write(dict(DESCRIPTION, name='Changed'), mtime=1000000200)
+        self.assertIs(self.registry.get(self.spec), client)
+
+    def test_threads(self):
+        clients = []
+        threads = [threading.Thread(
+            target=lambda: clients.append(self.registry.get(self.spec))
+        ) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(set(map(id, clients))), 1)
+
+    def test_get_client(self):
+        try:
+            client = britney.get_client(self.spec)
+            self.assertIs(britney.get_client(self.spec), client)
+            self.assertIs(client.transport, registry.transport)
+        finally:
+            registry.clear()
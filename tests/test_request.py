@@ -30,6 +30,8 @@ class TestRequestBuilderUrl(unittest.TestCase):
         self.assertIn('Content-Type', headers)
         self.assertEqual(headers['Authorization'], 'cdbcdvvvfvf==')
         self.assertEqual(headers['Content-Type'], 'text/plain')
+        self.assertNotIn('Host', environ['spore.headers'])
+        self.assertIsNot(built_request.headers, headers)
 
     def test_payload(self):
         environ = {'spore.payload': {'param': 'test'}}
@@ -45,3 +47,15 @@ class TestRequestBuilderUrl(unittest.TestCase):
         built_request = RequestBuilder(environ)
         prepared_request = built_request()
         self.assertIsInstance(prepared_request, requests.PreparedRequest)
+
+    def test_unix_socket(self):
+        environ = dict(self.data[0]['env'], **{
+            'wsgi.url_scheme': 'http+unix', 'SERVER_NAME': 'localhost',
+            'SERVER_PORT': 80, 'spore.unix_socket': '/run/Svc.sock',
+            'SCRIPT_NAME': '/api', 'PATH_INFO': '/users', 'spore.headers': {},
+            'spore.userinfo': '', 'QUERY_STRING': '', 'spore.params': []
+        })
+        built_request = RequestBuilder(environ)
+        self.assertEqual(built_request.uri,
+                         'http+unix://%2Frun%2FSvc.sock/api/users')
+        self.assertEqual(built_request.headers['Host'], 'localhost')
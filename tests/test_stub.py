@@ -0,0 +1,139 @@
+# -*- coding: utf-8 -*-
+
+import json
+import os
+import shutil
+import tempfile
+import unittest
+import britney
+from britney import errors
+from britney import stub
+from britney.transport import Urllib3Transport
+
+
+DESCRIPTION = {
+    'name': 'Stub API',
+    'base_url': 'http://api.test.org/v1/',
+    'methods': {
+        'get_user': {'method': 'GET', 'path': '/users/:id',
+                     'required_params': ['id']},
+        'list_users': {'method': 'GET', 'path': '/users',
+                       'optional_params': ['active']},
+        'create_user': {'method': 'POST', 'path': '/users',
+                        'expected_status': [201]},
+        'delete_user': {'method': 'DELETE', 'path': '/users/:id',
+                        'required_params': ['id'],
+                        'expected_status': [204]},
+        'get_format': {'method': 'GET', 'path': '/users/:id.:format',
+                       'required_params': ['id', 'format']},
+    }
+}
+
+
+class TestStub(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.spec = os.path.join(self.directory, 'api.json')
+        with open(self.spec, 'w') as spec_file:
+            json.dump(DESCRIPTION, spec_file)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def client(self, server, transport=None):
+        client = britney.new(self.spec, base_url=server.base_url,
+                             transport=transport)
+        client.enable('Json')
+        return client
+
+    def test_default_status(self):
+        self.assertEqual(stub.default_status([]), 200)
+        self.assertEqual(stub.default_status([404, 202]), 202)
+        self.assertEqual(stub.default_status([404]), 404)
+
+    def test_generated_responses(self):
+        with stub.serve(self.spec) as server:
+            client = self.client(server)
+            self.assertEqual(server.base_url, server.url + '/v1')
+            self.assertEqual(client.get_user(id=1).data,
+                             {'method': 'get_user', 'params': {'id': '1'}})
+            self.assertEqual(client.get_format(id=1, format='json').data,
+                             {'method': 'get_format',
+                              'params': {'id': '1', 'format': 'json'}})
+            self.assertEqual(
+                client.list_users(active=1).data['params'], {'active': '1'}
+            )
+            self.assertEqual(client.create_user(payload={}).status_code, 201)
+            self.assertEqual(client.delete_user(id=1).status_code, 204)
+
+    def test_content_length(self):
+        description = dict(DESCRIPTION, methods=dict(
+            DESCRIPTION['methods'],
+            head_user={'method': 'HEAD', 'path': '/users/:id',
+                       'required_params': ['id']},
+        ))
+        app = stub.StubApp(description, {'head_user': {'id': 1},
+                                         'delete_user': {'id': 1}})
+        started = []
+
+        def call(method):
+            environ = {'REQUEST_METHOD': method, 'PATH_INFO': '/v1/users/1',
+                       'wsgi.input': None}
+            content = b''.join(app(environ, lambda status, headers:
+                                   started.append(dict(headers))))
+            return started[-1], content
+
+        headers, content = call('HEAD')
+        self.assertEqual(content, b'')
+        self.assertEqual(headers['Content-Length'], str(len(b'{"id": 1}')))
+        headers, content = call('DELETE')
+        self.assertEqual(content, b'')
+        self.assertNotIn('Content-Length', headers)
+
+    def test_canned_responses(self):
+        responses = {
+            'get_user': {'id': 1},
+            'list_users': stub.StubResponse([], headers={'X-Total': '0'}),
+            'create_user': lambda request: stub.StubResponse(
+                json.loads(request.body.decode('utf-8')), status=200
+            ),
+            'delete_user': stub.StubResponse(status=404),
+        }
+        with stub.serve(DESCRIPTION, responses) as server:
+            client = self.client(server)
+            self.assertEqual(client.get_user(id=3).data, {'id': 1})
+            users = client.list_users()
+            self.assertEqual((users.data, users.headers['X-Total']), ([], '0'))
+            self.assertEqual(
+                client.create_user(payload={'name': 'Britney'}).data,
+                {'name': 'Britney'}
+            )
+            with self.assertRaises(errors.SporeMethodStatusError) as context:
+                client.delete_user(id=1)
+            self.assertEqual(context.exception.response.status_code, 404)
+
+    def test_unknown_route(self):
+        description = dict(DESCRIPTION, methods={})
+        with stub.serve(description, base_path='/v1') as server:
+            client = self.client(server)
+            with self.assertRaises(errors.SporeMethodStatusError) as context:
+                client.list_users()
+            self.assertEqual(context.exception.response.status_code, 404)
+
+    def test_errors(self):
+        with stub.serve(DESCRIPTION, error_rate=1, error_status=502) as server:
+            with self.assertRaises(errors.SporeMethodStatusError) as context:
+                self.client(server).get_user(id=1)
+            self.assertEqual(context.exception.response.status_code, 502)
+
+    def test_persistent_connections(self):
+        transport = Urllib3Transport()
+        with stub.serve(DESCRIPTION) as server:
+            client = self.client(server, transport)
+            for user_id in range(20):
+                client.get_user(id=user_id)
+                client.create_user(payload={'id': user_id})
+            pools = list(transport.pool_manager.pools._container.values())
+        self.assertEqual(len(pools), 1)
+        self.assertEqual(pools[0].num_connections, 1)
@@ -0,0 +1,118 @@
+# -*- coding: utf-8 -*-
+
+import unittest
+from os.path import abspath, dirname, join
+import responses
+import britney
+from britney.middleware.utils import Mock, fake_response
+from britney.tracing import Tracer, percentile
+
+
+class TestTracer(unittest.TestCase):
+
+    def test_not_sampled(self):
+        tracer = Tracer()
+        self.assertIsNone(tracer.begin('test'))
+
+    def test_head_sampled(self):
+        tracer = Tracer(sample_rate=1)
+        trace = tracer.begin('test')
+        trace.environ = {'PATH_INFO': '/test', 'spore.params': [('id', 1)],
+                         'spore.headers': {'Authorization': 'secret'}}
+        self.assertTrue(tracer.end(trace))
+        self.assertEqual(list(tracer.traces), [trace])
+        self.assertEqual(trace.environ['PATH_INFO'], '/test')
+        self.assertEqual(trace.environ['spore.params'], ['id'])
+        self.assertEqual(trace.environ['spore.headers'], ['Authorization'])
+
+    def test_tail_sampled_on_threshold(self):
+        tracer = Tracer(slow_threshold=3600)
+        trace = tracer.begin('test')
+        self.assertIsNotNone(trace)
+        self.assertFalse(tracer.end(trace))
+        self.assertEqual(len(tracer.traces), 0)
+
+        tracer.slow_threshold = 0
+        self.assertTrue(tracer.end(tracer.begin('test')))
+
+    def test_ring_buffer(self):
+        tracer = Tracer(sample_rate=1, buffer_size=3)
+        for _ in range(5):
+            tracer.end(tracer.begin('test'))
+        self.assertEqual(len(tracer.traces), 3)
+
+    def test_exporters(self):
+        exported = []
+        tracer = Tracer(sample_rate=1, exporters=[exported.append])
+        trace = tracer.begin('test')
+        tracer.end(trace)
+        self.assertEqual(exported, [trace])
+
+    def test_failing_exporter(self):
+        exported = []
+
+        def fail(trace):
+            raise RuntimeError('exporter down')
+
+        tracer = Tracer(sample_rate=1, exporters=[fail, exported.append])
+        trace = tracer.begin('test')
+        self.assertTrue(tracer.end(trace))
+        self.assertEqual(exported, [trace])
+
+    def test_percentile(self):
+        self.assertEqual(percentile(range(101), 99), 99)
+        self.assertEqual(percentile([3, 1, 2], 50), 2)
+        self.assertIsNone(percentile([], 50))
+
+
+class TestMethodTracing(unittest.TestCase):
+
+    description_path = join(dirname(abspath(__file__)), 'descriptions')
+
+    def setUp(self):
+        self.client = britney.new(join(self.description_path, 'api.json'))
+        self.tracer = self.client.enable_tracing(sample_rate=1)
+
+    @responses.activate
+    def test_events(self):
+        self.client.enable('Json')
+        responses.add(responses.GET, 'http://test.api.org/test',
+                      body='{"test": "good"}', status=200,
+                      content_type='application/json')
+
+        self.client.test()
+
+        trace = self.tracer.traces[0]
+        self.assertEqual(trace.method, 'test')
+        self.assertEqual(trace.status, 200)
+        self.assertEqual(trace.environ['PATH_INFO'], '/test')
+        self.assertListEqual([event[0] for event in trace.events], [
+            'environ.built', 'middleware.enter', 'middleware.exit',
+            'request.prepared', 'request.send', 'response.headers',
+            'response.body', 'response.decoded'
+        ])
+        self.assertEqual(trace.events[1][2], 'Json')
+        offsets = [event[1] for event in trace.events]
+        self.assertEqual(offsets, sorted(offsets))
+
+    @responses.activate
+    def test_error(self):
+        responses.add(responses.GET, 'http://test.api.org/test', status=500)
+
+        with self.assertRaises(britney.HTTPError):
+            self.client.test()
+
+        trace = self.tracer.traces[0]
+        self.assertEqual(trace.status, None)
+        self.assertIn('SporeMethodStatusError', trace.error)
+
+    def test_short_circuit(self):
+        self.client.enable(Mock, fakes={
+            '/test': lambda request: fake_response(request, 'OK')
+        })
+        self.client.test()
+        self.assertEqual(self.tracer.traces[0].status, 200)
+
+    def test_disable(self):
+        self.client.disable_tracing()
+        self.assertIsNone(self.client.test.tracer)
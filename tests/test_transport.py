@@ -0,0 +1,379 @@
+# -*- coding: utf-8 -*-
+
+import io
+import json
+import os
+import shutil
+import socket
+import tempfile
+import threading
+import time
+import unittest
+import responses
+from requests.compat import quote
+from six.moves import BaseHTTPServer, socketserver
+from urllib3.exceptions import NewConnectionError
+import britney
+from britney.core import Spore
+from britney.middleware.utils import FakeTransport, Mock, fake_response
+from britney.response import Response
+from britney.transport import RequestsTransport, Urllib3Transport
+
+
+class EchoHandler(BaseHTTPServer.BaseHTTPRequestHandler):
+
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+
+    def _echo(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        body = json.dumps({
+            'method': self.command,
+            'path': self.path,
+            'headers': dict(self.headers.items()),
+            'body': self.rfile.read(length).decode('utf-8'),
+        }).encode('utf-8')
+        status = 404 if 'missing' in self.path else 200
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.send_header('Link', '<http://next.org/?page=2>; rel="next"')
+        self.send_header('Set-Cookie', 'session=1')
+        self.end_headers()
+        self.wfile.write(body)
+
+    do_GET = do_POST = do_PUT = do_DELETE = _echo
+
+    def log_message(self, *args):
+        pass
+
+
+class EchoServer(socketserver.ThreadingMixIn, BaseHTTPServer.HTTPServer):
+
+    daemon_threads = True
+
+
+class UnixEchoHandler(EchoHandler):
+
+    disable_nagle_algorithm = False
+
+    def address_string(self):
+        return 'unix'
+
+
+if hasattr(socket, 'AF_UNIX'):
+    class UnixEchoServer(socketserver.ThreadingUnixStreamServer):
+
+        daemon_threads = True
+
+
+class TransportTestCase(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.server = EchoServer(('127.0.0.1', 0), EchoHandler)
+        cls.thread = threading.Thread(target=cls.server.serve_forever)
+        cls.thread.daemon = True
+        cls.thread.start()
+        cls.base_url = 'http://127.0.0.1:%d/api' % \
+            cls.server.server_address[1]
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def client(self, transport, base_url=None):
+        client = Spore(name='test', base_url=base_url or self.base_url,
+                       methods={
+                           'get_user': {
+                               'method': 'GET', 'path': '/users/:id',
+                               'required_params': ['id'],
+                               'optional_params': ['names'],
+                           },
+                           'create_user': {
+                               'method': 'POST', 'path': '/users',
+                           },
+                           'missing': {
+                               'method': 'GET', 'path': '/missing',
+                               'expected_status': [404],
+                           },
+                       })
+        client.set_transport(transport)
+        return client
+
+
+class TestUrllib3Transport(TransportTestCase):
+
+    def setUp(self):
+        self.transport = Urllib3Transport()
+        self.client_ = self.client(self.transport)
+        self.client_.enable('Json')
+
+    def tearDown(self):
+        self.transport.close()
+
+    def test_get(self):
+        response = self.client_.get_user(id=1, names=['a', 'b'])
+        self.assertIsInstance(response, Response)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['path'],
+                         '/api/users/1?names=a&names=b')
+        self.assertEqual(response.data['headers']['Accept'],
+                         'application/json')
+        self.assertEqual(response.environ['spore.method'], 'get_user')
+
+    def test_json_payload(self):
+        response = self.client_.create_user(payload={'name': 'britney'})
+        self.assertEqual(response.data['method'], 'POST')
+        self.assertEqual(json.loads(response.data['body']),
+                         {'name': 'britney'})
+        self.assertEqual(response.data['headers']['Content-Type'],
+                         'application/json')
+
+    def test_raw_payload(self):
+        for payload in (b'{"name": "britney"}',
+                        memoryview(bytearray(b'{"name": "britney"}'))):
+            response = self.client_.create_user(
+                payload=payload, payload_format='application/json'
+            )
+            self.assertEqual(response.data['body'], '{"name": "britney"}')
+            self.assertEqual(response.data['headers']['Content-Length'],
+                             '19')
+
+    def test_empty_file_payload(self):
+        response = self.client_.create_user(payload=io.BytesIO(),
+                                            payload_format='text/plain')
+        self.assertEqual(response.data['body'], '')
+        self.assertEqual(response.data['headers']['Content-Length'], '0')
+        self.assertNotIn('Transfer-Encoding', response.data['headers'])
+
+    def test_form_payload(self):
+        client = self.client(self.transport)
+        response = client.create_user(payload={'name': 'britney'})
+        self.assertEqual(response.json()['body'], 'name=britney')
+
+    def test_userinfo(self):
+        base_url = self.base_url.replace('http://', 'http://login:secret@')
+        client = self.client(self.transport, base_url=base_url)
+        headers = client.get_user(id=1).json()['headers']
+        self.assertEqual(headers['Authorization'],
+                         'Basic bG9naW46c2VjcmV0')
+
+    def test_expected_status(self):
+        response = self.client_.missing()
+        self.assertEqual(response.status_code, 404)
+        self.assertFalse(response.ok)
+
+    def test_links(self):
+        response = self.client_.get_user(id=1)
+        self.assertEqual(response.links['next']['url'],
+                         'http://next.org/?page=2')
+
+    def test_status_error(self):
+        self.client_.missing.expected_status = []
+        with self.assertRaises(britney.HTTPError) as status_error:
+            self.client_.missing()
+        self.assertEqual(str(status_error.exception), 'Error 404')
+
+    def test_short_circuit(self):
+        client = self.client(self.transport)
+        client.enable(Mock, fakes={
+            '/users': lambda request: fake_response(request, 'OK')
+        })
+        self.assertEqual(client.create_user().text, 'OK')
+
+
+class TestRequestsTransport(TransportTestCase):
+
+    def test_default(self):
+        client = self.client(RequestsTransport())
+        self.assertIsInstance(client.get_user.transport, RequestsTransport)
+        self.assertIs(client.get_user.transport, client.transport)
+
+    def test_cookies_not_kept(self):
+        transport = RequestsTransport()
+        client = self.client(transport)
+        client.get_user(id=1)
+        headers = client.get_user(id=1).json()['headers']
+        self.assertNotIn('Cookie', headers)
+        self.assertEqual(len(transport.session.cookies), 0)
+
+    def test_raw_payload(self):
+        client = self.client(RequestsTransport())
+        client.enable('Json')
+        response = client.create_user(payload=io.BytesIO(b'["raw"]'),
+                                      payload_format='text/plain')
+        self.assertEqual(response.data['body'], '["raw"]')
+        self.assertEqual(response.data['headers']['Content-Type'],
+                         'text/plain')
+
+    def test_empty_file_payload(self):
+        client = self.client(RequestsTransport())
+        client.enable('Json')
+        response = client.create_user(payload=io.BytesIO(),
+                                      payload_format='text/plain')
+        self.assertEqual(response.data['body'], '')
+        self.assertEqual(response.data['headers']['Content-Length'], '0')
+        self.assertNotIn('Transfer-Encoding', response.data['headers'])
+
+    def test_new_with_transport(self):
+        transport = Urllib3Transport()
+        client = britney.new(os.path.join(os.path.dirname(__file__),
+                                          'descriptions', 'api.json'),
+                             transport=transport)
+        self.assertIs(client.test.transport, transport)
+
+    @responses.activate
+    def test_send(self):
+        responses.add(responses.GET, 'http://test.api.org/users/1',
+                      body='OK')
+        client = self.client(RequestsTransport(),
+                             base_url='http://test.api.org/')
+        self.assertEqual(client.get_user(id=1).text, 'OK')
+
+
+@unittest.skipUnless(hasattr(socket, 'AF_UNIX'), 'Unix sockets are required')
+class TestUnixSocket(TransportTestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.directory = tempfile.mkdtemp()
+        cls.socket_path = os.path.join(cls.directory, 'Svc.sock')
+        cls.server = UnixEchoServer(cls.socket_path, UnixEchoHandler)
+        cls.thread = threading.Thread(target=cls.server.serve_forever)
+        cls.thread.daemon = True
+        cls.thread.start()
+        cls.base_url = 'http+unix://%s/api' % quote(cls.socket_path, safe='')
+
+    @classmethod
+    def tearDownClass(cls):
+        super(TestUnixSocket, cls).tearDownClass()
+        shutil.rmtree(cls.directory)
+
+    def check(self, transport):
+        client = self.client(transport)
+        client.enable('Json')
+        for user_id in range(3):
+            response = client.get_user(id=user_id, names=['a', 'b'])
+            self.assertEqual(response.data['path'],
+                             '/api/users/%d?names=a&names=b' % user_id)
+            self.assertEqual(response.data['headers']['Host'], 'localhost')
+        response = client.create_user(payload={'name': 'britney'})
+        self.assertEqual(json.loads(response.data['body']),
+                         {'name': 'britney'})
+
+    def test_urllib3(self):
+        with Urllib3Transport() as transport:
+            self.check(transport)
+            pools = list(transport.pool_manager.pools._container.values())
+        self.assertEqual(len(pools), 1)
+        self.assertEqual(pools[0].socket_path, self.socket_path)
+        self.assertEqual(pools[0].num_connections, 1)
+
+    def test_requests(self):
+        with RequestsTransport() as transport:
+            self.check(transport)
+            adapter = transport.session.get_adapter(self.base_url)
+            pools = list(adapter.poolmanager.pools._container.values())
+        self.assertEqual(len(pools), 1)
+        self.assertEqual(pools[0].num_connections, 1)
+
+    def test_missing_socket(self):
+        client = self.client(Urllib3Transport(),
+                             base_url='http+unix://%2Fmissing.sock/api')
+        with self.assertRaises(NewConnectionError):
+            client.get_user(id=1)
+
+
+class CountingEchoServer(EchoServer):
+
+    def __init__(self, *args, **kwargs):
+        EchoServer.__init__(self, *args, **kwargs)
+        self.connections = 0
+
+    def process_request(self, request, client_address):
+        self.connections += 1
+        EchoServer.process_request(self, request, client_address)
+
+
+def serve(server_class=CountingEchoServer):
+    server = server_class(('127.0.0.1', 0), EchoHandler)
+    thread = threading.Thread(target=server.serve_forever,
+                              kwargs={'poll_interval': 0.05})
+    thread.daemon = True
+    thread.start()
+    return server
+
+
+def stop(server):
+    server.shutdown()
+    server.server_close()
+
+
+def wait_for(predicate, timeout=2):
+    deadline = time.time() + timeout
+    while not predicate() and time.time() < deadline:
+        time.sleep(0.01)
+    return predicate()
+
+
+class TestWarmup(unittest.TestCase):
+
+    def setUp(self):
+        self.servers = [serve(), serve()]
+        self.origins = ['http://127.0.0.1:%d/' % server.server_address[1]
+                        for server in self.servers]
+        self.client = Spore(name='test', base_url=self.origins[0] + 'api',
+                            methods={
+            'get_user': {'method': 'GET', 'path': '/users/:id',
+                         'required_params': ['id']},
+            'get_item': {'method': 'GET', 'path': '/items/:id',
+                         'required_params': ['id'],
+                         'base_url': self.origins[1] + 'v2'},
+        })
+
+    def tearDown(self):
+        for server in self.servers:
+            stop(server)
+
+    def test_urllib3(self):
+        transport = Urllib3Transport(maxsize=4)
+        self.client.set_transport(transport)
+        self.assertEqual(self.client.warmup(connections_per_host=3),
+                         dict.fromkeys(self.origins, 3))
+        for server in self.servers:
+            self.assertTrue(wait_for(lambda: server.connections == 3))
+
+        # the connections are reused by the calls
+        for user_id in range(3):
+            self.client.get_user(id=user_id)
+        self.assertEqual(self.client.warmup(connections_per_host=3),
+                         dict.fromkeys(self.origins, 0))
+        self.assertEqual(self.servers[0].connections, 3)
+        transport.close()
+
+    def test_requests(self):
+        transport = RequestsTransport()
+        self.client.set_transport(transport)
+        self.assertEqual(self.client.warmup(connections_per_host=2),
+                         dict.fromkeys(self.origins, 2))
+        self.assertEqual(self.client.get_item(id=1).status_code, 200)
+        self.assertTrue(wait_for(lambda: self.servers[1].connections == 2))
+        transport.close()
+
+    def test_pool_size(self):
+        self.client.set_transport(Urllib3Transport(maxsize=2))
+        self.assertEqual(self.client.warmup(connections_per_host=10),
+                         dict.fromkeys(self.origins, 2))
+
+    def test_unreachable(self):
+        stop(self.servers.pop())
+        self.client.set_transport(Urllib3Transport())
+        self.assertEqual(self.client.warmup(),
+                         {self.origins[0]: 1, self.origins[1]: 0})
+
+    def test_no_pool(self):
+        self.client.set_transport(FakeTransport())
+        self.assertEqual(self.client.warmup(),
+                         dict.fromkeys(self.origins, 0))
@@ -0,0 +1,168 @@
+# -*- coding: utf-8 -*-
+
+import json
+import os
+import pickle
+import shutil
+import signal
+import tempfile
+import threading
+import unittest
+import britney
+from britney import errors
+from britney.core import Spore
+from britney.middleware import auth
+from britney.transport import Urllib3Transport
+from britney.workers import ProcessPool
+from test_transport import EchoHandler, EchoServer
+
+
+def enable_json(client):
+    client.enable('Json')
+
+
+def status_code(response):
+    return response.status_code
+
+
+class ServerTestCase(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.server = EchoServer(('127.0.0.1', 0), EchoHandler)
+        cls.thread = threading.Thread(target=cls.server.serve_forever)
+        cls.thread.daemon = True
+        cls.thread.start()
+        cls.description = {
+            'name': 'test',
+            'base_url': 'http://127.0.0.1:%d/api' %
+                        cls.server.server_address[1],
+            'methods': {
+                'get_user': {'method': 'GET', 'path': '/users/:id',
+                             'required_params': ['id']},
+                'missing': {'method': 'GET', 'path': '/missing'},
+            }
+        }
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+
+@unittest.skipUnless(hasattr(os, 'register_at_fork'),
+                     'os.register_at_fork is required')
+class TestForkSafety(ServerTestCase):
+
+    def in_child(self, func):
+        """ Runs a function in a forked process and returns its exit status
+        """
+        pid = os.fork()
+        if pid == 0:
+            signal.alarm(5)
+            try:
+                func()
+            except BaseException:
+                os._exit(1)
+            os._exit(0)
+        return os.waitpid(pid, 0)[1]
+
+    def check_transport(self, transport, pools):
+        client = Spore(**self.description)
+        client.set_transport(transport)
+        client.enable('Json')
+        self.assertEqual(client.get_user(id=1).status_code, 200)
+        self.assertEqual(len(pools(transport)), 1)
+
+        def child():
+            assert len(pools(transport)) == 0
+            assert client.get_user(id=2).data['path'] == '/api/users/2'
+
+        self.assertEqual(self.in_child(child), 0)
+        self.assertEqual(len(pools(transport)), 1)
+
+    def test_requests_transport(self):
+        self.check_transport(
+            britney.transport.RequestsTransport(),
+            lambda transport: transport.session.get_adapter(
+                'http://'
+            ).poolmanager.pools
+        )
+
+    def test_urllib3_transport(self):
+        self.check_transport(
+            Urllib3Transport(),
+            lambda transport: transport.pool_manager.pools
+        )
+
+    def test_locks_replaced(self):
+        client = Spore(**self.description)
+        tracer = client.enable_tracing()
+        middleware = auth.OAuth2(token_url='http://auth.test.org/token',
+                                 client_id='fork', client_secret='secret')
+        client.middlewares = [(lambda environ: True, middleware)]
+
+        # locks held by other threads of the parent while forking
+        for lock in (client._lock, tracer._lock, middleware._token.lock):
+            lock.acquire()
+        try:
+            def child():
+                client.enable(auth.Basic, username='login', password='pwd')
+                with tracer._lock, middleware._token.lock:
+                    pass
+
+            self.assertEqual(self.in_child(child), 0)
+        finally:
+            for lock in (client._lock, tracer._lock, middleware._token.lock):
+                lock.release()
+
+
+class TestPickling(unittest.TestCase):
+
+    def test_errors(self):
+        build_error = errors.SporeClientBuildError(
+            {'base_url': 'required'},
+            {'get': errors.SporeMethodBuildError({'path': 'required'})}
+        )
+        build_error = pickle.loads(pickle.dumps(build_error))
+        self.assertEqual(build_error.errors['base_url'], 'required')
+        self.assertEqual(build_error.errors['methods']['get'].errors,
+                         {'path': 'required'})
+
+        call_error = errors.SporeMethodCallError('Too much parameter',
+                                                 expected={'id'})
+        call_error = pickle.loads(pickle.dumps(call_error))
+        self.assertEqual(call_error.cause, 'Too much parameter')
+        self.assertEqual(call_error.expected_values, {'id'})
+
+
+class TestProcessPool(ServerTestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.spec_uri = os.path.join(self.directory, 'api.json')
+        with open(self.spec_uri, 'w') as spec_file:
+            json.dump(self.description, spec_file)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_map(self):
+        with ProcessPool(self.spec_uri, setup=enable_json,
+                         processes=2) as pool:
+            results = list(pool.map('get_user',
+                                    [{'id': id} for id in range(10)]))
+        self.assertEqual([result['path'] for result in results],
+                         ['/api/users/%d' % id for id in range(10)])
+
+    def test_result(self):
+        with ProcessPool(self.spec_uri, processes=1,
+                         result=status_code) as pool:
+            self.assertEqual(pool.submit('get_user', id=1).result(), 200)
+
+    def test_status_error(self):
+        with ProcessPool(self.spec_uri, processes=1) as pool:
+            future = pool.submit('missing')
+            with self.assertRaises(errors.SporeMethodStatusError) as error:
+                future.result()
+        self.assertEqual(error.exception.response.status_code, 404)